@@ -3,14 +3,15 @@ from aws_cdk import (
     aws_lambda as _lambda,
     aws_stepfunctions as sfn,
     aws_iam as iam, # Added for potential Step Functions role if needed for sync
-    aws_cognito as cognito # Added for Cognito types
+    aws_cognito as cognito, # Added for Cognito types
+    Size
 )
 from constructs import Construct
 import json
 
 class LessonBuddyApiGateway(Construct):
     def __init__(self, scope: Construct, id: str,
-                 generate_chapter_sfn: sfn.IStateMachine,
+                 start_chapter_generation_function: _lambda.Function,
                  generate_course_plan_function: _lambda.Function,
                  get_course_list_function: _lambda.Function,
                  get_lesson_content_function: _lambda.Function,
@@ -30,6 +31,9 @@ class LessonBuddyApiGateway(Construct):
                  get_flashcards_function: _lambda.Function, # Added for flashcards endpoint
                  get_image_data_function: _lambda.Function, # Added for new endpoint
                  delete_course_function: _lambda.Function, # Added for new endpoint
+                 get_course_plan_status_function: _lambda.Function,
+                 get_chapter_bundle_function: _lambda.Function,
+                 get_course_generation_status_function: _lambda.Function,
                  **kwargs) -> None:
         super().__init__(scope, id, **kwargs)
 
@@ -37,72 +41,17 @@ class LessonBuddyApiGateway(Construct):
         api = apigw.RestApi(self, "LessonBuddyApi",
                             rest_api_name="lesson-buddy-api", # Matching image context
                             description="API for Lesson Buddy services.",
+                            min_compression_size=Size.kibibytes(1), # Gzip responses for clients sending Accept-Encoding
+                            binary_media_types=["application/gzip"], # Stored gzip content passed through as is (see content_store.py)
                             default_cors_preflight_options=apigw.CorsOptions(
                                 allow_origins=apigw.Cors.ALL_ORIGINS,
                                 allow_methods=apigw.Cors.ALL_METHODS,
                                 allow_headers=["Content-Type", "X-Amz-Date", "Authorization", "X-Api-Key", "X-Amz-Security-Token"]
                             ))
 
-        # Integration for /generate-chapter (Step Function)
-        # This uses StartExecution, which is asynchronous.
-        # The API will return immediately after starting the Step Function.
-        # We will use AwsIntegration for explicit control.
-
-        # Create an IAM role for API Gateway to invoke Step Functions
-        api_gw_sfn_role = iam.Role(
-            self, "ApiGatewayStepFunctionsRole",
-            assumed_by=iam.ServicePrincipal("apigateway.amazonaws.com")
-        )
-
-        # Add a policy to the role to allow starting execution of the state machine
-        api_gw_sfn_role.add_to_policy(iam.PolicyStatement(
-            actions=["states:StartExecution"],
-            resources=[generate_chapter_sfn.state_machine_arn]
-        ))
-
-        generate_chapter_integration = apigw.AwsIntegration(
-            service="states",
-            action="StartExecution", # Explicitly use StartExecution
-            options=apigw.IntegrationOptions(
-                credentials_role=api_gw_sfn_role,
-                passthrough_behavior=apigw.PassthroughBehavior.NEVER, # Important: process the template
-                request_templates={
-                    "application/json": (
-                        f"""
-                        #set($rawCourseId = $input.path('$.course_id'))
-                        #set($rawChapterId = $input.path('$.chapter_id'))
-                        #set($rawUserId = $context.authorizer.claims.sub)
-                        #set($escapedCourseId = $util.escapeJavaScript($rawCourseId))
-                        #set($escapedChapterId = $util.escapeJavaScript($rawChapterId))
-                        #set($escapedUserId = $util.escapeJavaScript($rawUserId))
-                        {{
-                        "input": "{{\\"course_id\\": \\"$escapedCourseId\\", \\"chapter_id\\": \\"$escapedChapterId\\", \\"user_id\\": \\"$escapedUserId\\"}}",
-                        "stateMachineArn": "{generate_chapter_sfn.state_machine_arn}"
-                        }}
-                        """
-                    )
-                },
-                integration_responses=[
-                    apigw.IntegrationResponse(
-                        status_code="200",
-                        response_templates={
-                            "application/json": json.dumps({
-                                "message": "Execution started successfully.",
-                                # $input refers to the output of the StartExecution call
-                                "executionArn": "$util.escapeJavaScript($input.json('$.executionArn'))",
-                                "startDate": "$util.escapeJavaScript($input.json('$.startDate'))"
-                            })
-                        },
-                        # Ensure headers are set for the response
-                        response_parameters={
-                            'method.response.header.Content-Type': "'application/json'"
-                        }
-                    )
-                ]
-            )
-        )
-
         # Integrations for Lambda functions (assuming proxy integration)
+        # /generate-chapter starts the Step Function, or returns a prefetch of the chapter already running
+        generate_chapter_integration = apigw.LambdaIntegration(start_chapter_generation_function)
         generate_lesson_plan_integration = apigw.LambdaIntegration(generate_course_plan_function)
         get_course_list_integration = apigw.LambdaIntegration(get_course_list_function)
         get_lesson_content_integration = apigw.LambdaIntegration(get_lesson_content_function)
@@ -112,6 +61,9 @@ class LessonBuddyApiGateway(Construct):
         get_flashcards_integration = apigw.LambdaIntegration(get_flashcards_function) # Added for flashcards
         get_image_data_integration = apigw.LambdaIntegration(get_image_data_function) # Added
         delete_course_integration = apigw.LambdaIntegration(delete_course_function) # Added
+        get_course_plan_status_integration = apigw.LambdaIntegration(get_course_plan_status_function)
+        get_chapter_bundle_integration = apigw.LambdaIntegration(get_chapter_bundle_function)
+        get_course_generation_status_integration = apigw.LambdaIntegration(get_course_generation_status_function)
 
         # Define resources and methods based on the image
 
@@ -139,6 +91,33 @@ class LessonBuddyApiGateway(Construct):
             authorization_type=apigw.AuthorizationType.COGNITO
         )
 
+        # /check-course-plan-status (poll async course plan jobs)
+        check_course_plan_status_resource = api.root.add_resource("check-course-plan-status")
+        check_course_plan_status_resource.add_method(
+            "GET",
+            get_course_plan_status_integration,
+            authorizer=cognito_authorizer,
+            authorization_type=apigw.AuthorizationType.COGNITO
+        )
+
+        # /chapter-bundle (lessons, questions and flashcards of a chapter in one response)
+        chapter_bundle_resource = api.root.add_resource("chapter-bundle")
+        chapter_bundle_resource.add_method(
+            "GET",
+            get_chapter_bundle_integration,
+            authorizer=cognito_authorizer,
+            authorization_type=apigw.AuthorizationType.COGNITO
+        )
+
+        # /course-generation-status (every chapter's status, plus optional execution ARNs, in one call)
+        course_generation_status_resource = api.root.add_resource("course-generation-status")
+        course_generation_status_resource.add_method(
+            "GET",
+            get_course_generation_status_integration,
+            authorizer=cognito_authorizer,
+            authorization_type=apigw.AuthorizationType.COGNITO
+        )
+
         # /get-course-list
         get_course_list_resource = api.root.add_resource("get-course-list")
         get_course_list_resource.add_method(
@@ -248,6 +227,12 @@ class LessonBuddyApiGateway(Construct):
                     'method.response.header.Access-Control-Allow-Origin': True,
                     'method.response.header.Content-Disposition': True
                 }
+            ), apigw.MethodResponse(
+                status_code="302", # mode=redirect
+                response_parameters={
+                    'method.response.header.Location': True,
+                    'method.response.header.Access-Control-Allow-Origin': True
+                }
             )]
         )
 
@@ -1,6 +1,7 @@
 from aws_cdk import (
     aws_s3 as s3,
-    RemovalPolicy
+    RemovalPolicy,
+    Duration
 )
 from constructs import Construct
 
@@ -12,7 +13,21 @@ class Buckets(Construct):
             self, "LessonContentS3Bucket",
             # bucket_name="lesson-content-bucket",
             removal_policy=RemovalPolicy.DESTROY,
-            auto_delete_objects=True
+            auto_delete_objects=True,
+            lifecycle_rules=[
+                # Lesson generation checkpoints only matter while the execution can still retry
+                s3.LifecycleRule(
+                    id="ExpireLessonCheckpoints",
+                    prefix="checkpoints/",
+                    expiration=Duration.days(2)
+                ),
+                # Requests for async course plan jobs, deleted by the worker once it has run
+                s3.LifecycleRule(
+                    id="ExpireCoursePlanJobs",
+                    prefix="course-plan-jobs/",
+                    expiration=Duration.days(1)
+                )
+            ]
         )
 
         self.questions_bucket = s3.Bucket(
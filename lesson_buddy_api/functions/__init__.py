@@ -6,6 +6,8 @@ from aws_cdk import (
     aws_iam as iam,
     aws_dynamodb as dynamodb, # Added for type hinting
     aws_s3 as s3, # Added for type hinting
+    aws_sqs as sqs,
+    aws_lambda_event_sources as lambda_event_sources,
 )
 from constructs import Construct # Will use Construct as the base class
 from dotenv import load_dotenv
@@ -20,12 +22,45 @@ class Functions(Construct): # Changed from Stack to Construct
                  questions_bucket: s3.IBucket, # Added questions_bucket
                  course_images_bucket: s3.IBucket, # Added course_images_bucket
                  flashcards_table: dynamodb.ITable, # Added flashcards_table
+                 llm_cache_table: dynamodb.ITable,
+                 connections_table: dynamodb.ITable,
                  user_pool_id: str, # Added
                  user_pool_client_id: str, # Added
                  user_pool_arn: str, # Added for IAM permissions
                  **kwargs) -> None:
         super().__init__(scope, construct_id, **kwargs)
 
+        # Shared modules (LLM client, ...) importable by any function that attaches this layer
+        self.shared_layer = _lambda.LayerVersion(
+            self, "SharedLayer",
+            code=_lambda.Code.from_asset("lesson_buddy_api/layers/shared"),
+            compatible_runtimes=[_lambda.Runtime.PYTHON_3_13],
+            description="Shared Python modules for Lesson Buddy functions"
+        )
+
+        # Low-priority lane for generating the next chapter before the user asks for it.
+        # Messages are enqueued when a chapter completes or is opened; see prefetch_next_chapter.
+        self.chapter_prefetch_queue = sqs.Queue(
+            self, "ChapterPrefetchQueue",
+            visibility_timeout=Duration.minutes(3), # Also the delay before a capped prefetch is retried
+            retention_period=Duration.days(1) # A prefetch that hasn't started within a day isn't worth doing
+        )
+
+        # Cleanup of deleted courses (S3 objects, flashcards, running generations); see cleanup_course.
+        # Jobs that keep failing are parked in the dead-letter queue for inspection.
+        self.course_cleanup_dead_letter_queue = sqs.Queue(
+            self, "CourseCleanupDeadLetterQueue",
+            retention_period=Duration.days(14)
+        )
+        self.course_cleanup_queue = sqs.Queue(
+            self, "CourseCleanupQueue",
+            visibility_timeout=Duration.minutes(6), # Longer than the cleanup function's timeout
+            dead_letter_queue=sqs.DeadLetterQueue(
+                max_receive_count=5,
+                queue=self.course_cleanup_dead_letter_queue
+            )
+        )
+
         # Add function to the stack from folder delete_course
         self.delete_course_function = _lambda.Function(
             self, "DeleteCourseFunction",
@@ -33,11 +68,14 @@ class Functions(Construct): # Changed from Stack to Construct
             handler="lambda_handler.lambda_handler",
             code=_lambda.Code.from_asset("lesson_buddy_api/functions/delete_course"),
             timeout=Duration.seconds(30),
+            layers=[self.shared_layer], # course_store
             environment={
-                "COURSES_TABLE_NAME": course_table.table_name
+                "COURSES_TABLE_NAME": course_table.table_name,
+                "CLEANUP_QUEUE_URL": self.course_cleanup_queue.queue_url
             }
         )
-        course_table.grant_write_data(self.delete_course_function)
+        course_table.grant_read_write_data(self.delete_course_function) # Queries the chapter items to delete
+        self.course_cleanup_queue.grant_send_messages(self.delete_course_function)
         
         load_dotenv() # Ensure .env is loaded for API_KEY        
 
@@ -47,6 +85,7 @@ class Functions(Construct): # Changed from Stack to Construct
             runtime=_lambda.Runtime.PYTHON_3_13,
             handler="lambda_handler.lambda_handler",
             code=_lambda.Code.from_asset("lesson_buddy_api/functions/get_lesson_content"),
+            layers=[self.shared_layer], # content_store and warm_cache
             timeout=Duration.minutes(15),
             environment={
                 "LESSON_BUCKET_NAME": lesson_bucket.bucket_name
@@ -73,12 +112,15 @@ class Functions(Construct): # Changed from Stack to Construct
             runtime=_lambda.Runtime.PYTHON_3_13,
             handler="lambda_handler.lambda_handler", 
             code=_lambda.Code.from_asset("lesson_buddy_api/functions/get_course_plan"),
+            layers=[self.shared_layer], # course_store and warm_cache
             timeout=Duration.minutes(15),
             environment={
-                "COURSE_TABLE_NAME": course_table.table_name
+                "COURSE_TABLE_NAME": course_table.table_name,
+                "PREFETCH_QUEUE_URL": self.chapter_prefetch_queue.queue_url
             }
         )
-        course_table.grant_read_data(self.get_course_plan_function)
+        course_table.grant_read_write_data(self.get_course_plan_function) # Splits single-item courses on first read
+        self.chapter_prefetch_queue.grant_send_messages(self.get_course_plan_function)
 
         # Add function to the stack from folder generate_lesson_content
         self.generate_lesson_content_function = _lambda.Function(
@@ -86,14 +128,20 @@ class Functions(Construct): # Changed from Stack to Construct
             runtime=_lambda.Runtime.PYTHON_3_13,
             handler="lambda_handler.lambda_handler", 
             code=_lambda.Code.from_asset("lesson_buddy_api/functions/generate_lesson_content"),
+            layers=[self.shared_layer],
             timeout=Duration.minutes(15),
             environment={
                 "API_KEY": os.environ.get("API_KEY", ""),
                 "BEDROCK_API_KEY": os.environ.get("BEDROCK_API_KEY", ""),
-                "LESSON_BUCKET_NAME": lesson_bucket.bucket_name
+                "LESSON_BUCKET_NAME": lesson_bucket.bucket_name,
+                "COURSE_TABLE_NAME": course_table.table_name, # Course title/description
+                "LLM_CACHE_TABLE_NAME": llm_cache_table.table_name
             }
         )
-        lesson_bucket.grant_write(self.generate_lesson_content_function)
+        course_table.grant_read_data(self.generate_lesson_content_function)
+        lesson_bucket.grant_read_write(self.generate_lesson_content_function) # Checkpoints are read back on retry
+        lesson_bucket.grant_delete(self.generate_lesson_content_function)
+        llm_cache_table.grant_read_write_data(self.generate_lesson_content_function)
 
         # Add function to the stack from folder fix_lesson_markdown
         self.fix_lesson_markdown_function = _lambda.Function(
@@ -101,14 +149,17 @@ class Functions(Construct): # Changed from Stack to Construct
             runtime=_lambda.Runtime.PYTHON_3_13,
             handler="lambda_handler.lambda_handler",
             code=_lambda.Code.from_asset("lesson_buddy_api/functions/fix_lesson_markdown"),
+            layers=[self.shared_layer],
             timeout=Duration.minutes(5), # Markdown fixing should be relatively quick
             environment={
                 "API_KEY": os.environ.get("API_KEY", ""),
                 "BEDROCK_API_KEY": os.environ.get("BEDROCK_API_KEY", ""),
-                "LESSON_BUCKET_NAME": lesson_bucket.bucket_name
+                "LESSON_BUCKET_NAME": lesson_bucket.bucket_name,
+                "LLM_CACHE_TABLE_NAME": llm_cache_table.table_name
             }
         )
         lesson_bucket.grant_write(self.fix_lesson_markdown_function) # It needs to save the fixed content
+        llm_cache_table.grant_read_write_data(self.fix_lesson_markdown_function)
 
         # Add function to the stack from folder generate_multiple_choice_questions
         self.generate_multiple_choice_questions_function = _lambda.Function(
@@ -116,15 +167,18 @@ class Functions(Construct): # Changed from Stack to Construct
             runtime=_lambda.Runtime.PYTHON_3_13,
             handler="lambda_handler.lambda_handler",
             code=_lambda.Code.from_asset("lesson_buddy_api/functions/generate_multiple_choice_questions"),
+            layers=[self.shared_layer],
             timeout=Duration.minutes(5), 
             environment={
                 "API_KEY": os.environ.get("API_KEY", ""), 
                 "BEDROCK_API_KEY": os.environ.get("BEDROCK_API_KEY", ""),
-                "QUESTIONS_BUCKET_NAME": questions_bucket.bucket_name # Added
+                "QUESTIONS_BUCKET_NAME": questions_bucket.bucket_name, # Added
+                "LLM_CACHE_TABLE_NAME": llm_cache_table.table_name
             }
         )
         questions_bucket.grant_write(self.generate_multiple_choice_questions_function) # Added permissions
         lesson_bucket.grant_read(self.generate_multiple_choice_questions_function) # Added read permission for lesson content
+        llm_cache_table.grant_read_write_data(self.generate_multiple_choice_questions_function)
 
         # Add function to the stack from folder get_multiple_choice_questions
         self.get_multiple_choice_questions_function = _lambda.Function(
@@ -132,6 +186,7 @@ class Functions(Construct): # Changed from Stack to Construct
             runtime=_lambda.Runtime.PYTHON_3_13,
             handler="lambda_handler.lambda_handler",
             code=_lambda.Code.from_asset("lesson_buddy_api/functions/get_multiple_choice_questions"),
+            layers=[self.shared_layer], # content_store and warm_cache
             timeout=Duration.minutes(1),
             environment={
                 "QUESTIONS_BUCKET_NAME": questions_bucket.bucket_name
@@ -145,15 +200,18 @@ class Functions(Construct): # Changed from Stack to Construct
             runtime=_lambda.Runtime.PYTHON_3_13,
             handler="lambda_handler.lambda_handler",
             code=_lambda.Code.from_asset("lesson_buddy_api/functions/generate_flashcards"),
+            layers=[self.shared_layer],
             timeout=Duration.minutes(5),
             environment={
                 "API_KEY": os.environ.get("API_KEY", ""), 
                 "BEDROCK_API_KEY": os.environ.get("BEDROCK_API_KEY", ""),
-                "FLASHCARDS_TABLE_NAME": flashcards_table.table_name
+                "FLASHCARDS_TABLE_NAME": flashcards_table.table_name,
+                "LLM_CACHE_TABLE_NAME": llm_cache_table.table_name
             }
         )
         flashcards_table.grant_read_write_data(self.generate_flashcards_function)
         lesson_bucket.grant_read(self.generate_flashcards_function)
+        llm_cache_table.grant_read_write_data(self.generate_flashcards_function)
 
         # Add function to the stack from folder get_flashcards
         self.get_flashcards_function = _lambda.Function(
@@ -161,6 +219,7 @@ class Functions(Construct): # Changed from Stack to Construct
             runtime=_lambda.Runtime.PYTHON_3_13,
             handler="lambda_handler.lambda_handler",
             code=_lambda.Code.from_asset("lesson_buddy_api/functions/get_flashcards"),
+            layers=[self.shared_layer], # flashcard_store
             timeout=Duration.minutes(1),
             environment={
                 "FLASHCARDS_TABLE_NAME": flashcards_table.table_name
@@ -175,6 +234,7 @@ class Functions(Construct): # Changed from Stack to Construct
             handler="lambda_handler.lambda_handler", 
             code=_lambda.Code.from_asset("lesson_buddy_api/functions/update_chapter_status"), # Updated code path
             timeout=Duration.minutes(15),
+            layers=[self.shared_layer], # course_store
             environment={
                 "COURSE_TABLE_NAME": course_table.table_name
             }
@@ -187,6 +247,7 @@ class Functions(Construct): # Changed from Stack to Construct
             runtime=_lambda.Runtime.PYTHON_3_13,
             handler="lambda_handler.handler",  # Corrected handler name
             code=_lambda.Code.from_asset("lesson_buddy_api/functions/check_chapter_generation_status"),
+            layers=[self.shared_layer], # course_store
             timeout=Duration.minutes(1), # Short timeout as it's a status check
             environment={
                 "COURSE_TABLE_NAME": course_table.table_name # Added for DynamoDB access
@@ -200,6 +261,24 @@ class Functions(Construct): # Changed from Stack to Construct
             resources=["*"] # Or be more specific if you have the ARN of the state machine
         ))
 
+        # Add function to the stack from folder get_course_generation_status
+        self.get_course_generation_status_function = _lambda.Function(
+            self, "GetCourseGenerationStatusFunction",
+            runtime=_lambda.Runtime.PYTHON_3_13,
+            handler="lambda_handler.lambda_handler",
+            code=_lambda.Code.from_asset("lesson_buddy_api/functions/get_course_generation_status"),
+            layers=[self.shared_layer], # course_store
+            timeout=Duration.seconds(30),
+            environment={
+                "COURSE_TABLE_NAME": course_table.table_name
+            }
+        )
+        course_table.grant_read_data(self.get_course_generation_status_function)
+        self.get_course_generation_status_function.add_to_role_policy(iam.PolicyStatement(
+            actions=["states:DescribeExecution"],
+            resources=["*"] # Execution ARNs aren't known until runtime
+        ))
+
         # Add function for retrieving user info (protected by Cognito)
         self.get_user_info_function = _lambda.Function(
             self, "GetUserInfoFunction",
@@ -310,8 +389,97 @@ class Functions(Construct): # Changed from Stack to Construct
             resources=[user_pool_arn]
         ))
 
+        lambda_retry = [
+            {
+            "ErrorEquals": [
+                "States.TaskFailed",
+                "Sandbox.Timedout",
+                "Lambda.ServiceException",
+                "Lambda.AWSLambdaException",
+                "Lambda.SdkClientException",
+                "Lambda.TooManyRequestsException"
+            ],
+            "IntervalSeconds": 1,
+            "MaxAttempts": 3,
+            "BackoffRate": 2,
+            "JitterStrategy": "FULL"
+            }
+        ]
+
+        dynamodb_retry = [
+            {
+            "ErrorEquals": [
+                "DynamoDB.ProvisionedThroughputExceededException",
+                "DynamoDB.RequestLimitExceeded",
+                "DynamoDB.ThrottlingException",
+                "DynamoDB.InternalServerErrorException"
+            ],
+            "IntervalSeconds": 1,
+            "MaxAttempts": 3,
+            "BackoffRate": 2,
+            "JitterStrategy": "FULL"
+            }
+        ]
+
+        # Parallel branches that each record one chapter status ("lessons", "mcqs" or "flashcards").
+        # new_status may be a JSONata expression evaluated against the Parallel state's input.
+        # The update goes straight to the chapter's own item in the course table (see course_store);
+        # update_chapter_status stays deployed for transitions that need extra logic.
+        # Courses still stored as a single item are split by Get Course Plan, which runs first.
+        def chapter_status_branches(*updates):
+            branches = []
+            for state_name, status_type, new_status in updates:
+                not_recorded_state_name = f"{state_name} Not Recorded"
+                branches.append({
+                    "StartAt": state_name,
+                    "States": {
+                        state_name: {
+                        "Type": "Task",
+                        "Resource": "arn:aws:states:::dynamodb:updateItem",
+                        "Arguments": {
+                            "TableName": course_table.table_name,
+                            "Key": {
+                            "CourseID": {"S": "{% $course_id %}"},
+                            "UserID": {"S": "{% $user_id & '#CHAPTER#' & $chapter_id %}"}
+                            },
+                            "UpdateExpression": "SET chapter_status.#status_key_name_attr = :status_val, chapter_status.last_updated = :ts",
+                            "ConditionExpression": "attribute_exists(CourseID)",
+                            "ExpressionAttributeNames": {
+                            "#status_key_name_attr": f"{status_type}_status"
+                            },
+                            "ExpressionAttributeValues": {
+                            ":status_val": {"S": new_status},
+                            ":ts": {"S": "{% $now() %}"}
+                            }
+                        },
+                        "Retry": dynamodb_retry,
+                        # A status write failing (e.g. the course was deleted mid-run) shouldn't fail
+                        # the generation itself, matching how update_chapter_status reports errors
+                        "Catch": [
+                            {
+                            "ErrorEquals": [
+                                "States.ALL"
+                            ],
+                            "Next": not_recorded_state_name
+                            }
+                        ],
+                        "End": True
+                        },
+                        not_recorded_state_name: {
+                        "Type": "Pass",
+                        "End": True
+                        }
+                    }
+                })
+            return branches
+
+        # Only the requested chapter is loaded; lesson iterations receive IDs plus the chapter/lesson
+        # context rather than the whole course plan, keeping state payloads small.
+        # Each lesson runs its whole pipeline (content -> markdown fix -> MCQs + flashcards) inside
+        # one Map iteration, so assessments for a finished lesson don't wait on the slowest lesson.
+        # MCQ/flashcard failures are caught per lesson and aggregated into the chapter statuses.
         step_function_definition = {
-            "Comment": "A description of my state machine",
+            "Comment": "Generates a chapter's lessons, questions and flashcards, one pipeline per lesson",
             "StartAt": "Get Course Plan",
             "States": {
                 "Get Course Plan": {
@@ -323,26 +491,12 @@ class Functions(Construct): # Changed from Stack to Construct
                     "Payload": {
                     "queryStringParameters": {
                         "course_id": "{% $states.input.course_id %}",
-                        "user_id": "{% $states.input.user_id %}"
+                        "user_id": "{% $states.input.user_id %}",
+                        "chapter_id": "{% $states.input.chapter_id %}"
                     }
                     }
                 },
-                "Retry": [
-                    {
-                    "ErrorEquals": [
-                        "States.TaskFailed",
-                        "Sandbox.Timedout",
-                        "Lambda.ServiceException",
-                        "Lambda.AWSLambdaException",
-                        "Lambda.SdkClientException",
-                        "Lambda.TooManyRequestsException"
-                    ],
-                    "IntervalSeconds": 1,
-                    "MaxAttempts": 3,
-                    "BackoffRate": 2,
-                    "JitterStrategy": "FULL"
-                    }
-                ],
+                "Retry": lambda_retry,
                 "Next": "Extract Chapter from Course Plan",
                 "Assign": {
                     "chapter_id": "{% $states.input.chapter_id %}",
@@ -352,44 +506,55 @@ class Functions(Construct): # Changed from Stack to Construct
                 },
                 "Extract Chapter from Course Plan": {
                 "Type": "Pass",
-                "Next": "Mark Chapter as Generating",
+                "Next": "Record Chapter Execution",
                 "Output": {
-                    "lessons": "{% $single($parse($states.input.body).chapters, function($v) {$v.id = $chapter_id}).lessons %}"
+                    "lessons": "{% $parse($states.input.body).lessons %}"
                 },
                 "Assign": {
-                    "course_plan": "{% $parse($states.input.body) %}"
+                    "chapter": "{% $sift($parse($states.input.body), function($v, $k) {$k in ['title', 'description']}) %}"
                 }
                 },
-                "Mark Chapter as Generating": {
+                # The chapter item remembers the execution generating it, so cleanup_course can stop
+                # a deleted course's generations without listing every running execution
+                "Record Chapter Execution": {
                 "Type": "Task",
-                "Resource": "arn:aws:states:::lambda:invoke",
-                "Output": "{% $states.input %}",
+                "Resource": "arn:aws:states:::dynamodb:updateItem",
                 "Arguments": {
-                    "FunctionName": self.update_chapter_status_function.function_arn,
-                    "Payload": {
-                    "course_id": "{% $course_id %}",
-                    "user_id": "{% $user_id %}",
-                    "chapter_id": "{% $chapter_id %}",
-                    "status_type": "lessons",
-                    "new_status": "GENERATING"
+                    "TableName": course_table.table_name,
+                    "Key": {
+                    "CourseID": {"S": "{% $course_id %}"},
+                    "UserID": {"S": "{% $user_id & '#CHAPTER#' & $chapter_id %}"}
+                    },
+                    "UpdateExpression": "SET generation_execution_arn = :arn",
+                    "ConditionExpression": "attribute_exists(CourseID)",
+                    "ExpressionAttributeValues": {
+                    ":arn": {"S": "{% $states.context.Execution.Id %}"}
                     }
                 },
-                "Retry": [
+                "Output": "{% $states.input %}",
+                "Retry": dynamodb_retry,
+                "Catch": [
                     {
                     "ErrorEquals": [
-                        "States.TaskFailed",
-                        "Sandbox.Timedout",
-                        "Lambda.ServiceException",
-                        "Lambda.AWSLambdaException",
-                        "Lambda.SdkClientException",
-                        "Lambda.TooManyRequestsException"
+                        "DynamoDB.ConditionalCheckFailedException"
                     ],
-                    "IntervalSeconds": 1,
-                    "MaxAttempts": 3,
-                    "BackoffRate": 2,
-                    "JitterStrategy": "FULL"
+                    "Next": "Course Deleted"
                     }
                 ],
+                "Next": "Mark Chapter as Generating"
+                },
+                "Course Deleted": {
+                "Type": "Succeed",
+                "Comment": "The course was deleted before its chapter generation started"
+                },
+                "Mark Chapter as Generating": {
+                "Type": "Parallel",
+                "Branches": chapter_status_branches(
+                    ("Mark Lessons as Generating", "lessons", "GENERATING"),
+                    ("Mark MCQs as Generating", "mcqs", "GENERATING"),
+                    ("Mark Flashcards as Generating", "flashcards", "GENERATING")
+                ),
+                "Output": "{% $states.input %}",
                 "Next": "Generate Each Lesson in Chapter"
                 },
                 "Generate Each Lesson in Chapter": {
@@ -410,26 +575,15 @@ class Functions(Construct): # Changed from Stack to Construct
                             "body": {
                             "lesson_id": "{% $states.input.id %}",
                             "chapter_id": "{% $chapter_id %}",
-                            "course_plan": "{% $course_plan %}"
+                            "course_id": "{% $course_id %}",
+                            "user_id": "{% $user_id %}",
+                            "chapter": "{% $chapter %}",
+                            "lesson": "{% $states.input %}",
+                            "execution_id": "{% $states.context.Execution.Name %}"
                             }
                         }
                         },
-                        "Retry": [
-                        {
-                            "ErrorEquals": [
-                            "States.TaskFailed",
-                            "Sandbox.Timedout",
-                            "Lambda.ServiceException",
-                            "Lambda.AWSLambdaException",
-                            "Lambda.SdkClientException",
-                            "Lambda.TooManyRequestsException"
-                            ],
-                            "IntervalSeconds": 1,
-                            "MaxAttempts": 3,
-                            "BackoffRate": 2,
-                            "JitterStrategy": "FULL"
-                        }
-                        ],
+                        "Retry": lambda_retry,
                         "Next": "Fix Lesson Markdown"
                     },
                     "Fix Lesson Markdown": {
@@ -440,405 +594,153 @@ class Functions(Construct): # Changed from Stack to Construct
                         "FunctionName": self.fix_lesson_markdown_function.function_arn,
                         "Payload": "{% $states.input %}"
                         },
-                        "Retry": [
-                        {
-                            "ErrorEquals": [
-                            "States.TaskFailed",
-                            "Sandbox.Timedout",
-                            "Lambda.ServiceException",
-                            "Lambda.AWSLambdaException",
-                            "Lambda.SdkClientException",
-                            "Lambda.TooManyRequestsException"
-                            ],
-                            "IntervalSeconds": 1,
-                            "MaxAttempts": 3,
-                            "BackoffRate": 2,
-                            "JitterStrategy": "FULL"
-                        }
-                        ],
-                        "End": True
-                    }
-                    }
-                },
-                "Next": "Parallel",
-                "Items": "{% $states.input.lessons %}",
-                "Catch": [
-                    {
-                    "ErrorEquals": [
-                        "States.TaskFailed",
-                        "Exception",
-                        "States.Timeout"
-                    ],
-                    "Next": "Save FAILED State to DynamoDB"
-                    }
-                ]
-                },
-                "Save FAILED State to DynamoDB": {
-                "Type": "Task",
-                "Resource": "arn:aws:states:::lambda:invoke",
-                "Output": "{% $states.result.Payload %}",
-                "Arguments": {
-                    "FunctionName": f"{self.update_chapter_status_function.function_arn}:$LATEST",
-                    "Payload": {
-                    "course_id": "{% $course_id %}",
-                    "user_id": "{% $user_id %}",
-                    "chapter_id": "{% $chapter_id %}",
-                    "status_type": "lessons",
-                    "new_status": "FAILED"
-                    }
-                },
-                "Retry": [
-                    {
-                    "ErrorEquals": [
-                        "Lambda.ServiceException",
-                        "Lambda.AWSLambdaException",
-                        "Lambda.SdkClientException",
-                        "Lambda.TooManyRequestsException"
-                    ],
-                    "IntervalSeconds": 1,
-                    "MaxAttempts": 3,
-                    "BackoffRate": 2,
-                    "JitterStrategy": "FULL"
-                    }
-                ],
-                "End": True
-                },
-                "Parallel": {
-                "Type": "Parallel",
-                "Branches": [
-                    {
-                    "StartAt": "Save Chapter State to DynamoDB",
-                    "States": {
-                        "Save Chapter State to DynamoDB": {
-                        "Type": "Task",
-                        "Resource": "arn:aws:states:::lambda:invoke",
-                        "Output": "{% $states.result.Payload %}",
-                        "Arguments": {
-                            "FunctionName": self.update_chapter_status_function.function_arn,
-                            "Payload": {
-                            "course_id": "{% $course_id %}",
-                            "user_id": "{% $user_id %}",
-                            "chapter_id": "{% $chapter_id %}",
-                            "status_type": "lessons",
-                            "new_status": "COMPLETED"
-                            }
-                        },
-                        "Retry": [
-                            {
-                            "ErrorEquals": [
-                                "States.TaskFailed",
-                                "Sandbox.Timedout",
-                                "Lambda.ServiceException",
-                                "Lambda.AWSLambdaException",
-                                "Lambda.SdkClientException",
-                                "Lambda.TooManyRequestsException"
-                            ],
-                            "IntervalSeconds": 1,
-                            "MaxAttempts": 3,
-                            "BackoffRate": 2,
-                            "JitterStrategy": "FULL"
-                            }
-                        ],
-                        "End": True
-                        }
-                    }
+                        "Retry": lambda_retry,
+                        "Next": "Generate Lesson Assessments"
                     },
-                    {
-                    "StartAt": "Mark MCQs as Generating",
-                    "States": {
-                        "Mark MCQs as Generating": {
-                        "Type": "Task",
-                        "Resource": "arn:aws:states:::lambda:invoke",
-                        "Output": "{% $states.input %}",
-                        "Arguments": {
-                            "FunctionName": self.update_chapter_status_function.function_arn,
-                            "Payload": {
-                            "course_id": "{% $course_id %}",
-                            "user_id": "{% $user_id %}",
-                            "chapter_id": "{% $chapter_id %}",
-                            "status_type": "mcqs",
-                            "new_status": "GENERATING"
-                            }
-                        },
-                        "Retry": [
-                            {
-                            "ErrorEquals": [
-                                "States.TaskFailed",
-                                "Sandbox.Timedout",
-                                "Lambda.ServiceException",
-                                "Lambda.AWSLambdaException",
-                                "Lambda.SdkClientException",
-                                "Lambda.TooManyRequestsException"
-                            ],
-                            "IntervalSeconds": 1,
-                            "MaxAttempts": 3,
-                            "BackoffRate": 2,
-                            "JitterStrategy": "FULL"
-                            }
-                        ],
-                        "Next": "Generate Questions for Each Lesson"
-                        },
-                        "Generate Questions for Each Lesson": {
-                        "Type": "Map",
-                        "ItemProcessor": {
-                            "ProcessorConfig": {
-                            "Mode": "INLINE"
-                            },
+                    "Generate Lesson Assessments": {
+                        "Type": "Parallel",
+                        "Branches": [
+                        {
                             "StartAt": "Generate Questions",
                             "States": {
                             "Generate Questions": {
                                 "Type": "Task",
                                 "Resource": "arn:aws:states:::lambda:invoke",
-                                "Output": "{% $states.result.Payload %}",
+                                "Output": "{% $merge([$states.result.Payload, {'status': 'COMPLETED'}]) %}",
                                 "Arguments": {
                                 "FunctionName": self.generate_multiple_choice_questions_function.function_arn,
                                 "Payload": "{% $states.input %}"
                                 },
-                                "Retry": [
+                                "Retry": lambda_retry,
+                                "Catch": [
                                 {
                                     "ErrorEquals": [
-                                    "States.TaskFailed",
-                                    "Sandbox.Timedout",
-                                    "Lambda.ServiceException",
-                                    "Lambda.AWSLambdaException",
-                                    "Lambda.SdkClientException",
-                                    "Lambda.TooManyRequestsException"
+                                    "States.ALL"
                                     ],
-                                    "IntervalSeconds": 1,
-                                    "MaxAttempts": 3,
-                                    "BackoffRate": 2,
-                                    "JitterStrategy": "FULL"
+                                    "Output": "{% {'status': 'FAILED', 'error': $states.errorOutput.Error} %}",
+                                    "Next": "Questions Failed"
                                 }
                                 ],
                                 "End": True
+                            },
+                            "Questions Failed": {
+                                "Type": "Pass",
+                                "End": True
                             }
                             }
                         },
-                        "Next": "Save MCQ State to DynamoDB",
-                        "Catch": [
-                            {
-                            "ErrorEquals": [
-                                "States.Timeout",
-                                "States.TaskFailed",
-                                "Execution"
-                            ],
-                            "Next": "Save FAILED MCQ State to DynamoDB"
-                            }
-                        ]
-                        },
-                        "Save FAILED MCQ State to DynamoDB": {
-                        "Type": "Task",
-                        "Resource": "arn:aws:states:::lambda:invoke",
-                        "Output": "{% $states.result.Payload %}",
-                        "Arguments": {
-                            "FunctionName": f"{self.update_chapter_status_function.function_arn}:$LATEST",
-                            "Payload": {
-                            "course_id": "{% $course_id %}",
-                            "user_id": "{% $user_id %}",
-                            "chapter_id": "{% $chapter_id %}",
-                            "status_type": "mcqs",
-                            "new_status": "FAILED"
-                            }
-                        },
-                        "Retry": [
-                            {
-                            "ErrorEquals": [
-                                "Lambda.ServiceException",
-                                "Lambda.AWSLambdaException",
-                                "Lambda.SdkClientException",
-                                "Lambda.TooManyRequestsException"
-                            ],
-                            "IntervalSeconds": 1,
-                            "MaxAttempts": 3,
-                            "BackoffRate": 2,
-                            "JitterStrategy": "FULL"
-                            }
-                        ],
-                        "End": True
-                        },
-                        "Save MCQ State to DynamoDB": {
-                        "Type": "Task",
-                        "Resource": "arn:aws:states:::lambda:invoke",
-                        "Output": "{% $states.result.Payload %}",
-                        "Arguments": {
-                            "FunctionName": self.update_chapter_status_function.function_arn,
-                            "Payload": {
-                            "course_id": "{% $course_id %}",
-                            "user_id": "{% $user_id %}",
-                            "chapter_id": "{% $chapter_id %}",
-                            "status_type": "mcqs",
-                            "new_status": "COMPLETED"
-                            }
-                        },
-                        "Retry": [
-                            {
-                            "ErrorEquals": [
-                                "States.TaskFailed",
-                                "Sandbox.Timedout",
-                                "Lambda.ServiceException",
-                                "Lambda.AWSLambdaException",
-                                "Lambda.SdkClientException",
-                                "Lambda.TooManyRequestsException"
-                            ],
-                            "IntervalSeconds": 1,
-                            "MaxAttempts": 3,
-                            "BackoffRate": 2,
-                            "JitterStrategy": "FULL"
-                            }
-                        ],
-                        "End": True
-                        }
-                    }
-                    },
-                    {
-                    "StartAt": "Mark Flashcards as Generating",
-                    "States": {
-                        "Mark Flashcards as Generating": {
-                        "Type": "Task",
-                        "Resource": "arn:aws:states:::lambda:invoke",
-                        "Output": "{% $states.input %}",
-                        "Arguments": {
-                            "FunctionName": self.update_chapter_status_function.function_arn,
-                            "Payload": {
-                            "course_id": "{% $course_id %}",
-                            "user_id": "{% $user_id %}",
-                            "chapter_id": "{% $chapter_id %}",
-                            "status_type": "flashcards",
-                            "new_status": "GENERATING"
-                            }
-                        },
-                        "Retry": [
-                            {
-                            "ErrorEquals": [
-                                "States.TaskFailed",
-                                "Sandbox.Timedout",
-                                "Lambda.ServiceException",
-                                "Lambda.AWSLambdaException",
-                                "Lambda.SdkClientException",
-                                "Lambda.TooManyRequestsException"
-                            ],
-                            "IntervalSeconds": 1,
-                            "MaxAttempts": 3,
-                            "BackoffRate": 2,
-                            "JitterStrategy": "FULL"
-                            }
-                        ],
-                        "Next": "Generate Flashcards for Each Lesson"
-                        },
-                        "Generate Flashcards for Each Lesson": {
-                        "Type": "Map",
-                        "ItemProcessor": {
-                            "ProcessorConfig": {
-                            "Mode": "INLINE"
-                            },
+                        {
                             "StartAt": "Generate Flashcards",
                             "States": {
                             "Generate Flashcards": {
                                 "Type": "Task",
                                 "Resource": "arn:aws:states:::lambda:invoke",
-                                "Output": "{% $states.result.Payload %}",
+                                "Output": "{% $merge([$states.result.Payload, {'status': 'COMPLETED'}]) %}",
                                 "Arguments": {
                                 "FunctionName": self.generate_flashcards_function.function_arn,
-                                "Payload": "{% $states.input %}"
+                                # Versions the deck, so a late retry can't replace a newer generation's cards
+                                "Payload": "{% $merge([$states.input, {'generation_started_at': $states.context.Execution.StartTime}]) %}"
                                 },
-                                "Retry": [
+                                "Retry": lambda_retry,
+                                "Catch": [
                                 {
                                     "ErrorEquals": [
-                                    "States.TaskFailed",
-                                    "Sandbox.Timedout",
-                                    "Lambda.ServiceException",
-                                    "Lambda.AWSLambdaException",
-                                    "Lambda.SdkClientException",
-                                    "Lambda.TooManyRequestsException"
+                                    "States.ALL"
                                     ],
-                                    "IntervalSeconds": 1,
-                                    "MaxAttempts": 3,
-                                    "BackoffRate": 2,
-                                    "JitterStrategy": "FULL"
+                                    "Output": "{% {'status': 'FAILED', 'error': $states.errorOutput.Error} %}",
+                                    "Next": "Flashcards Failed"
                                 }
                                 ],
                                 "End": True
+                            },
+                            "Flashcards Failed": {
+                                "Type": "Pass",
+                                "End": True
                             }
                             }
-                        },
-                        "Next": "Save Flashcards State to DynamoDB",
-                        "Catch": [
-                            {
-                            "ErrorEquals": [
-                                "States.Timeout",
-                                "States.TaskFailed",
-                                "Execution"
-                            ],
-                            "Next": "Save FAILED Flashcards State to DynamoDB"
-                            }
-                        ]
-                        },
-                        "Save FAILED Flashcards State to DynamoDB": {
-                        "Type": "Task",
-                        "Resource": "arn:aws:states:::lambda:invoke",
-                        "Output": "{% $states.result.Payload %}",
-                        "Arguments": {
-                            "FunctionName": f"{self.update_chapter_status_function.function_arn}:$LATEST",
-                            "Payload": {
-                            "course_id": "{% $course_id %}",
-                            "user_id": "{% $user_id %}",
-                            "chapter_id": "{% $chapter_id %}",
-                            "status_type": "flashcards",
-                            "new_status": "FAILED"
-                            }
-                        },
-                        "Retry": [
-                            {
-                            "ErrorEquals": [
-                                "Lambda.ServiceException",
-                                "Lambda.AWSLambdaException",
-                                "Lambda.SdkClientException",
-                                "Lambda.TooManyRequestsException"
-                            ],
-                            "IntervalSeconds": 1,
-                            "MaxAttempts": 3,
-                            "BackoffRate": 2,
-                            "JitterStrategy": "FULL"
-                            }
-                        ],
-                        "End": True
-                        },
-                        "Save Flashcards State to DynamoDB": {
-                        "Type": "Task",
-                        "Resource": "arn:aws:states:::lambda:invoke",
-                        "Output": "{% $states.result.Payload %}",
-                        "Arguments": {
-                            "FunctionName": self.update_chapter_status_function.function_arn,
-                            "Payload": {
-                            "course_id": "{% $course_id %}",
-                            "user_id": "{% $user_id %}",
-                            "chapter_id": "{% $chapter_id %}",
-                            "status_type": "flashcards",
-                            "new_status": "COMPLETED"
-                            }
-                        },
-                        "Retry": [
-                            {
-                            "ErrorEquals": [
-                                "States.TaskFailed",
-                                "Sandbox.Timedout",
-                                "Lambda.ServiceException",
-                                "Lambda.AWSLambdaException",
-                                "Lambda.SdkClientException",
-                                "Lambda.TooManyRequestsException"
-                            ],
-                            "IntervalSeconds": 1,
-                            "MaxAttempts": 3,
-                            "BackoffRate": 2,
-                            "JitterStrategy": "FULL"
-                            }
+                        }
                         ],
+                        "Output": "{% {'lesson_id': $states.input.lesson_id, 'lesson_s3_url': $states.input.lesson_s3_url, 'mcqs_status': $states.result[0].status, 'flashcards_status': $states.result[1].status} %}",
                         "End": True
-                        }
                     }
                     }
+                },
+                "Next": "Save Chapter State to DynamoDB",
+                "Items": "{% $states.input.lessons %}",
+                "Catch": [
+                    {
+                    "ErrorEquals": [
+                        "States.TaskFailed",
+                        "Exception",
+                        "States.Timeout"
+                    ],
+                    "Next": "Save FAILED State to DynamoDB"
+                    }
+                ]
+                },
+                "Save FAILED State to DynamoDB": {
+                "Type": "Parallel",
+                "Branches": chapter_status_branches(
+                    ("Save FAILED Lessons State to DynamoDB", "lessons", "FAILED"),
+                    ("Save FAILED MCQ State to DynamoDB", "mcqs", "FAILED"),
+                    ("Save FAILED Flashcards State to DynamoDB", "flashcards", "FAILED")
+                ),
+                "End": True
+                },
+                "Save Chapter State to DynamoDB": {
+                "Type": "Parallel",
+                "Branches": chapter_status_branches(
+                    ("Save Lessons State to DynamoDB", "lessons", "COMPLETED"),
+                    # A chapter's MCQs/flashcards are COMPLETED only if they succeeded for every lesson
+                    ("Save MCQ State to DynamoDB", "mcqs", "{% $count($states.input[mcqs_status != 'COMPLETED']) = 0 ? 'COMPLETED' : 'FAILED' %}"),
+                    ("Save Flashcards State to DynamoDB", "flashcards", "{% $count($states.input[flashcards_status != 'COMPLETED']) = 0 ? 'COMPLETED' : 'FAILED' %}")
+                ),
+                "Output": "{% $states.input %}",
+                "Next": "Was Chapter Requested by User"
+                },
+                # Only chapters the user asked for enqueue the next one; a prefetched chapter
+                # enqueuing its successor would cascade through the whole course
+                "Was Chapter Requested by User": {
+                "Type": "Choice",
+                "Choices": [
+                    {
+                    "Condition": "{% $startsWith($states.context.Execution.Name, 'prefetch-') %}",
+                    "Next": "Prefetched Chapter Complete"
+                    }
+                ],
+                "Default": "Enqueue Next Chapter Prefetch"
+                },
+                "Prefetched Chapter Complete": {
+                "Type": "Succeed"
+                },
+                "Enqueue Next Chapter Prefetch": {
+                "Type": "Task",
+                "Resource": "arn:aws:states:::sqs:sendMessage",
+                "Arguments": {
+                    "QueueUrl": self.chapter_prefetch_queue.queue_url,
+                    "MessageBody": {
+                    "course_id": "{% $course_id %}",
+                    "user_id": "{% $user_id %}",
+                    "chapter_id": "{% $chapter_id %}",
+                    "reason": "chapter_completed"
+                    }
+                },
+                "Output": "{% $states.input %}",
+                # Prefetching is an optimisation; never fail a finished chapter over it
+                "Catch": [
+                    {
+                    "ErrorEquals": [
+                        "States.ALL"
+                    ],
+                    "Output": "{% $states.input %}",
+                    "Next": "Prefetch Not Enqueued"
+                    }
                 ],
                 "End": True
+                },
+                "Prefetch Not Enqueued": {
+                "Type": "Pass",
+                "End": True
                 }
             },
             "QueryLanguage": "JSONata"
@@ -852,12 +754,85 @@ class Functions(Construct): # Changed from Stack to Construct
             state_machine_name="CourseGenerationStateMachine", # Added a more descriptive name
             state_machine_type=sfn.StateMachineType.STANDARD
         )
+        course_table.grant(self.course_generation_sfn, "dynamodb:UpdateItem") # Chapter status updates
+        self.chapter_prefetch_queue.grant_send_messages(self.course_generation_sfn)
+
+        # Add function to the stack from folder prefetch_next_chapter
+        self.prefetch_next_chapter_function = _lambda.Function(
+            self, "PrefetchNextChapterFunction",
+            runtime=_lambda.Runtime.PYTHON_3_13,
+            handler="lambda_handler.lambda_handler",
+            code=_lambda.Code.from_asset("lesson_buddy_api/functions/prefetch_next_chapter"),
+            timeout=Duration.seconds(30),
+            layers=[self.shared_layer], # course_store
+            reserved_concurrent_executions=1, # Low-priority lane; one consumer is plenty
+            environment={
+                "COURSE_TABLE_NAME": course_table.table_name,
+                "STEP_FUNCTION_ARN": self.course_generation_sfn.state_machine_arn,
+                "PREFETCH_MAX_GLOBAL_EXECUTIONS": "20",
+                "PREFETCH_MAX_EXECUTIONS_PER_USER": "1"
+            }
+        )
+        course_table.grant_read_data(self.prefetch_next_chapter_function)
+        self.prefetch_next_chapter_function.add_to_role_policy(iam.PolicyStatement(
+            actions=["states:StartExecution", "states:ListExecutions"],
+            resources=[self.course_generation_sfn.state_machine_arn]
+        ))
+        self.prefetch_next_chapter_function.add_event_source(lambda_event_sources.SqsEventSource(
+            self.chapter_prefetch_queue,
+            batch_size=5,
+            report_batch_item_failures=True
+        ))
+
+        # Add function to the stack from folder start_chapter_generation (POST /generate-chapter)
+        self.start_chapter_generation_function = _lambda.Function(
+            self, "StartChapterGenerationFunction",
+            runtime=_lambda.Runtime.PYTHON_3_13,
+            handler="lambda_handler.lambda_handler",
+            code=_lambda.Code.from_asset("lesson_buddy_api/functions/start_chapter_generation"),
+            layers=[self.shared_layer], # chapter_executions
+            timeout=Duration.seconds(30),
+            environment={
+                "STEP_FUNCTION_ARN": self.course_generation_sfn.state_machine_arn
+            }
+        )
+        self.course_generation_sfn.grant_start_execution(self.start_chapter_generation_function)
+        self.course_generation_sfn.grant_read(self.start_chapter_generation_function) # DescribeExecution of a running prefetch
+
+        # Add function to the stack from folder cleanup_course
+        self.cleanup_course_function = _lambda.Function(
+            self, "CleanupCourseFunction",
+            runtime=_lambda.Runtime.PYTHON_3_13,
+            handler="lambda_handler.lambda_handler",
+            code=_lambda.Code.from_asset("lesson_buddy_api/functions/cleanup_course"),
+            layers=[self.shared_layer], # content_store
+            timeout=Duration.minutes(5),
+            environment={
+                "LESSON_BUCKET_NAME": lesson_bucket.bucket_name,
+                "QUESTIONS_BUCKET_NAME": questions_bucket.bucket_name,
+                "COURSE_IMAGES_BUCKET_NAME": course_images_bucket.bucket_name,
+                "FLASHCARDS_TABLE_NAME": flashcards_table.table_name
+            }
+        )
+        for bucket in (lesson_bucket, questions_bucket, course_images_bucket):
+            bucket.grant_read(self.cleanup_course_function) # ListBucket
+            bucket.grant_delete(self.cleanup_course_function)
+        flashcards_table.grant_read_write_data(self.cleanup_course_function)
+        self.cleanup_course_function.add_to_role_policy(iam.PolicyStatement(
+            actions=["states:DescribeExecution", "states:StopExecution"],
+            resources=["*"] # Execution ARNs aren't known until runtime
+        ))
+        self.cleanup_course_function.add_event_source(lambda_event_sources.SqsEventSource(
+            self.course_cleanup_queue,
+            batch_size=1, # Each job can take a while; don't let one course hold up others
+            report_batch_item_failures=True
+        ))
         
         lambda_functions_to_invoke = [
             self.get_course_plan_function,
             self.generate_lesson_content_function,
             self.fix_lesson_markdown_function,
-            self.update_chapter_status_function, # Renamed from mark_lesson_generated_function
+            self.update_chapter_status_function, # Optional path for status updates that need extra logic
             self.generate_multiple_choice_questions_function, # Added new function
             self.generate_flashcards_function # Added flashcards function
         ]
@@ -870,10 +845,11 @@ class Functions(Construct): # Changed from Stack to Construct
             code=_lambda.Code.from_asset("lesson_buddy_api/functions/get_image_data"),
             timeout=Duration.seconds(30), # Image retrieval should be quick
             environment={
-                # No specific environment variables needed, as it parses URL directly
+                "COURSE_TABLE_NAME": course_table.table_name # Ownership check for pre-signed URLs
             }
         )        
-        course_images_bucket.grant_read(self.get_image_data_function) # Grant read permissions to the course images bucket        
+        course_images_bucket.grant_read(self.get_image_data_function) # Grant read permissions to the course images bucket (also signs the pre-signed URLs)
+        course_table.grant_read_data(self.get_image_data_function)
 
         # Add function to the stack from folder extract_document_text
         self.extract_document_text_function = _lambda.Function(
@@ -899,6 +875,38 @@ class Functions(Construct): # Changed from Stack to Construct
         for lambda_func in lambda_functions_to_invoke:
             lambda_func.grant_invoke(self.course_generation_sfn.role)
         
+        # Add function to the stack from folder generate_course_image
+        # Renders the cover image and its size variants after the course plan is saved
+        self.generate_course_image_function = _lambda.Function(
+            self, "GenerateCourseImageFunction",
+            runtime=_lambda.Runtime.PYTHON_3_13,
+            handler="lambda_handler.lambda_handler",
+            code=_lambda.Code.from_asset(
+                "lesson_buddy_api/functions/generate_course_image",
+                bundling={
+                    "image": _lambda.Runtime.PYTHON_3_13.bundling_image, # Pillow needs the Lambda build image
+                    "command": [
+                        "bash",
+                        "-c",
+                        "pip install -r requirements.txt -t /asset-output && cp -au . /asset-output"
+                    ],
+                    "user": "root",
+                }
+            ),
+            timeout=Duration.minutes(2),
+            memory_size=1024, # Resizing and encoding the variants is CPU bound
+            environment={
+                "COURSE_TABLE_NAME": course_table.table_name,
+                "COURSE_IMAGES_BUCKET_NAME": course_images_bucket.bucket_name
+            }
+        )
+        course_images_bucket.grant_put(self.generate_course_image_function, "course-covers/*")
+        course_table.grant(self.generate_course_image_function, "dynamodb:UpdateItem")
+        self.generate_course_image_function.add_to_role_policy(iam.PolicyStatement(
+            actions=["bedrock:InvokeModel"],
+            resources=["*"]
+        ))
+
         # Add function to the stack from folder generate_course
         self.generate_course_plan_function = _lambda.Function(
             self, "GenerateCourseFunction",
@@ -906,16 +914,17 @@ class Functions(Construct): # Changed from Stack to Construct
             handler="lambda_handler.lambda_handler",
             code=_lambda.Code.from_asset("lesson_buddy_api/functions/generate_course_plan"),
             timeout=Duration.minutes(15),
+            layers=[self.shared_layer], # course_store
             environment={
                 "API_KEY": os.environ.get("API_KEY", ""),
                 "BEDROCK_API_KEY": os.environ.get("BEDROCK_API_KEY", ""),
                 "COURSE_TABLE_NAME": course_table.table_name,
-                "COURSE_IMAGES_BUCKET_NAME": course_images_bucket.bucket_name,
+                "IMAGE_FUNCTION_NAME": self.generate_course_image_function.function_name, # Cover images are generated asynchronously
                 "STEP_FUNCTION_ARN": self.course_generation_sfn.state_machine_arn # Pass Step Function ARN
             }
         )
         course_table.grant_write_data(self.generate_course_plan_function)
-        course_images_bucket.grant_write(self.generate_course_plan_function) # Grant write permissions to the new bucket
+        self.generate_course_image_function.grant_invoke(self.generate_course_plan_function)
         # Grant Bedrock invoke model permissions
         self.generate_course_plan_function.add_to_role_policy(iam.PolicyStatement(
             actions=["bedrock:InvokeModel"],
@@ -926,3 +935,122 @@ class Functions(Construct): # Changed from Stack to Construct
             actions=["states:StartExecution"],
             resources=[self.course_generation_sfn.state_machine_arn]
         ))
+
+        # Runs course plans requested in async mode. Same code as generate_course_plan with a
+        # different entry point, so the API function never has to invoke itself.
+        self.generate_course_plan_worker_function = _lambda.Function(
+            self, "GenerateCoursePlanWorkerFunction",
+            runtime=_lambda.Runtime.PYTHON_3_13,
+            handler="lambda_handler.worker_handler",
+            code=_lambda.Code.from_asset("lesson_buddy_api/functions/generate_course_plan"),
+            timeout=Duration.minutes(15),
+            layers=[self.shared_layer], # course_store
+            retry_attempts=0, # Failures are recorded on the course item; don't pay for the plan twice
+            environment={
+                "API_KEY": os.environ.get("API_KEY", ""),
+                "BEDROCK_API_KEY": os.environ.get("BEDROCK_API_KEY", ""),
+                "COURSE_TABLE_NAME": course_table.table_name,
+                "IMAGE_FUNCTION_NAME": self.generate_course_image_function.function_name,
+                "JOB_BUCKET_NAME": lesson_bucket.bucket_name,
+                "STEP_FUNCTION_ARN": self.course_generation_sfn.state_machine_arn
+            }
+        )
+        course_table.grant_write_data(self.generate_course_plan_worker_function)
+        self.generate_course_image_function.grant_invoke(self.generate_course_plan_worker_function)
+        lesson_bucket.grant_read(self.generate_course_plan_worker_function, "course-plan-jobs/*")
+        lesson_bucket.grant_delete(self.generate_course_plan_worker_function, "course-plan-jobs/*")
+        self.generate_course_plan_worker_function.add_to_role_policy(iam.PolicyStatement(
+            actions=["bedrock:InvokeModel"],
+            resources=["*"]
+        ))
+        self.generate_course_plan_worker_function.add_to_role_policy(iam.PolicyStatement(
+            actions=["states:StartExecution"],
+            resources=[self.course_generation_sfn.state_machine_arn]
+        ))
+
+        self.generate_course_plan_function.add_environment("WORKER_FUNCTION_NAME", self.generate_course_plan_worker_function.function_name)
+        self.generate_course_plan_function.add_environment("JOB_BUCKET_NAME", lesson_bucket.bucket_name)
+        self.generate_course_plan_worker_function.grant_invoke(self.generate_course_plan_function)
+        lesson_bucket.grant_put(self.generate_course_plan_function, "course-plan-jobs/*")
+
+        # Add function to the stack from folder get_course_plan_status
+        self.get_course_plan_status_function = _lambda.Function(
+            self, "GetCoursePlanStatusFunction",
+            runtime=_lambda.Runtime.PYTHON_3_13,
+            handler="lambda_handler.lambda_handler",
+            code=_lambda.Code.from_asset("lesson_buddy_api/functions/get_course_plan_status"),
+            timeout=Duration.seconds(10), # Single projected GetItem
+            environment={
+                "COURSE_TABLE_NAME": course_table.table_name
+            }
+        )
+        course_table.grant_read_data(self.get_course_plan_status_function)
+
+        # Add function to the stack from folder get_chapter_bundle
+        self.get_chapter_bundle_function = _lambda.Function(
+            self, "GetChapterBundleFunction",
+            runtime=_lambda.Runtime.PYTHON_3_13,
+            handler="lambda_handler.lambda_handler",
+            code=_lambda.Code.from_asset("lesson_buddy_api/functions/get_chapter_bundle"),
+            layers=[self.shared_layer], # content_store, course_store, flashcard_store and warm_cache
+            timeout=Duration.seconds(30),
+            memory_size=512, # Holds a whole chapter of lessons, questions and flashcards
+            environment={
+                "COURSE_TABLE_NAME": course_table.table_name,
+                "LESSON_BUCKET_NAME": lesson_bucket.bucket_name,
+                "QUESTIONS_BUCKET_NAME": questions_bucket.bucket_name,
+                "FLASHCARDS_TABLE_NAME": flashcards_table.table_name
+            }
+        )
+        course_table.grant_read_data(self.get_chapter_bundle_function)
+        lesson_bucket.grant_read(self.get_chapter_bundle_function)
+        questions_bucket.grant_read(self.get_chapter_bundle_function)
+        flashcards_table.grant_read_data(self.get_chapter_bundle_function)
+
+        # WebSocket API routes (see websocket_api). $connect checks the client's Cognito access token
+        self.websocket_connect_function = _lambda.Function(
+            self, "WebSocketConnectFunction",
+            runtime=_lambda.Runtime.PYTHON_3_13,
+            handler="lambda_handler.lambda_handler",
+            code=_lambda.Code.from_asset("lesson_buddy_api/functions/websocket_connect"),
+            timeout=Duration.seconds(10),
+            environment={
+                "CONNECTIONS_TABLE_NAME": connections_table.table_name
+            }
+        )
+        connections_table.grant_write_data(self.websocket_connect_function)
+
+        self.websocket_disconnect_function = _lambda.Function(
+            self, "WebSocketDisconnectFunction",
+            runtime=_lambda.Runtime.PYTHON_3_13,
+            handler="lambda_handler.lambda_handler",
+            code=_lambda.Code.from_asset("lesson_buddy_api/functions/websocket_disconnect"),
+            timeout=Duration.seconds(10),
+            environment={
+                "CONNECTIONS_TABLE_NAME": connections_table.table_name
+            }
+        )
+        connections_table.grant_write_data(self.websocket_disconnect_function)
+
+        # Pushes chapter status and course plan changes from the course table stream to the
+        # user's WebSocket connections. WEBSOCKET_CALLBACK_URL is added by websocket_api.
+        self.push_generation_progress_function = _lambda.Function(
+            self, "PushGenerationProgressFunction",
+            runtime=_lambda.Runtime.PYTHON_3_13,
+            handler="lambda_handler.lambda_handler",
+            code=_lambda.Code.from_asset("lesson_buddy_api/functions/push_generation_progress"),
+            layers=[self.shared_layer], # course_store
+            timeout=Duration.seconds(30),
+            environment={
+                "CONNECTIONS_TABLE_NAME": connections_table.table_name
+            }
+        )
+        connections_table.grant_read_write_data(self.push_generation_progress_function) # Removes gone connections
+        self.push_generation_progress_function.add_event_source(lambda_event_sources.DynamoEventSource(
+            course_table,
+            starting_position=_lambda.StartingPosition.LATEST,
+            batch_size=100,
+            max_batching_window=Duration.seconds(1), # Coalesces the parallel status writes of a chapter
+            retry_attempts=2,
+            filters=[_lambda.FilterCriteria.filter({"eventName": _lambda.FilterRule.is_equal("MODIFY")})]
+        ))
@@ -4,6 +4,8 @@ import os
 import base64
 from botocore.exceptions import ClientError # For DynamoDB specific errors
 
+import course_store # Provided by the shared layer
+
 sfn_client = boto3.client('stepfunctions')
 dynamodb_resource = boto3.resource('dynamodb')
 
@@ -118,14 +120,9 @@ def handler(event, context):
                 course_table = dynamodb_resource.Table(course_table_name) # type: ignore
                 
                 try:
-                    # Use actual DynamoDB key names: CourseID, UserID
-                    db_response = course_table.get_item(
-                        Key={'CourseID': event_course_id, 'UserID': event_user_id}
-                    )
-                    item = db_response.get('Item', {})
-                    
-                    chapters_status_map = item.get('chapters_status', {})
-                    chapter_specific_statuses = chapters_status_map.get(event_chapter_id, {})
+                    # Always read, since a chapter can be regenerated after COMPLETED; only the
+                    # chapter's status is read (the whole item for courses not yet migrated)
+                    chapter_specific_statuses = course_store.load_chapter_status(course_table, event_course_id, event_user_id, event_chapter_id) or {}
                     
                     lessons_status = chapter_specific_statuses.get('lessons_status', 'PENDING')
                     mcqs_status = chapter_specific_statuses.get('mcqs_status', 'PENDING')
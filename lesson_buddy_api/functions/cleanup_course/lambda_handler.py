@@ -0,0 +1,120 @@
+import json
+import os
+import boto3
+from botocore.exceptions import ClientError
+
+from content_store import course_prefix # Provided by the shared layer
+
+s3_client = boto3.client('s3')
+sfn_client = boto3.client('stepfunctions')
+dynamodb = boto3.resource('dynamodb')
+
+DELETE_OBJECTS_BATCH_SIZE = 1000 # DeleteObjects limit per call
+
+
+def _stop_executions(course_id, execution_arns):
+    """
+    Stops the course's chapter generations that are still running, so nothing is written
+    after cleanup. Only the executions recorded on the course's chapter items are checked.
+    """
+    stopped = 0
+    for arn in execution_arns:
+        try:
+            if sfn_client.describe_execution(executionArn=arn)['status'] != 'RUNNING':
+                continue
+            sfn_client.stop_execution(executionArn=arn, cause=f"Course {course_id} was deleted.")
+            stopped += 1
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ExecutionDoesNotExist':
+                raise
+    return stopped
+
+
+def _delete_objects(bucket_name, keys):
+    """Deletes `keys` with DeleteObjects, up to 1,000 per call."""
+    for start in range(0, len(keys), DELETE_OBJECTS_BATCH_SIZE):
+        batch = keys[start:start + DELETE_OBJECTS_BATCH_SIZE]
+        response = s3_client.delete_objects(
+            Bucket=bucket_name,
+            Delete={'Objects': [{'Key': key} for key in batch], 'Quiet': True}
+        )
+        errors = response.get('Errors', [])
+        if errors:
+            raise RuntimeError(f"Could not delete {len(errors)} objects from {bucket_name}, e.g. {errors[0]}")
+    return len(keys)
+
+
+def _delete_prefix(bucket_name, prefix):
+    """Deletes every object under `prefix`, a listed page (up to 1,000 keys) at a time."""
+    deleted = 0
+    paginator = s3_client.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix):
+        keys = [obj['Key'] for obj in page.get('Contents', [])]
+        if keys:
+            deleted += _delete_objects(bucket_name, keys)
+    return deleted
+
+
+def _delete_flashcards(course_id, lessons):
+    """Deletes every card of the course's lesson partitions with paginated key queries and batched writes."""
+    table = dynamodb.Table(os.environ['FLASHCARDS_TABLE_NAME'])
+    deleted = 0
+    with table.batch_writer() as batch:
+        for lesson in lessons:
+            lesson_flashcard_id = f"FLASHCARD#{course_id}#{lesson['chapter_id']}#{lesson['lesson_id']}"
+            query_kwargs = {
+                'KeyConditionExpression': "LessonFlashcardId = :lesson_id",
+                'ExpressionAttributeValues': {':lesson_id': lesson_flashcard_id},
+                'ProjectionExpression': "LessonFlashcardId, CardId"
+            }
+            while True:
+                response = table.query(**query_kwargs)
+                for item in response.get('Items', []):
+                    batch.delete_item(Key={'LessonFlashcardId': item['LessonFlashcardId'], 'CardId': item['CardId']})
+                    deleted += 1
+                if 'LastEvaluatedKey' not in response:
+                    break
+                query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    return deleted
+
+
+def _cleanup(job):
+    course_id = job.get('course_id')
+    user_id = job.get('user_id')
+    if not course_id or not user_id:
+        print(f"Ignoring cleanup message without course_id and user_id: {job}")
+        return
+
+    stopped = _stop_executions(course_id, job.get('executions') or [])
+
+    lesson_bucket = os.environ['LESSON_BUCKET_NAME']
+    questions_bucket = os.environ['QUESTIONS_BUCKET_NAME']
+    deleted_objects = sum([
+        _delete_prefix(lesson_bucket, course_prefix(user_id, course_id)),
+        _delete_prefix(questions_bucket, course_prefix(user_id, course_id)),
+        _delete_prefix(lesson_bucket, f"{course_id}-"), # Flat keys from before per-course prefixes
+        _delete_prefix(questions_bucket, f"{course_id}-"),
+        _delete_prefix(os.environ['COURSE_IMAGES_BUCKET_NAME'], f"course-covers/{course_id}"), # Variants, and older single .png covers
+        _delete_objects(lesson_bucket, [f"course-plan-jobs/{course_id}.json"])
+    ])
+    deleted_cards = _delete_flashcards(course_id, job.get('lessons') or [])
+
+    print(f"Cleaned up course {course_id}: stopped {stopped} executions, deleted {deleted_objects} objects and {deleted_cards} flashcards")
+
+
+def lambda_handler(event, context):
+    """
+    Consumes the course cleanup queue that delete_course feeds. Removes everything generated
+    for a deleted course: running chapter generations, lesson and question objects, cover
+    images and flashcards. Every step is idempotent, so failed messages are reported as batch
+    item failures and simply run again.
+    """
+    batch_item_failures = []
+    for record in event.get('Records', []):
+        try:
+            _cleanup(json.loads(record['body']))
+        except Exception as e:
+            print(f"Error processing cleanup message {record['messageId']}: {str(e)}")
+            batch_item_failures.append({"itemIdentifier": record['messageId']})
+
+    return {"batchItemFailures": batch_item_failures}
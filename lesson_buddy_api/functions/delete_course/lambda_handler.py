@@ -2,9 +2,14 @@ import json
 import os
 import boto3
 
+import course_store # Provided by the shared layer
+
+sqs_client = boto3.client('sqs')
+
 def lambda_handler(event, context):
     """
-    Handles the deletion of a course.
+    Handles the deletion of a course. The course items are deleted right away; everything
+    generated for it is removed in the background (see cleanup_course).
     """
     print(f"Received event: {event}")
 
@@ -69,15 +74,9 @@ def lambda_handler(event, context):
     courses_table = dynamodb.Table(courses_table_name)
 
     try:
-        response = courses_table.delete_item(
-            Key={
-                'CourseID': course_id,
-                'UserID': user_id
-            }
-        )
-        print(f"DynamoDB delete_item response: {response}")
-
-        if response.get('ResponseMetadata', {}).get('HTTPStatusCode') == 200:
+        course = course_store.load_course(courses_table, course_id, user_id)
+        if course is None:
+            # Already deleted (or never existed); deleting is idempotent
             return {
                 'statusCode': 200,
                 'headers': {
@@ -86,15 +85,39 @@ def lambda_handler(event, context):
                 },
                 'body': json.dumps({'message': f'Course {course_id} deleted successfully.'})
             }
-        else:
-            return {
-                'statusCode': 500,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                },
-                'body': json.dumps({'message': 'Failed to delete course.'})
-            }
+
+        # Generated content, cover images, flashcards and running generations are cleaned up
+        # asynchronously by cleanup_course. The job is queued before the course items are
+        # deleted, so a failed send leaves the course in place to retry rather than orphaning
+        # its content. Flashcard partitions are keyed by lesson and generations are recorded on
+        # the chapter items, so the lesson IDs and execution ARNs travel with the job; the course
+        # items will be gone by the time it runs.
+        sqs_client.send_message(
+            QueueUrl=os.environ['CLEANUP_QUEUE_URL'],
+            MessageBody=json.dumps({
+                'course_id': course_id,
+                'user_id': user_id,
+                'executions': course_store.load_chapter_executions(courses_table, course_id, user_id),
+                'lessons': [
+                    {'chapter_id': chapter['id'], 'lesson_id': lesson['id']}
+                    for chapter in course.get('chapters') or [] if isinstance(chapter, dict) and chapter.get('id')
+                    for lesson in chapter.get('lessons') or [] if isinstance(lesson, dict) and lesson.get('id')
+                ]
+            })
+        )
+
+        # The course header and all of its chapter items go now, so the course disappears at once
+        deleted = course_store.delete_course(courses_table, course_id, user_id)
+        print(f"Deleted {deleted} items for course {course_id}")
+
+        return {
+            'statusCode': 200,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*'
+            },
+            'body': json.dumps({'message': f'Course {course_id} deleted successfully.'})
+        }
 
     except Exception as e:
         print(f"Error deleting course: {e}")
@@ -1,125 +1,21 @@
 import json
-from urllib import request, parse, error as urllib_error
 import boto3
-import time
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
 
-# --- Copied from generate_lesson_content/lambda_handler.py ---
-def get_api_info(model):
-    if model == 'gemini-2.5-flash':
-        url = 'https://generativelanguage.googleapis.com/v1beta/openai/chat/completions'
-        api_key = os.environ['API_KEY']
-        return url, api_key, 'gemini-2.5-flash-preview-05-20'
-    if model == 'gemini-2.5-pro':
-        url = 'https://generativelanguage.googleapis.com/v1beta/openai/chat/completions'
-        api_key = os.environ['API_KEY']
-        return url, api_key, 'gemini-2.5-pro-preview-05-06'
-    if model == 'claude-4-sonnet':
-        url = 'http://Bedroc-Proxy-xVtSm3tV6xYe-1727257641.us-east-1.elb.amazonaws.com/api/v1/chat/completions'
-        api_key = os.environ['BEDROCK_API_KEY']
-        return url, api_key, 'us.anthropic.claude-sonnet-4-20250514-v1:0'
-    if model == 'claude-3.7-sonnet':
-        url = 'http://Bedroc-Proxy-xVtSm3tV6xYe-1727257641.us-east-1.elb.amazonaws.com/api/v1/chat/completions'
-        api_key = os.environ['BEDROCK_API_KEY']
-        return url, api_key, 'us.anthropic.claude-3-7-sonnet-20250219-v1:0'
-    if model == 'claude-3.5-haiku':
-        url = 'http://Bedroc-Proxy-xVtSm3tV6xYe-1727257641.us-east-1.elb.amazonaws.com/api/v1/chat/completions'
-        api_key = os.environ['BEDROCK_API_KEY']
-        return url, api_key, 'us.anthropic.claude-3-5-haiku-20241022-v1:0'
-    if model == 'gemini-2.0-flash':
-        url = 'https://generativelanguage.googleapis.com/v1beta/openai/chat/completions'
-        api_key = os.environ['API_KEY']
-        return url, api_key, 'gemini-2.0-flash-001'
-    if model == 'gemini-2.0-flash-lite':
-        url = 'https://generativelanguage.googleapis.com/v1beta/openai/chat/completions'
-        api_key = os.environ['API_KEY']
-        return url, api_key, 'gemini-2.0-flash-lite-001'
-    raise ValueError(f"Unsupported model: {model}")
-
-def call_model(system_prompt, prompt, messages=None, output_format=None, tools=None, model='gemini-2.5-flash'):
-    url, api_key, model_name = get_api_info(model) # Renamed 'model' from get_api_info to 'model_name'
-
-    data = {
-        "model": model_name, # Use model_name here
-        "messages": [],
-        "max_tokens": 8192
-    }
-
-    data['messages'].append({"role": "system", "content": system_prompt})
-
-    if messages is not None:
-        data['messages'].extend(messages)
-    
-    data['messages'].append({"role": "user", "content": prompt})
-    
-    if output_format:
-        data['response_format'] = {
-            "type": "json_schema",
-            "json_schema": {
-                "name": "output",
-                "schema": output_format  
-            }
-        }
+from llm_client import call_model, prewarm # Provided by the shared layer
+from content_store import lesson_key, legacy_lesson_key, put_json
+from markdown_lint import lint_markdown
 
-    if tools:
-        data['tools'] = tools
+prewarm('gemini-2.5-flash')
 
-    data_bytes = json.dumps(data).encode('utf-8')
-    
-    max_retries = 5
-    base_delay = 1
-    max_delay = 10
-    
-    for attempt in range(max_retries + 1):
-        req = request.Request(url, data=data_bytes)
-        req.add_header('Content-Type', 'application/json')
-        req.add_header('Authorization', f'Bearer {api_key}')
-        
-        try:
-            with request.urlopen(req) as resp:
-                if resp.status == 200:
-                    content = resp.read()
-                    output = json.loads(content)
-                    # print(output) # Consider removing or conditionalizing print for production
-                    return output['choices'][0]['message']
-                else:
-                    # Log more details for HTTP errors
-                    error_content = resp.read().decode('utf-8') if resp.length > 0 else "No content" # type: ignore
-                    print(f"HTTP Error: {resp.status} - {resp.reason}. Response: {error_content}")
-                    raise urllib_error.HTTPError(url, resp.status, resp.reason, resp.headers, resp.fp) # type: ignore
-                    
-        except Exception as e:
-            if attempt == max_retries:
-                print(f"Error: Final attempt failed after {max_retries} retries: {e}")
-                return None
-            
-            is_http_error = isinstance(e, urllib_error.HTTPError)
-            is_url_error = isinstance(e, urllib_error.URLError)
-                
-            if (is_http_error and e.code == 503) or is_url_error:
-                delay = min(base_delay * (2 ** attempt), max_delay)
-                jitter = delay * 0.1 * (0.5 - (0.5 * attempt / max_retries))
-                sleep_time = delay + jitter
-                
-                print(f"Attempt {attempt + 1} failed. Retrying in {sleep_time:.2f} seconds... Error: {e}")
-                time.sleep(sleep_time)
-            else:
-                print(f"Non-retryable error: {e}")
-                return None
-    return None # Should be unreachable if loop completes, but as a fallback
-
-# --- End of copied functions ---
-
-def _fix_markdown_for_all_sections(lesson_dict):
-    """
-    Iterates through a dictionary of lesson content and uses an LLM to fix markdown.
-    """
-    if not isinstance(lesson_dict, dict):
-        print(f"Error: Expected a dictionary for lesson_dict, got {type(lesson_dict)}. Returning as is.")
-        return lesson_dict
+MAX_FIX_WORKERS = 6
+SECTION_FIX_TIMEOUT_SECONDS = 90 # Upper bound for a single section, even with plenty of Lambda time left
+SAVE_RESERVE_SECONDS = 15 # Time kept back for saving the lesson to S3 after fixing
+METRICS_NAMESPACE = "LessonBuddy/FixLessonMarkdown"
 
-    fixed_lesson_dict = {}
-    system_prompt = """You are a markdown expert. The following text is a part of an educational lesson. 
+SYSTEM_PROMPT = """You are a markdown expert. The following text is a part of an educational lesson. 
 Please review the provided text and correct any markdown formatting issues. 
 Ensure that headings (e.g., #, ##), lists (e.g., *, -, 1.), bold/italic text (e.g., **, *, __, _), 
 code blocks (e.g., ``` ```), inline code (e.g., ` `), blockquotes (e.g., >), and links (e.g., [text](url)) 
@@ -129,47 +25,107 @@ If the markdown is already correct, return the original text.
 If the provided text appears to be a section of a larger document and does not begin with a markdown header (e.g., #, ##, ###), please add an appropriate H2 header (e.g., "## Section Title") at the beginning of the text. Infer a suitable title from the content if one is not obvious. Make sure not to include the section number in the header. If there is an H1 header, please replace it with an H2 header.
 Finally, if any content appears incomplete, please ensure it is complete and coherent, as if it were a standalone section of a lesson. Only add what is necessary to make it complete, without altering the original meaning or intent of the content.
 """
+
+
+def _fix_section(section_id, section_content, deadline):
+    """
+    Uses an LLM to fix the markdown of a single section, giving up at `deadline` (retries
+    included). Returns the original content if the call fails.
+    """
+    print(f"Attempting to fix markdown for section: {section_id}")
+    try:
+        # Using a potentially faster/cheaper model for markdown fixing
+        model_output = call_model(SYSTEM_PROMPT, section_content, model='gemini-2.5-flash', deadline=deadline)
+        if model_output and 'content' in model_output:
+            # Apply the local fixes to the LLM's answer too (wrapping backticks, H1s, list indentation)
+            corrected_content, _, _ = lint_markdown(model_output['content'])
+            print(f"Markdown fixed for section: {section_id}")
+            return corrected_content
+        else:
+            print(f"Error: call_model did not return expected output for markdown fixing of section {section_id}. Using original content.")
+            return section_content
+    except Exception as e:
+        print(f"Exception during markdown fixing for section {section_id}: {e}. Using original content.")
+        return section_content
+
+
+def _emit_metrics(course_id, **counts):
+    """Logs counts in CloudWatch Embedded Metric Format so they become metrics without an API call."""
+    print(json.dumps({
+        "_aws": {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [{
+                "Namespace": METRICS_NAMESPACE,
+                "Dimensions": [[]],
+                "Metrics": [{"Name": name, "Unit": "Count"} for name in counts]
+            }]
+        },
+        "course_id": course_id,
+        **counts
+    }))
+
+
+def _fix_markdown_for_all_sections(lesson_dict, context=None, course_id=None):
+    """
+    Fixes the markdown of every section in a dictionary of lesson content. Sections that pass
+    the local structural checks are fixed without a model call; the rest are sent to the LLM
+    concurrently, and any section not fixed before the deadline derived from the Lambda's
+    remaining time keeps its locally fixed content. The deadline bounds every model call,
+    retries included, so no call outlives the invocation.
+    """
+    if not isinstance(lesson_dict, dict):
+        print(f"Error: Expected a dictionary for lesson_dict, got {type(lesson_dict)}. Returning as is.")
+        return lesson_dict
+
+    fixed_lesson_dict = dict(lesson_dict)
+    sections_to_fix = {}
+    locally_fixed_count = 0
     for section_id, section_content in lesson_dict.items():
         if not isinstance(section_content, str) or not section_content.strip():
             print(f"Skipping markdown fixing for section {section_id} due to empty or non-string content.")
-            fixed_lesson_dict[section_id] = section_content
             continue
+        linted_content, fixes, problems = lint_markdown(section_content)
+        fixed_lesson_dict[section_id] = linted_content
+        if problems:
+            print(f"Section {section_id} failed structural checks ({', '.join(problems)}), sending it to the LLM.")
+            sections_to_fix[section_id] = linted_content
+        else:
+            locally_fixed_count += 1
+            print(f"Section {section_id} passed structural checks, skipping the LLM. Local fixes: {fixes or 'none'}")
+
+    _emit_metrics(
+        course_id,
+        SectionsSkippedLLM=locally_fixed_count,
+        SectionsSentToLLM=len(sections_to_fix)
+    )
+
+    if not sections_to_fix:
+        return fixed_lesson_dict
+
+    budget_seconds = SECTION_FIX_TIMEOUT_SECONDS
+    if context is not None:
+        budget_seconds = min(budget_seconds, context.get_remaining_time_in_millis() / 1000 - SAVE_RESERVE_SECONDS)
+    if budget_seconds <= 0:
+        print("Warning: Not enough time left to fix markdown with the LLM. Using locally fixed content.")
+        return fixed_lesson_dict
+    deadline = time.time() + budget_seconds
+
+    # call_model gives up at the deadline, so leaving the with block never waits much past it
+    with ThreadPoolExecutor(max_workers=min(MAX_FIX_WORKERS, len(sections_to_fix))) as executor:
+        futures = {
+            executor.submit(_fix_section, section_id, section_content, deadline): section_id
+            for section_id, section_content in sections_to_fix.items()
+        }
+        done, not_done = wait(futures, timeout=max(0, deadline - time.time()))
+        for future in done:
+            fixed_lesson_dict[futures[future]] = future.result()
+        for future in not_done:
+            future.cancel() # Sections still queued behind busy workers never start
+            print(f"Warning: Markdown fixing for section {futures[future]} did not finish before the deadline. Using locally fixed content.")
 
-        print(f"Attempting to fix markdown for section: {section_id}")
-        try:
-            # Using a potentially faster/cheaper model for markdown fixing
-            model_output = call_model(system_prompt, section_content, model='gemini-2.5-flash') 
-            if model_output and 'content' in model_output:
-                content_to_fix = model_output['content']
-                corrected_content = "" # Initialize
-
-                # Pattern 1: ```markdown\n{content}\n```
-                if content_to_fix.startswith("```markdown\n") and content_to_fix.endswith("\n```"):
-                    corrected_content = content_to_fix[len("```markdown\n"):-len("\n```")]
-                # Pattern 2: ```\n{content}\n``` (handles cases where LLM adds newlines inside the backticks)
-                elif content_to_fix.startswith("```\n") and content_to_fix.endswith("\n```"):
-                    corrected_content = content_to_fix[len("```\n"):-len("\n```")]
-                # Pattern 3: ```{content}``` (no newlines immediately after/before backticks, content might be multi-line)
-                elif content_to_fix.startswith("```") and content_to_fix.endswith("```"):
-                    corrected_content = content_to_fix[3:-3]
-                # Pattern 4: `{content}` (single backticks)
-                elif content_to_fix.startswith("`") and content_to_fix.endswith("`"):
-                    corrected_content = content_to_fix[1:-1]
-                else:
-                    corrected_content = content_to_fix # No stripping needed
-                
-                # Final strip for any leading/trailing whitespace that might remain or be part of the content itself.
-                fixed_lesson_dict[section_id] = corrected_content.strip()
-                print(f"Markdown fixed for section: {section_id}")
-            else:
-                print(f"Error: call_model did not return expected output for markdown fixing of section {section_id}. Using original content.")
-                fixed_lesson_dict[section_id] = section_content
-        except Exception as e:
-            print(f"Exception during markdown fixing for section {section_id}: {e}. Using original content.")
-            fixed_lesson_dict[section_id] = section_content
-            
     return fixed_lesson_dict
 
+
 def lambda_handler(event, context):
     print("Fix Lesson Markdown Lambda invoked with event:", json.dumps(event))
 
@@ -180,6 +136,7 @@ def lambda_handler(event, context):
     chapter_id = event.get('chapter_id')
     lesson_id = event.get('lesson_id')
     course_id = event.get('course_id')
+    user_id = event.get('user_id') # Absent from executions started before per-course keys
 
     if not all([lesson_content_raw, chapter_id, lesson_id, course_id]):
         missing_keys = [k for k, v in {'lesson_content': lesson_content_raw, 'chapter_id': chapter_id, 'lesson_id': lesson_id, 'course_id': course_id}.items() if not v]
@@ -204,7 +161,7 @@ def lambda_handler(event, context):
 
     print(f"Processing lesson: CourseID={course_id}, ChapterID={chapter_id}, LessonID={lesson_id}")
 
-    fixed_lesson_content = _fix_markdown_for_all_sections(lesson_content_raw)
+    fixed_lesson_content = _fix_markdown_for_all_sections(lesson_content_raw, context, course_id)
 
     # Save the fixed lesson content to S3
     s3 = boto3.client('s3')
@@ -214,9 +171,12 @@ def lambda_handler(event, context):
         print(error_msg)
         raise ValueError(error_msg)
     
-    s3_key = f"{course_id}-{chapter_id}-{lesson_id}.json"
+    if user_id:
+        s3_key = lesson_key(user_id, course_id, chapter_id, lesson_id)
+    else:
+        s3_key = legacy_lesson_key(course_id, chapter_id, lesson_id)
     try:
-        s3.put_object(Bucket=bucket_name, Key=s3_key, Body=json.dumps(fixed_lesson_content))
+        put_json(s3, bucket_name, s3_key, fixed_lesson_content) # Stored gzip-encoded
         print(f"Successfully saved fixed lesson content to S3: s3://{bucket_name}/{s3_key}")
     except Exception as e:
         print(f"Error saving fixed lesson content to S3 (s3://{bucket_name}/{s3_key}): {e}")
@@ -235,5 +195,6 @@ def lambda_handler(event, context):
         "chapter_id": chapter_id,
         "lesson_id": lesson_id,
         "course_id": course_id,         
+        "user_id": user_id,
         "lesson_s3_url": s3_url # Return S3 URL instead of content
     }
@@ -0,0 +1,264 @@
+"""
+Structural checks and fixes for generated lesson sections.
+
+Handles the formatting problems the LLM fixer is most often asked to correct without a
+model call: stray backticks wrapping the whole section, unclosed code fences, H1 or bold
+"headings" instead of an H2, and nested list items indented too little for CommonMark to
+nest them. Fence, heading and list rules follow CommonMark; lines inside fenced or indented
+code blocks are never rewritten. Anything that can't be fixed locally is reported so the
+caller can fall back to the LLM.
+"""
+import re
+
+FENCE_RE = re.compile(r'^( {0,3})(`{3,}|~{3,})(.*)$')
+BACKTICK_FENCE_RE = re.compile(r'^[ \t]*`{3,}') # Any indent, so fences nested in list items count too
+ATX_HEADING_RE = re.compile(r'^ {0,3}(#{1,6})(?:[ \t]+|$)(.*)$')
+SETEXT_H1_RE = re.compile(r'^ {0,3}=+[ \t]*$')
+BOLD_LINE_RE = re.compile(r'^ {0,3}(?:\*\*|__)(.+?)(?:\*\*|__):?[ \t]*$')
+LIST_ITEM_RE = re.compile(r'^([ \t]*)([-+*]|\d{1,9}[.)])([ \t]+|$)')
+THEMATIC_BREAK_RE = re.compile(r'^ {0,3}([-*_])(?:[ \t]*\1){2,}[ \t]*$')
+
+# Problems the linter can detect but not fix on its own
+MISSING_HEADING = "missing_heading"
+UNBALANCED_EMPHASIS = "unbalanced_emphasis"
+
+
+def _has_fence_line(text):
+    return any(BACKTICK_FENCE_RE.match(line) for line in text.split('\n'))
+
+
+def strip_wrapping_backticks(text):
+    """
+    Removes backticks wrapping the whole text, e.g. an LLM answer returned as a ```markdown
+    block. A section that merely starts and ends with code blocks (another fence line between
+    the outer ones) is left alone.
+    """
+    stripped = text.strip()
+    # Pattern 1: ```markdown\n{content}\n```
+    if stripped.startswith("```markdown\n") and stripped.endswith("\n```"):
+        inner = stripped[len("```markdown\n"):-len("\n```")]
+        if not _has_fence_line(inner):
+            return inner.strip()
+    # Pattern 2: ```\n{content}\n``` (handles cases where LLM adds newlines inside the backticks)
+    if stripped.startswith("```\n") and stripped.endswith("\n```"):
+        inner = stripped[len("```\n"):-len("\n```")]
+        if not _has_fence_line(inner):
+            return inner.strip()
+    # Pattern 2b: ```markdown / ```md opening without the newline before the closing backticks
+    for opening in ("```markdown", "```md"):
+        if stripped.startswith(opening + "\n") and stripped.endswith("```"):
+            inner = stripped[len(opening):-3]
+            if not _has_fence_line(inner):
+                return inner.strip()
+    # Pattern 3: ```{content}``` on a single line
+    if stripped.startswith("```") and stripped.endswith("```") and len(stripped) > 6 and '\n' not in stripped:
+        return stripped[3:-3].strip()
+    # Pattern 4: `{content}` (single backticks around the whole text)
+    if stripped.startswith("`") and stripped.endswith("`") and not stripped.startswith("``") and stripped.count("`") == 2:
+        return stripped[1:-1].strip()
+    return stripped
+
+
+def _expand_leading_tabs(line):
+    indent = len(line) - len(line.lstrip(' \t'))
+    return line[:indent].expandtabs(4) + line[indent:]
+
+
+def _indent(line):
+    line = _expand_leading_tabs(line)
+    return len(line) - len(line.lstrip(' '))
+
+
+def _opening_fence(line, column):
+    """Returns the fence string if `line` opens a fenced code block in a container at `column`."""
+    line = _expand_leading_tabs(line)
+    if _indent(line) - column > 3:
+        return None
+    match = FENCE_RE.match(line[column:])
+    # Backtick fence info strings may not contain backticks
+    if match and not (match.group(2)[0] == '`' and '`' in match.group(3)):
+        return match.group(2)
+    return None
+
+
+def _closes_fence(line, fence, column):
+    stripped = line.strip()
+    if _indent(line) - column > 3 or not stripped.startswith(fence[0] * len(fence)):
+        return False
+    return not stripped.lstrip(fence[0]).strip()
+
+
+def _scan_code(lines):
+    """
+    Marks the lines that belong to fenced code blocks (fence lines included) and to indented
+    code blocks. Inside a list, fences and code indentation are measured from the open list
+    item's content column, as CommonMark does, so a fence indented under "1. " is still a
+    fence and "- x" inside it is YAML rather than a nested item.
+    Returns (flags, open fence line or None if every fence is closed).
+    """
+    flags = []
+    open_fence = None # (fence, container column, indent of the opening fence)
+    in_indented_code = None # container column of the open indented code block
+    list_columns = [] # content columns of the open list items, innermost last
+    previous = ''
+    for line in lines:
+        indent = _indent(line)
+        if open_fence is not None:
+            flags.append(True)
+            if _closes_fence(line, open_fence[0], open_fence[1]):
+                open_fence = None
+            previous = line
+            continue
+        if in_indented_code is not None and (not line.strip() or indent >= in_indented_code + 4):
+            flags.append(True)
+            previous = line
+            continue
+        in_indented_code = None
+        if not line.strip():
+            flags.append(False)
+            previous = line
+            continue
+
+        column = max([c for c in list_columns if c <= indent], default=0)
+        fence = _opening_fence(line, column)
+        if fence:
+            open_fence = (fence, column, indent)
+            flags.append(True)
+        elif indent >= column + 4 and (not previous.strip() or ATX_HEADING_RE.match(previous)):
+            in_indented_code = column
+            flags.append(True)
+        else:
+            match = LIST_ITEM_RE.match(_expand_leading_tabs(line))
+            if match and not THEMATIC_BREAK_RE.match(line):
+                while list_columns and indent < list_columns[-1]:
+                    list_columns.pop()
+                spacing = match.group(3) or ' '
+                list_columns.append(indent + len(match.group(2)) + (len(spacing) if len(spacing) <= 4 else 1))
+            elif indent == 0:
+                list_columns = [] # Unindented paragraph text ends any open list
+            flags.append(False)
+        previous = line
+    return flags, ' ' * open_fence[2] + open_fence[0] if open_fence else None
+
+
+def _close_fences(lines):
+    """Appends a closing fence for a fenced code block that runs to the end of the section."""
+    _, open_fence = _scan_code(lines)
+    if open_fence is not None:
+        return lines + [open_fence], True
+    return lines, False
+
+
+def _code_line_flags(lines):
+    return _scan_code(lines)[0]
+
+
+def _fix_headings(lines, in_code):
+    """Demotes H1s to H2 and makes sure the section starts with a heading."""
+    fixes = []
+    result = []
+    for i, line in enumerate(lines):
+        if in_code[i]:
+            result.append(line)
+            continue
+        match = ATX_HEADING_RE.match(line)
+        if match and len(match.group(1)) == 1:
+            result.append(f"## {match.group(2).strip()}")
+            fixes.append("h1_to_h2")
+            continue
+        if SETEXT_H1_RE.match(line) and result and result[-1].strip() and not in_code[i - 1]:
+            result[-1] = f"## {result[-1].strip()}"
+            fixes.append("h1_to_h2")
+            continue
+        result.append(line)
+
+    first = next((i for i, line in enumerate(result) if line.strip()), None)
+    if first is None:
+        return result, fixes, [MISSING_HEADING]
+    if ATX_HEADING_RE.match(result[first]) or (first + 1 < len(result) and re.match(r'^ {0,3}(=+|-+)[ \t]*$', result[first + 1])):
+        return result, fixes, []
+    bold = BOLD_LINE_RE.match(result[first])
+    if bold:
+        result[first] = f"## {bold.group(1).strip()}"
+        fixes.append("bold_line_to_h2")
+        return result, fixes, []
+    # A title has to be inferred from the content, which needs the LLM
+    return result, fixes, [MISSING_HEADING]
+
+
+def _fix_list_indentation(lines, in_code):
+    """
+    Re-indents nested list items to their parent item's content column. LLMs often indent
+    children of "1." items by two spaces, which CommonMark renders as a new top-level list.
+    """
+    fixed = False
+    result = []
+    stack = [] # (original indent, new indent, content column in the new text)
+    for i, line in enumerate(lines):
+        if in_code[i]:
+            result.append(line)
+            continue
+        if not line.strip():
+            result.append(line)
+            continue
+        line = _expand_leading_tabs(line)
+        match = LIST_ITEM_RE.match(line)
+        indent = len(match.group(1)) if match else len(line) - len(line.lstrip(' '))
+        if not match or THEMATIC_BREAK_RE.match(line):
+            if indent == 0:
+                stack = [] # Unindented paragraph text ends any open list
+            result.append(line)
+            continue
+
+        while stack and indent < stack[-1][0]:
+            stack.pop()
+        if stack and indent == stack[-1][0]:
+            new_indent = stack.pop()[1]
+        elif stack:
+            new_indent = stack[-1][2] # Child of the item on top of the stack
+        else:
+            new_indent = indent if indent <= 3 else 0
+
+        marker, spacing = match.group(2), match.group(3) or ' '
+        new_line = ' ' * new_indent + line[indent:]
+        if new_line != line:
+            fixed = True
+        stack.append((indent, new_indent, new_indent + len(marker) + len(spacing)))
+        result.append(new_line)
+    return result, fixed
+
+
+def _has_unbalanced_bold(lines, in_code):
+    text = '\n'.join(line for i, line in enumerate(lines) if not in_code[i])
+    text = re.sub(r'`[^`\n]*`', '', text) # Inline code may legitimately contain asterisks
+    return text.count('**') % 2 == 1
+
+
+def lint_markdown(text):
+    """
+    Applies the local fixes to a section.
+    Returns (fixed text, list of fixes applied, list of problems that still need the LLM).
+    """
+    fixes = []
+    content = strip_wrapping_backticks(text)
+    if content != text.strip():
+        fixes.append("stripped_wrapping_backticks")
+
+    lines = content.split('\n')
+    lines, closed = _close_fences(lines)
+    if closed:
+        fixes.append("closed_code_fence")
+
+    in_code = _code_line_flags(lines)
+    lines, heading_fixes, problems = _fix_headings(lines, in_code)
+    fixes.extend(heading_fixes)
+    in_code = _code_line_flags(lines) # Setext headings collapse to one line
+
+    lines, list_fixed = _fix_list_indentation(lines, in_code)
+    if list_fixed:
+        fixes.append("list_indentation")
+
+    if _has_unbalanced_bold(lines, in_code):
+        problems.append(UNBALANCED_EMPHASIS)
+
+    return '\n'.join(lines).strip(), fixes, problems
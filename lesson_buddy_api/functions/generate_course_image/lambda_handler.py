@@ -0,0 +1,102 @@
+import json
+import boto3
+import base64
+import io
+import os
+import random
+from botocore.exceptions import ClientError
+from PIL import Image
+
+bedrock_client = boto3.client("bedrock-runtime", region_name="us-east-1")
+s3_client = boto3.client("s3")
+dynamodb = boto3.resource('dynamodb')
+
+# Square sizes rendered from the 1024x1024 Nova Canvas image
+VARIANT_SIZES = {
+    'thumbnail': 128, # Course list
+    'card': 512,      # Course screen header
+    'full': 1024
+}
+FORMATS = {
+    'webp': {'format': 'WEBP', 'content_type': 'image/webp', 'options': {'quality': 80, 'method': 6}},
+    'jpeg': {'format': 'JPEG', 'content_type': 'image/jpeg', 'options': {'quality': 82, 'optimize': True, 'progressive': True}}
+}
+# Variant stored in cover_image_url for clients that don't know about cover_image_variants
+DEFAULT_VARIANT = ('card', 'jpeg')
+
+
+def variant_key(course_id, variant, extension):
+    return f"course-covers/{course_id}/{variant}.{extension}"
+
+
+def generate_image(course_title):
+    """Renders a cover image for the course with Amazon Nova Canvas. Returns the PNG bytes."""
+    prompt = f"A stylized, artistic, and inviting cover image for a course titled '{course_title}'. The image should be relevant to the topic and visually appealing."
+
+    native_request = {
+        "taskType": "TEXT_IMAGE",
+        "textToImageParams": {"text": prompt},
+        "imageGenerationConfig": {
+            "seed": random.randint(0, 858993459),
+            "quality": "standard",
+            "height": 1024,
+            "width": 1024,
+            "numberOfImages": 1,
+        },
+    }
+    response = bedrock_client.invoke_model(modelId="amazon.nova-canvas-v1:0", body=json.dumps(native_request))
+    model_response = json.loads(response["body"].read())
+    return base64.b64decode(model_response["images"][0])
+
+
+def encode_variants(image_data):
+    """Yields (variant, extension, content type, bytes) for every size and format."""
+    image = Image.open(io.BytesIO(image_data)).convert('RGB')
+    for variant, size in VARIANT_SIZES.items():
+        resized = image if image.size == (size, size) else image.resize((size, size), Image.LANCZOS)
+        for extension, spec in FORMATS.items():
+            buffer = io.BytesIO()
+            resized.save(buffer, format=spec['format'], **spec['options'])
+            yield variant, extension, spec['content_type'], buffer.getvalue()
+
+
+def lambda_handler(event, context):
+    """
+    Generates the cover image of a new course and patches it onto the course item.
+    Invoked asynchronously by generate_course_plan once the plan is saved, so plan requests
+    don't wait on image generation. Expects course_id, user_id and title.
+    """
+    print(f"Received event: {json.dumps(event)}")
+    course_id = event['course_id']
+    user_id = event['user_id']
+    title = event.get('title') or 'Untitled course'
+    bucket_name = os.environ['COURSE_IMAGES_BUCKET_NAME']
+
+    image_data = generate_image(title)
+
+    variants = {}
+    total_bytes = 0
+    for variant, extension, content_type, body in encode_variants(image_data):
+        s3_key = variant_key(course_id, variant, extension)
+        s3_client.put_object(Bucket=bucket_name, Key=s3_key, Body=body, ContentType=content_type)
+        variants.setdefault(variant, {})[extension] = f"s3://{bucket_name}/{s3_key}"
+        total_bytes += len(body)
+        print(f"Uploaded {variant} {extension} ({len(body)} bytes) to s3://{bucket_name}/{s3_key}")
+
+    cover_image_url = variants[DEFAULT_VARIANT[0]][DEFAULT_VARIANT[1]]
+    table = dynamodb.Table(os.environ['COURSE_TABLE_NAME'])
+    try:
+        table.update_item(
+            Key={'CourseID': course_id, 'UserID': user_id},
+            UpdateExpression="SET cover_image_url = :url, cover_image_variants = :variants",
+            ExpressionAttributeValues={':url': cover_image_url, ':variants': variants},
+            ConditionExpression="attribute_exists(CourseID)" # Don't recreate a course deleted in the meantime
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            print(f"Course {course_id} no longer exists, not recording its cover image.")
+            return {"course_id": course_id, "cover_image_url": None}
+        raise
+
+    print(f"Saved cover image for course {course_id} ({total_bytes} bytes across {len(VARIANT_SIZES) * len(FORMATS)} variants)")
+    return {"course_id": course_id, "cover_image_url": cover_image_url, "cover_image_variants": variants}
@@ -5,80 +5,359 @@ import base64
 import uuid
 import os
 import datetime
-import random
-from concurrent.futures import ThreadPoolExecutor
 
 from botocore.exceptions import ClientError # For DynamoDB error handling
 from urllib import error as urllib_error # For call_model HTTP errors
 
+import course_store # Provided by the shared layer
+
 # Create AWS clients
 bedrock_client = boto3.client("bedrock-runtime", region_name="us-east-1")
 s3_client = boto3.client("s3")
 sfn_client = boto3.client("stepfunctions") # Initialize Step Functions client
+lambda_client = boto3.client("lambda") # Starts the async worker and cover image generation
+
+# Async job requests larger than this go through S3 rather than the async invoke payload
+MAX_INLINE_JOB_BYTES = 200 * 1024
+
+class CoursePlanGenerationError(Exception):
+    """The LLM did not produce a usable course plan."""
+
+
+class CoursePlanSaveError(Exception):
+    """The course plan could not be written to the course table."""
+
+
+def _is_truthy(value):
+    return str(value).lower() in ('true', '1', 'yes')
+
+
+def _course_table():
+    dynamodb = boto3.resource('dynamodb')
+    table_name = os.environ.get('COURSE_TABLE_NAME')
+    # Assuming COURSE_TABLE_NAME is guaranteed by CDK as per user feedback
+    return dynamodb.Table(table_name) # type: ignore
+
+
+def _start_cover_image(course_id, user_id, title):
+    """Hands cover image generation to generate_course_image, which patches the course item when done."""
+    image_function_name = os.environ.get('IMAGE_FUNCTION_NAME')
+    if not image_function_name:
+        print("Warning: IMAGE_FUNCTION_NAME environment variable not set. Cover image not generated.")
+        return
+    try:
+        lambda_client.invoke(
+            FunctionName=image_function_name,
+            InvocationType='Event',
+            Payload=json.dumps({"course_id": course_id, "user_id": user_id, "title": title})
+        )
+        print(f"Started cover image generation for course {course_id}")
+    except ClientError as e:
+        # The course is usable without a cover image. Log and continue.
+        print(f"Error starting cover image generation: {str(e)}")
+
+
+def _start_first_chapter(course_plan, course_id, user_id):
+    # Trigger the Step Function for course content generation
+    step_function_arn = os.environ.get('STEP_FUNCTION_ARN')
+    if step_function_arn:
+        try:
+            # For each chapter, start a Step Function execution
+            for chapter in course_plan['chapters']:
+                chapter_id = chapter.get('id')
+                if chapter_id:
+                    sfn_input = {
+                        "course_id": course_id,
+                        "user_id": user_id,
+                        "chapter_id": chapter_id
+                    }
+                    sfn_client.start_execution(
+                        stateMachineArn=step_function_arn,
+                        input=json.dumps(sfn_input)
+                    )
+                    print(f"Started Step Function for chapter {chapter_id} of course {course_id}")
+                    # we only want to do it for the first chapter
+                    break
+        except ClientError as e:
+            print(f"Error starting Step Function execution: {str(e)}")
+            # Do not return error, as course plan is already saved. Log and continue.
+        except Exception as e:
+            print(f"Unexpected error triggering Step Function: {str(e)}")
+            # Do not return error, as course plan is already saved. Log and continue.
+    else:
+        print("Warning: STEP_FUNCTION_ARN environment variable not set. Step Function not triggered.")
+
+
+def _initial_chapters_status(chapters):
+    chapters_status = {}
+    timestamp = datetime.datetime.utcnow().isoformat()
+    for chapter in chapters:
+        chapter_id = chapter.get('id')
+        if chapter_id: # Ensure chapter has an ID
+            chapters_status[chapter_id] = {
+                'lessons_status': 'PENDING',
+                'mcqs_status': 'PENDING',
+                'flashcards_status': 'PENDING',
+                'last_updated': timestamp
+            }
+    return chapters_status
 
-def generate_course_image(course_title, course_id):
+
+def _merge_plan_details(skeleton, detailed):
+    """
+    Fills the skeleton's chapters and lessons with the descriptions and times from the detailed
+    plan. The skeleton's IDs, titles and order win; entries are matched by ID, then by position.
+    """
+    detailed_chapters = detailed.get('chapters', [])
+    detailed_by_id = {chapter.get('id'): chapter for chapter in detailed_chapters}
+    chapters = []
+    for c, skeleton_chapter in enumerate(skeleton['chapters']):
+        detail = detailed_by_id.get(skeleton_chapter['id'])
+        if detail is None and c < len(detailed_chapters):
+            detail = detailed_chapters[c]
+        detail = detail or {}
+
+        detailed_lessons = detail.get('lessons', [])
+        lessons_by_id = {lesson.get('id'): lesson for lesson in detailed_lessons}
+        lessons = []
+        for l, skeleton_lesson in enumerate(skeleton_chapter['lessons']):
+            lesson_detail = lessons_by_id.get(skeleton_lesson['id'])
+            if lesson_detail is None and l < len(detailed_lessons):
+                lesson_detail = detailed_lessons[l]
+            lessons.append({
+                'title': skeleton_lesson['title'],
+                'description': (lesson_detail or {}).get('description', ''),
+                'id': skeleton_lesson['id']
+            })
+
+        chapters.append({
+            'title': skeleton_chapter['title'],
+            'description': detail.get('description', ''),
+            'lessons': lessons,
+            'time': detail.get('time', ''),
+            'id': skeleton_chapter['id'],
+            'chapter_image_url': ""
+        })
+
+    return {
+        'title': skeleton['title'],
+        'description': detailed.get('description') or skeleton.get('description', ''),
+        'chapters': chapters
+    }
+
+
+def build_and_save_course_plan(course_id, user_id, data, skeleton=None, placeholder_saved=False):
     """
-    Generates a cover image for the course using Amazon Nova Canvas and uploads it to S3.
-    Returns the S3 URL of the uploaded image.
+    Generates and saves the course plan, then starts generation of the cover image and the
+    first chapter. Returns the saved course plan.
+    With a `skeleton` already saved for the course, the plan keeps its chapters and lessons and
+    only fills in the details, updating the item in place. With placeholder_saved (async jobs),
+    the plan replaces a placeholder item that must still exist.
+    Raises CoursePlanGenerationError, CoursePlanSaveError, or course_store.CourseDeletedError
+    if the course was deleted while its plan was generated.
     """
+    topic = data.get('topic','No topic provided')
+    timeline = data.get('timeline', '2 months')
+    difficulty = data.get('difficulty','easy')
+    custom_instructions = data.get('custom_instructions', None)
+    document_content = data.get('document_content', None) # New: Base64 encoded document content
+    document_type = data.get('document_type', None)       # New: MIME type of the document (e.g., 'image/png', 'application/pdf')
+
     try:
-        # Set the model ID.
-        model_id = "amazon.nova-canvas-v1:0"
-
-        # Define the image generation prompt for the model.
-        prompt = f"A stylized, artistic, and inviting cover image for a course titled '{course_title}'. The image should be relevant to the topic and visually appealing."
-
-        # Generate a random seed between 0 and 858,993,459
-        seed = random.randint(0, 858993460)
-
-        # Format the request payload using the model's native structure.
-        native_request = {
-            "taskType": "TEXT_IMAGE",
-            "textToImageParams": {"text": prompt},
-            "imageGenerationConfig": {
-                "seed": seed,
-                "quality": "standard",
-                "height": 1024,
-                "width": 1024,
-                "numberOfImages": 1,
-            },
-        }
+        course_plan = generate_course_plan(topic, timeline, difficulty, custom_instructions, document_content, document_type, skeleton)
+        if course_plan is None: # call_model now returns None on error
+            raise ValueError("Failed to generate course plan from LLM: Received no content.")                
+    except json.JSONDecodeError as e: # Catch this more specific error first
+        print(f"JSONDecodeError parsing LLM output: {str(e)}")
+        raise CoursePlanGenerationError(f'Failed to parse course plan from LLM: Invalid JSON format. {str(e)}') from e
+    except ValueError as e: # Catch other ValueErrors, including the one raised above
+        print(f"Error generating or parsing course plan: {str(e)}")
+        raise CoursePlanGenerationError(f'Failed to generate or parse course plan from LLM: {str(e)}') from e
+
+    if skeleton:
+        course_plan = _merge_plan_details(skeleton, course_plan)
+        course_plan['cover_image_url'] = None # Patched on by generate_course_image once it is ready
+        course_plan['CourseID'] = course_id
+        course_plan['UserID'] = user_id
+        course_plan['plan_status'] = 'COMPLETED'
+        print(course_plan)
 
-        # Convert the native request to JSON.
-        request_body = json.dumps(native_request)
+        # Chapter statuses were written with the skeleton; only replace the planned content
+        try:
+            table = _course_table()
+            course_store.update_chapter_details(table, course_id, user_id, course_plan['chapters'])
+            table.update_item(
+                Key={'CourseID': course_id, 'UserID': user_id},
+                UpdateExpression="SET #description = :description, plan_status = :plan_status",
+                ExpressionAttributeNames={'#description': 'description'},
+                ExpressionAttributeValues={
+                    ':description': course_plan['description'],
+                    ':plan_status': 'COMPLETED'
+                },
+                ConditionExpression="attribute_exists(CourseID)" # Never recreate a deleted course's header
+            )
+            print('Updated course skeleton with plan details in DynamoDB')
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                raise course_store.CourseDeletedError(f"Course {course_id} was deleted") from e
+            print(f"Error saving to DynamoDB: {str(e)}")
+            raise CoursePlanSaveError(f'Could not save course plan to database: {str(e)}') from e
 
-        # Invoke the model with the request.
-        response = bedrock_client.invoke_model(modelId=model_id, body=request_body)
+        _start_cover_image(course_id, user_id, course_plan['title'])
+        _start_first_chapter(course_plan, course_id, user_id)
+        return course_plan
 
-        # Decode the response body.
-        model_response = json.loads(response["body"].read())
+    # Add blank chapter_image_url to each chapter
+    for chapter in course_plan['chapters']:
+        chapter['chapter_image_url'] = ""
 
-        # Extract the image data.
-        base64_image_data = model_response["images"][0]
-        image_data = base64.b64decode(base64_image_data)
+    course_plan['cover_image_url'] = None # Patched on by generate_course_image once it is ready
+    course_plan['CourseID'] = course_id
+    course_plan['UserID'] = user_id
+    course_plan['plan_status'] = 'COMPLETED'
 
-        # Upload to S3
-        bucket_name = os.environ.get('COURSE_IMAGES_BUCKET_NAME')
-        if not bucket_name:
-            print("Error: COURSE_IMAGES_BUCKET_NAME environment variable not set.")
-            return None
+    # Initialize chapter statuses
+    course_plan['chapters_status'] = _initial_chapters_status(course_plan['chapters'])
 
-        # Generate a unique key for the image in S3
-        s3_key = f"course-covers/{course_id}.png"
+    print(course_plan)
+    
+    # save to dynamodb; an async job replaces its placeholder, which the user may have deleted
+    try:
+        course_store.save_course(_course_table(), course_plan, must_exist=placeholder_saved)
+        print('Saved to DynamoDB')
+    except ClientError as e:
+        print(f"Error saving to DynamoDB: {str(e)}")
+        raise CoursePlanSaveError(f'Could not save course plan to database: {str(e)}') from e
 
-        s3_client.put_object(Bucket=bucket_name, Key=s3_key, Body=image_data, ContentType='image/png')
-        print(f"Image uploaded to s3://{bucket_name}/{s3_key}")
+    _start_cover_image(course_id, user_id, course_plan['title'])
+    _start_first_chapter(course_plan, course_id, user_id)
+    return course_plan
 
-        # Construct the S3 URL in s3://bucket/key format
-        image_url = f"s3://{bucket_name}/{s3_key}"
-        return image_url
 
-    except ClientError as e:
-        print(f"Bedrock or S3 Client Error generating image: {str(e)}")
-        return None
+def _start_async_job(course_id, user_id, data):
+    """
+    Saves the course skeleton (or a placeholder if the skeleton could not be generated) and
+    hands the full plan to the worker function. Returns the saved item.
+    The course ID doubles as the job ID.
+    """
+    timestamp = datetime.datetime.utcnow().isoformat()
+    try:
+        skeleton = generate_course_skeleton(
+            data.get('topic', 'No topic provided'),
+            data.get('timeline', '2 months'),
+            data.get('difficulty', 'easy'),
+            data.get('custom_instructions', None),
+            data.get('document_content', None),
+            data.get('document_type', None)
+        )
     except Exception as e:
-        print(f"Unexpected error generating course image: {str(e)}")
-        return None
+        # The worker can still produce the whole plan in one go
+        print(f"Error generating course skeleton, continuing without it: {str(e)}")
+        skeleton = None
+
+    if skeleton:
+        course_item = {
+            'CourseID': course_id,
+            'UserID': user_id,
+            'title': skeleton['title'],
+            'description': skeleton.get('description', ''),
+            'cover_image_url': None,
+            'chapters': [
+                {
+                    'title': chapter['title'],
+                    'description': '',
+                    'lessons': [{'title': lesson['title'], 'description': '', 'id': lesson['id']} for lesson in chapter['lessons']],
+                    'time': '',
+                    'id': chapter['id'],
+                    'chapter_image_url': ""
+                }
+                for chapter in skeleton['chapters']
+            ],
+            'chapters_status': _initial_chapters_status(skeleton['chapters']),
+            'plan_status': 'SKELETON',
+            'plan_requested_at': timestamp
+        }
+    else:
+        course_item = {
+            'CourseID': course_id,
+            'UserID': user_id,
+            'title': data.get('topic', 'No topic provided'),
+            'description': '',
+            'chapters': [],
+            'chapters_status': {},
+            'plan_status': 'GENERATING',
+            'plan_requested_at': timestamp
+        }
+    course_store.save_course(_course_table(), course_item)
+
+    try:
+        job = {"course_id": course_id, "user_id": user_id, "skeleton": skeleton}
+        request_body = json.dumps(data)
+        if len(request_body.encode('utf-8')) + len(json.dumps(skeleton)) > MAX_INLINE_JOB_BYTES:
+            # Documents can exceed the async invoke payload limit; pass them through S3 instead
+            job_bucket = os.environ.get('JOB_BUCKET_NAME')
+            job_key = f"course-plan-jobs/{course_id}.json"
+            s3_client.put_object(Bucket=job_bucket, Key=job_key, Body=request_body, ContentType='application/json')
+            job["request_key"] = job_key
+        else:
+            job["request"] = data
+
+        lambda_client.invoke(
+            FunctionName=os.environ.get('WORKER_FUNCTION_NAME'),
+            InvocationType='Event',
+            Payload=json.dumps(job).encode('utf-8')
+        )
+    except Exception as e:
+        # No worker will ever pick the saved course up, so it must not stay SKELETON/GENERATING
+        _record_plan_failure(course_id, user_id, e)
+        raise
+    print(f"Started async course plan job {course_id}")
+    return course_item
+
+
+def _record_plan_failure(course_id, user_id, error):
+    """Marks a course plan as FAILED so the job status endpoint reports the error."""
+    try:
+        _course_table().update_item(
+            Key={'CourseID': course_id, 'UserID': user_id},
+            UpdateExpression="SET plan_status = :status, plan_error = :error",
+            ExpressionAttributeValues={':status': 'FAILED', ':error': str(error)},
+            ConditionExpression="attribute_exists(CourseID)"
+        )
+    except ClientError as update_error:
+        print(f"Could not record failure of course plan job {course_id}: {str(update_error)}")
+
+
+def worker_handler(event, context):
+    """
+    Runs an async course plan job started by lambda_handler. Failures are recorded on the
+    course item instead of raised, so the job status endpoint can report them.
+    """
+    course_id = event['course_id']
+    user_id = event['user_id']
+    print(f"Running course plan job {course_id} for user {user_id}")
+    job_bucket = os.environ.get('JOB_BUCKET_NAME')
+    request_key = event.get('request_key')
+
+    try:
+        if request_key:
+            response = s3_client.get_object(Bucket=job_bucket, Key=request_key)
+            data = json.loads(response['Body'].read().decode('utf-8'))
+        else:
+            data = event['request']
+        build_and_save_course_plan(course_id, user_id, data, skeleton=event.get('skeleton'), placeholder_saved=True)
+    except course_store.CourseDeletedError:
+        print(f"Course {course_id} was deleted while its plan was generated; stopping job")
+    except Exception as e:
+        print(f"Course plan job {course_id} failed: {str(e)}")
+        _record_plan_failure(course_id, user_id, e)
+    finally:
+        if request_key:
+            try:
+                s3_client.delete_object(Bucket=job_bucket, Key=request_key)
+            except ClientError as e:
+                print(f"Warning: could not delete job request {request_key}: {str(e)}")
+
 
 def lambda_handler(event, context):
     try:
@@ -88,13 +367,9 @@ def lambda_handler(event, context):
             data = dict(parse.parse_qsl(decoded))
         else:
             data = json.loads(event['body'])
-        topic = data.get('topic','No topic provided')
-        timeline = data.get('timeline', '2 months')
-        difficulty = data.get('difficulty','easy')
-        custom_instructions = data.get('custom_instructions', None)
-        document_content = data.get('document_content', None) # New: Base64 encoded document content
-        document_type = data.get('document_type', None)       # New: MIME type of the document (e.g., 'image/png', 'application/pdf')
 
+        query_params = event.get('queryStringParameters') or {}
+        run_async = _is_truthy(data.pop('async', query_params.get('async', False)))
         # Extract User ID from the event context
         try:
             user_id = event['requestContext']['authorizer']['claims']['sub']
@@ -123,109 +398,44 @@ def lambda_handler(event, context):
                 'headers': {'Content-Type': 'application/json', "Access-Control-Allow-Origin": "*"}
             }
 
-        course_id = str(uuid.uuid4()) # Generate CourseID early for parallel image generation
-
-        # Use ThreadPoolExecutor to run LLM call and image generation in parallel
-        with ThreadPoolExecutor(max_workers=2) as executor:
-            llm_future = executor.submit(generate_course_plan, topic, timeline, difficulty, custom_instructions, document_content, document_type)
-            image_future = executor.submit(generate_course_image, topic, course_id)
+        course_id = str(uuid.uuid4())
 
+        if run_async:
             try:
-                course_plan = llm_future.result() # Wait for LLM result
-                if course_plan is None: # call_model now returns None on error
-                    raise ValueError("Failed to generate course plan from LLM: Received no content.")                
-            except json.JSONDecodeError as e: # Catch this more specific error first
-                print(f"JSONDecodeError parsing LLM output: {str(e)}")
-                return {
-                    'statusCode': 502,
-                    'body': json.dumps({'error': f'Failed to parse course plan from LLM: Invalid JSON format. {str(e)}'}),
-                    'headers': {'Content-Type': 'application/json', "Access-Control-Allow-Origin": "*"}
-                }
-            except ValueError as e: # Catch other ValueErrors, including the one raised above
-                print(f"Error generating or parsing course plan: {str(e)}")
+                course_item = _start_async_job(course_id, user_id, data)
+            except Exception as e:
+                print(f"Error starting async course plan job: {str(e)}")
                 return {
-                    'statusCode': 502, # Bad Gateway, as we failed to get a valid response from upstream (LLM)
-                    'body': json.dumps({'error': f'Failed to generate or parse course plan from LLM: {str(e)}'}),
+                    'statusCode': 500,
+                    'body': json.dumps({'error': f'Could not start course plan generation: {str(e)}'}),
                     'headers': {'Content-Type': 'application/json', "Access-Control-Allow-Origin": "*"}
                 }
-            
-            # Get image URL after course plan is generated
-            image_url = image_future.result()
-            if image_url:
-                course_plan['cover_image_url'] = image_url
-            else:
-                print("Warning: Failed to generate or upload course cover image.")
-                course_plan['cover_image_url'] = None # Or a default image URL
-
-        # Add blank chapter_image_url to each chapter
-        for chapter in course_plan['chapters']:
-            chapter['chapter_image_url'] = ""
-
-        course_plan['CourseID'] = course_id
-        course_plan['UserID'] = user_id
-
-        # Initialize chapter statuses
-        chapters_status = {}
-        timestamp = datetime.datetime.utcnow().isoformat()
-        for chapter in course_plan['chapters']:
-            chapter_id = chapter.get('id')
-            if chapter_id: # Ensure chapter has an ID
-                chapters_status[chapter_id] = {
-                    'lessons_status': 'PENDING',
-                    'mcqs_status': 'PENDING',
-                    'flashcards_status': 'PENDING',
-                    'last_updated': timestamp
-                }
-        course_plan['chapters_status'] = chapters_status
+            return {
+                'statusCode': 202,
+                'body': json.dumps({
+                    'job_id': course_id,
+                    'course_id': course_id,
+                    'plan_status': course_item['plan_status'],
+                    'course_plan': course_item # Chapter and lesson titles/IDs when plan_status is SKELETON
+                }),
+                'headers': {'Content-Type': 'application/json', "Access-Control-Allow-Origin": "*"}
+            }
 
-        print(course_plan)
-        
-        # save to dynamodb
-        dynamodb = boto3.resource('dynamodb')
-        table_name = os.environ.get('COURSE_TABLE_NAME')
-        # Assuming COURSE_TABLE_NAME is guaranteed by CDK as per user feedback
-        table = dynamodb.Table(table_name) # type: ignore
-        
         try:
-            table.put_item(Item=course_plan)
-            print('Saved to DynamoDB')
-        except ClientError as e:
-            print(f"Error saving to DynamoDB: {str(e)}")
+            course_plan = build_and_save_course_plan(course_id, user_id, data)
+        except CoursePlanGenerationError as e:
+            return {
+                'statusCode': 502, # Bad Gateway, as we failed to get a valid response from upstream (LLM)
+                'body': json.dumps({'error': str(e)}),
+                'headers': {'Content-Type': 'application/json', "Access-Control-Allow-Origin": "*"}
+            }
+        except CoursePlanSaveError as e:
             return {
                 'statusCode': 500,
-                'body': json.dumps({'error': f'Could not save course plan to database: {str(e)}'}),
+                'body': json.dumps({'error': str(e)}),
                 'headers': {'Content-Type': 'application/json', "Access-Control-Allow-Origin": "*"}
             }
 
-        # Trigger the Step Function for course content generation
-        step_function_arn = os.environ.get('STEP_FUNCTION_ARN')
-        if step_function_arn:
-            try:
-                # For each chapter, start a Step Function execution
-                for chapter in course_plan['chapters']:
-                    chapter_id = chapter.get('id')
-                    if chapter_id:
-                        sfn_input = {
-                            "course_id": course_id,
-                            "user_id": user_id,
-                            "chapter_id": chapter_id
-                        }
-                        sfn_client.start_execution(
-                            stateMachineArn=step_function_arn,
-                            input=json.dumps(sfn_input)
-                        )
-                        print(f"Started Step Function for chapter {chapter_id} of course {course_id}")
-                        # we only want to do it for the first chapter
-                        break
-            except ClientError as e:
-                print(f"Error starting Step Function execution: {str(e)}")
-                # Do not return error, as course plan is already saved. Log and continue.
-            except Exception as e:
-                print(f"Unexpected error triggering Step Function: {str(e)}")
-                # Do not return error, as course plan is already saved. Log and continue.
-        else:
-            print("Warning: STEP_FUNCTION_ARN environment variable not set. Step Function not triggered.")
-
         return {
             'statusCode': 200,
             'body': json.dumps(course_plan),
@@ -328,6 +538,61 @@ course_plan_schema = {
     ]
 }
 
+course_skeleton_schema = {
+    "type": "object",
+    "description": "The outline of a course plan.",
+    "properties": {
+        "title": {
+            "type": "string",
+            "description": "The title of the course plan."
+        },
+        "description": {
+            "type": "string",
+            "description": "A one-sentence description of the course."
+        },
+        "chapters": {
+            "type": "array",
+            "description": "The chapters of the course plan.",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "title": {
+                        "type": "string",
+                        "description": "The title of the chapter."
+                    },
+                    "id": {
+                        "type": "string",
+                        "description": "A unique ID for the chapter."
+                    },
+                    "lessons": {
+                        "type": "array",
+                        "description": "The lessons of the chapter.",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "title": {
+                                    "type": "string",
+                                    "description": "The title of the lesson."
+                                },
+                                "id": {
+                                    "type": "string",
+                                    "description": "A unique ID for the lesson."
+                                }
+                            },
+                            "additionalProperties": False,
+                            "required": ["title", "id"]
+                        }
+                    }
+                },
+                "additionalProperties": False,
+                "required": ["title", "id", "lessons"]
+            }
+        }
+    },
+    "additionalProperties": False,
+    "required": ["title", "description", "chapters"]
+}
+
 tools = [
         {
             "type": "function",
@@ -340,18 +605,7 @@ tools = [
     ]
 use_google = False
 
-def generate_course_plan(topic, timeline, difficulty, custom_instructions, document_content, document_type):
-    system_prompt = f"""
-    You are a course assistant that helps students to create a course plan based on their topic, timeline and difficulty.
-    Output a JSON object representing the course plan with the provided schema. 
-
-    Topic: {topic}
-    Timeline: {timeline}
-    Difficulty: {difficulty}
-    Custom Instructions: {custom_instructions}
-    """    
-        
-    # output = call_model(system_prompt, endpoint, api_key, model, tools = tools) # Pass tools to the model call
+def _build_messages(system_prompt, document_content, document_type):
     if document_content:
         try:
             decoded_document = base64.b64decode(document_content)
@@ -388,7 +642,74 @@ def generate_course_plan(topic, timeline, difficulty, custom_instructions, docum
                     }
                 ]
             }]
+    return messages
+
+
+def generate_course_skeleton(topic, timeline, difficulty, custom_instructions, document_content, document_type):
+    """
+    Quickly outlines the course (chapter and lesson titles and IDs) with a small model, so the
+    course screen can render while the full plan is generated.
+    """
+    system_prompt = f"""
+    You are a course assistant that helps students to create a course plan based on their topic, timeline and difficulty.
+    Output only the outline of the course: its title, a one-sentence description, and the titles and unique IDs of its chapters and their lessons.
+
+    Topic: {topic}
+    Timeline: {timeline}
+    Difficulty: {difficulty}
+    Custom Instructions: {custom_instructions}
+    """
+    response = bedrock_client.converse(
+        modelId="us.anthropic.claude-3-5-haiku-20241022-v1:0",
+        messages=_build_messages(system_prompt, document_content, document_type),
+        toolConfig={
+            "tools": [
+                {
+                    "toolSpec": {
+                        "name": "course_skeleton",
+                        "description": "Output the outline of the course plan.",
+                        "inputSchema": {
+                            "json": course_skeleton_schema
+                        }
+                    }
+                }
+            ],
+            "toolChoice": {"tool": {"name": "course_skeleton"}}
+        },
+        inferenceConfig={
+            "maxTokens": 2048,
+            "temperature": 0.5,
+        }
+    )
+    for block in response['output']['message']['content']:
+        if 'toolUse' in block:
+            skeleton = block['toolUse']['input']
+            if skeleton.get('chapters'):
+                return skeleton
+
+    print(f"Error: LLM did not return a valid course skeleton. Output: {response['output']['message']['content']}")
+    return None
+
+
+def generate_course_plan(topic, timeline, difficulty, custom_instructions, document_content, document_type, skeleton=None):
+    system_prompt = f"""
+    You are a course assistant that helps students to create a course plan based on their topic, timeline and difficulty.
+    Output a JSON object representing the course plan with the provided schema. 
+
+    Topic: {topic}
+    Timeline: {timeline}
+    Difficulty: {difficulty}
+    Custom Instructions: {custom_instructions}
+    """    
+    if skeleton:
+        system_prompt += f"""
+    The outline of the course has already been decided. Keep exactly these chapters and lessons, in this order,
+    with the same titles and IDs, and fill in the descriptions and chapter times:
+    {json.dumps(skeleton)}
+    """
         
+    # output = call_model(system_prompt, endpoint, api_key, model, tools = tools) # Pass tools to the model call
+    messages = _build_messages(system_prompt, document_content, document_type)
 
     tool_config = {
     "tools": [
@@ -1,129 +1,18 @@
 import json
 import os
 from typing import Dict, Any, List
-from urllib import request, parse, error as urllib_error, parse as urlparse
+from urllib import parse as urlparse
 import time
 import boto3
-import datetime
+
+from llm_client import call_model, evict_cached, prewarm # Provided by the shared layer
+from content_store import read_json
+from flashcard_store import lesson_flashcard_id, save_deck, version_from_timestamp
 
 s3_client = boto3.client('s3')
 dynamodb = boto3.resource('dynamodb')
 
-def get_api_info(model):
-    if model == 'gemini-2.5-flash':
-        url = 'https://generativelanguage.googleapis.com/v1beta/openai/chat/completions'
-        api_key = os.environ['API_KEY']
-        return url, api_key, 'gemini-2.5-flash-preview-04-17'
-    if model == 'gemini-2.5-pro':
-        url = 'https://generativelanguage.googleapis.com/v1beta/openai/chat/completions'
-        api_key = os.environ['API_KEY']
-        return url, api_key, 'gemini-2.5-pro-preview-05-06'
-    if model == 'claude-4-sonnet':
-        url = 'http://Bedroc-Proxy-xVtSm3tV6xYe-1727257641.us-east-1.elb.amazonaws.com/api/v1/chat/completions'
-        api_key = os.environ['BEDROCK_API_KEY']
-        return url, api_key, 'us.anthropic.claude-sonnet-4-20250514-v1:0'
-    if model == 'claude-3.7-sonnet':
-        url = 'http://Bedroc-Proxy-xVtSm3tV6xYe-1727257641.us-east-1.elb.amazonaws.com/api/v1/chat/completions'
-        api_key = os.environ['BEDROCK_API_KEY']
-        return url, api_key, 'us.anthropic.claude-3-7-sonnet-20250219-v1:0'
-    if model == 'claude-3.5-haiku':
-        url = 'http://Bedroc-Proxy-xVtSm3tV6xYe-1727257641.us-east-1.elb.amazonaws.com/api/v1/chat/completions'
-        api_key = os.environ['BEDROCK_API_KEY']
-        return url, api_key, 'us.anthropic.claude-3-5-haiku-20241022-v1:0'
-    if model == 'gemini-2.0-flash':
-        url = 'https://generativelanguage.googleapis.com/v1beta/openai/chat/completions'
-        api_key = os.environ['API_KEY']
-        return url, api_key, 'gemini-2.0-flash-001'
-    if model == 'gemini-2.0-flash-lite':
-        url = 'https://generativelanguage.googleapis.com/v1beta/openai/chat/completions'
-        api_key = os.environ['API_KEY']
-        return url, api_key, 'gemini-2.0-flash-lite-001'
-    # Fallback
-    return get_api_info('gemini-2.0-flash')
-
-def call_model(system_prompt, prompt, messages=None, output_format=None, tools=None, model='gemini-2.5-flash'):
-    url, api_key, model_identifier = get_api_info(model)
-
-    data = {
-        "model": model_identifier,
-        "messages": [],
-        "max_tokens": 8192
-    }
-
-    data['messages'].append({"role": "system", "content": system_prompt})
-
-    if messages is not None:
-        data['messages'].extend(messages)
-    
-    data['messages'].append({"role": "user", "content": prompt})
-    
-    if output_format:
-        data['response_format'] = {
-            "type": "json_schema",
-            "json_schema": {
-                "name": "output",
-                "schema": output_format  
-            }
-        }
-
-    if tools:
-        data['tools'] = tools
-
-    data_bytes = json.dumps(data).encode('utf-8')
-    
-    max_retries = 5
-    base_delay = 1
-    max_delay = 10
-    
-    for attempt in range(max_retries + 1):
-        if attempt == max_retries and model != 'gemini-2.0-flash':
-            print(f"Retry limit reached. Falling back to gemini-2.0-flash model for final attempt.")
-            url, api_key, model_identifier = get_api_info('gemini-2.0-flash')
-            data['model'] = model_identifier
-            
-        req = request.Request(url, data=data_bytes, method='POST')
-        req.add_header('Content-Type', 'application/json')
-        req.add_header('Authorization', f'Bearer {api_key}')
-        
-        try:
-            with request.urlopen(req) as resp:
-                if resp.status == 200:
-                    content = resp.read()
-                    output = json.loads(content)
-                    print("LLM Raw Output:", output)
-                    if output.get('choices') and output['choices'][0].get('message'):
-                        return output['choices'][0]['message']
-                    else:
-                        print(f"Unexpected LLM response structure: {output}")
-                        if output.get('content') and isinstance(output['content'], list) and output['content'][0].get('text'):
-                             return {"role": "assistant", "content": output['content'][0]['text']}
-                        return {"role": "assistant", "content": json.dumps(output)}
-                else:
-                    error_content = resp.read().decode('utf-8')
-                    print(f"HTTP Error: {resp.status} - {resp.reason}. Response: {error_content}")
-                    if 400 <= resp.status < 500 and resp.status != 429:
-                        raise Exception(f"HTTP Client Error: {resp.status} - {error_content}")
-                    raise urllib_error.HTTPError(url, resp.status, error_content, resp.headers, None)
-                    
-        except Exception as e:
-            if attempt == max_retries:
-                print(f"Error: Final attempt failed after {max_retries} retries: {e}")
-                return None
-            
-            is_http_error = isinstance(e, urllib_error.HTTPError)
-            is_url_error = isinstance(e, urllib_error.URLError)
-                
-            if (is_http_error and e.code in [500, 502, 503, 504, 429]) or is_url_error:
-                delay = min(base_delay * (2 ** attempt), max_delay)
-                jitter = delay * 0.1 * (0.5 - (0.5 * attempt / max_retries))
-                sleep_time = delay + jitter
-                
-                print(f"Attempt {attempt + 1} failed. Retrying in {sleep_time:.2f} seconds... Error: {e}")
-                time.sleep(sleep_time)
-            else:
-                print(f"Non-retryable error: {e}")
-                return None
-    return None
+prewarm('gemini-2.5-flash')
 
 def generate_flashcards_from_content(lesson_content_markdown: str) -> List[Dict[str, Any]]:
     """
@@ -180,7 +69,8 @@ def generate_flashcards_from_content(lesson_content_markdown: str) -> List[Dict[
             system_prompt=system_prompt,
             prompt=current_prompt,
             output_format=flashcard_schema,
-            model='gemini-2.5-flash'
+            model='gemini-2.5-flash',
+            fallback_model='gemini-2.0-flash'
         )
         
         previous_error_feedback = ""
@@ -252,6 +142,9 @@ def generate_flashcards_from_content(lesson_content_markdown: str) -> List[Dict[
                 print(f"LLM model_output: {model_output}")
             previous_error_feedback = f"This is attempt {validation_attempt + 1} of {max_validation_retries}. In the previous attempt (attempt {validation_attempt}), the model call failed or returned no content."
         
+        # Don't let a Step Functions retry replay a response that failed validation
+        evict_cached(system_prompt, current_prompt, output_format=flashcard_schema, model='gemini-2.5-flash')
+
         if validation_attempt < max_validation_retries:
             print(f"Validation failed on attempt {validation_attempt}. Retrying...")
             time.sleep(1 + validation_attempt)
@@ -275,8 +168,7 @@ def _load_lesson_content_from_s3(s3_url: str) -> Dict[str, str]:
     
     try:
         response = s3_client.get_object(Bucket=bucket_name, Key=object_key)
-        content_string = response['Body'].read().decode('utf-8')
-        lesson_content_dict = json.loads(content_string)
+        lesson_content_dict = read_json(response) # Lesson content is stored gzip-encoded
         if not isinstance(lesson_content_dict, dict):
             raise ValueError(f"Content from S3 ({s3_url}) is not a JSON dictionary.")
         print(f"Successfully loaded and parsed lesson content from {s3_url}")
@@ -285,57 +177,20 @@ def _load_lesson_content_from_s3(s3_url: str) -> Dict[str, str]:
         print(f"Error loading lesson content from S3 (s3://{bucket_name}/{object_key}): {e}")
         raise
 
-def _save_flashcards_to_dynamodb(flashcards: List[Dict[str, Any]], course_id: str, chapter_id: str, lesson_id: str, user_id: str = None) -> str:
+def _save_flashcards_to_dynamodb(flashcards: List[Dict[str, Any]], course_id: str, chapter_id: str, lesson_id: str, version: int, user_id: str = None) -> str:
     """
-    Saves flashcards to DynamoDB table.
+    Saves the lesson's flashcards to DynamoDB as a single deck item (see flashcard_store).
     """
     flashcards_table_name = os.environ.get('FLASHCARDS_TABLE_NAME')
     if not flashcards_table_name:
         raise ValueError("FLASHCARDS_TABLE_NAME environment variable not set.")
     
     table = dynamodb.Table(flashcards_table_name)
-    timestamp = datetime.datetime.utcnow().isoformat()
-    
-    # Clear existing flashcards for this lesson first
-    lesson_flashcard_id = f"FLASHCARD#{course_id}#{chapter_id}#{lesson_id}"
     
     try:
-        # Query existing items to delete them
-        response = table.query(
-            KeyConditionExpression="LessonFlashcardId = :lesson_id",
-            ExpressionAttributeValues={":lesson_id": lesson_flashcard_id}
-        )
-        
-        # Delete existing flashcards
-        with table.batch_writer() as batch:
-            for item in response.get('Items', []):
-                batch.delete_item(Key={
-                    'LessonFlashcardId': item['LessonFlashcardId'], 
-                    'CardId': item['CardId']
-                })
-        
-        print(f"Deleted {len(response.get('Items', []))} existing flashcards for lesson {lesson_id}")
-        
-        # Insert new flashcards
-        with table.batch_writer() as batch:
-            for i, flashcard in enumerate(flashcards):
-                item = {
-                    'LessonFlashcardId': lesson_flashcard_id,
-                    'CardId': f"CARD#{i+1:02d}",
-                    'CourseID': course_id,
-                    'ChapterID': chapter_id,
-                    'LessonID': lesson_id,
-                    'Question': flashcard['question'],
-                    'Answer': flashcard['answer'],
-                    'CardNumber': i + 1,
-                    'CreatedAt': timestamp
-                }
-                if user_id:
-                    item['UserID'] = user_id
-                batch.put_item(Item=item)
-        
-        print(f"Successfully saved {len(flashcards)} flashcards to DynamoDB")
-        return lesson_flashcard_id
+        if save_deck(table, course_id, chapter_id, lesson_id, flashcards, version, user_id):
+            print(f"Successfully saved {len(flashcards)} flashcards to DynamoDB")
+        return lesson_flashcard_id(course_id, chapter_id, lesson_id)
         
     except Exception as e:
         print(f"Error saving flashcards to DynamoDB: {e}")
@@ -344,7 +199,8 @@ def _save_flashcards_to_dynamodb(flashcards: List[Dict[str, Any]], course_id: st
 def lambda_handler(event, context):
     """
     Lambda function to generate flashcards for a specific lesson.
-    Expects input that includes course_id, chapter_id, lesson_id, and lesson_s3_url.
+    Expects input that includes course_id, chapter_id, lesson_id, and lesson_s3_url, plus
+    generation_started_at (the execution's start time), which versions the saved deck.
     """
     print(f"Received event: {json.dumps(event)}")
 
@@ -354,14 +210,16 @@ def lambda_handler(event, context):
         lesson_id = event.get('lesson_id')
         lesson_s3_url = event.get('lesson_s3_url')
         user_id = event.get('user_id')  # Optional
+        generation_started_at = event.get('generation_started_at')
 
-        if not all([course_id, chapter_id, lesson_id, lesson_s3_url]):
+        if not all([course_id, chapter_id, lesson_id, lesson_s3_url, generation_started_at]):
             missing_items = [
                 k for k, v in {
                     'course_id': course_id, 
                     'chapter_id': chapter_id, 
                     'lesson_id': lesson_id,
-                    'lesson_s3_url': lesson_s3_url
+                    'lesson_s3_url': lesson_s3_url,
+                    'generation_started_at': generation_started_at
                 }.items() if not v
             ]
             raise ValueError(f"Missing required items in input event: {', '.join(missing_items)}")
@@ -383,7 +241,7 @@ def lambda_handler(event, context):
             raise ValueError(f"No flashcards were generated from the lesson content at {lesson_s3_url}.")
 
         # Save flashcards to DynamoDB
-        flashcards_pk = _save_flashcards_to_dynamodb(flashcards, course_id, chapter_id, lesson_id, user_id)
+        flashcards_pk = _save_flashcards_to_dynamodb(flashcards, course_id, chapter_id, lesson_id, version_from_timestamp(generation_started_at), user_id)
         
         return {
             "course_id": course_id,
@@ -1,31 +1,89 @@
 import json
-from urllib import request, parse, error as urllib_error # Added urllib_error
 import boto3
 import time
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from llm_client import call_model, prewarm # Provided by the shared layer
+
+s3_client = boto3.client('s3')
+dynamodb = boto3.resource('dynamodb')
+
+# Open the Gemini and Bedrock proxy connections during init
+prewarm('gemini-2.0-flash', 'claude-3.7-sonnet')
+
+# (course_id, user_id) -> {'title', 'description'}; course titles don't change once planned
+_course_info_cache = {}
+
+
+def _load_course_info(course_id, user_id):
+    """
+    Returns the course title and description, reading only those attributes from the course table.
+    """
+    cache_key = (course_id, user_id)
+    if cache_key in _course_info_cache:
+        return _course_info_cache[cache_key]
+
+    table_name = os.environ.get('COURSE_TABLE_NAME')
+    if not table_name:
+        raise ValueError("COURSE_TABLE_NAME environment variable not set.")
+    response = dynamodb.Table(table_name).get_item(
+        Key={'CourseID': course_id, 'UserID': user_id},
+        ProjectionExpression="#title, #description",
+        ExpressionAttributeNames={'#title': 'title', '#description': 'description'}
+    )
+    item = response.get('Item')
+    if not item:
+        raise ValueError(f"Course {course_id} not found for user {user_id}.")
+
+    course_info = {'title': item.get('title', ''), 'description': item.get('description', '')}
+    _course_info_cache[cache_key] = course_info
+    return course_info
+
 
 def lambda_handler(event, context):
     # try:
     print(event)
     
     data = event['body']
-    course_plan = data['course_plan']
     chapter_id = data['chapter_id']
     lesson_id = data['lesson_id']
 
+    # Step Functions execution name; a task retry within the same execution resumes from its checkpoint
+    execution_id = data.get('execution_id')
+
     lesson_data = {}
     chapter_info = {}
 
-    for c, chapter in enumerate(course_plan["chapters"]):
-        if chapter['id'] == chapter_id:      
-            chapter_info['title'] = chapter['title']
-            chapter_info['description'] = chapter['description']
-            for l, lesson in enumerate(chapter['lessons']):
-                if lesson['id'] == lesson_id:
-                    lesson_data = lesson
-                    course_plan['chapters'][c]['lessons'][l]['generated'] = True                    
-    
-    lesson_content = main_agent(course_plan, lesson_data, chapter_info, context)
+    if 'course_plan' in data:
+        # Older executions pass the whole course plan
+        course_plan = data['course_plan']
+        course_id = course_plan['CourseID']
+        user_id = course_plan.get('UserID')
+        course_info = {'title': course_plan['title'], 'description': course_plan['description']}
+        for chapter in course_plan["chapters"]:
+            if chapter['id'] == chapter_id:
+                chapter_info['title'] = chapter['title']
+                chapter_info['description'] = chapter['description']
+                for lesson in chapter['lessons']:
+                    if lesson['id'] == lesson_id:
+                        lesson_data = lesson
+    else:
+        # The state machine passes IDs plus the chapter and lesson context; the course
+        # title/description come from DynamoDB
+        course_id = data['course_id']
+        user_id = data['user_id']
+        course_info = _load_course_info(course_id, user_id)
+        chapter_info['title'] = data['chapter']['title']
+        chapter_info['description'] = data['chapter']['description']
+        lesson_data = data['lesson']
+
+    checkpoint_key = None
+    if execution_id:
+        checkpoint_key = f"checkpoints/{course_id}/{chapter_id}/{lesson_id}/{execution_id}.json"
+
+    lesson_content = main_agent(course_info, lesson_data, chapter_info, context, checkpoint_key)
 
     # S3 saving will be handled by the fix_lesson_markdown Lambda
     # Ensure all necessary IDs and the content are returned for the next step.
@@ -33,146 +91,233 @@ def lambda_handler(event, context):
         "chapter_id" : chapter_id,
         "lesson_id" : lesson_id,
         "lesson_content": lesson_content,
-        "course_id": course_plan['CourseID'] 
+        "course_id": course_id,
+        "user_id": user_id # Content is stored under the user's course prefix
     }
 
 
-def get_api_info(model):
-    if model == 'gemini-2.5-flash':
-        url = 'https://generativelanguage.googleapis.com/v1beta/openai/chat/completions'
-        api_key = os.environ['API_KEY']
-        return url, api_key, 'gemini-2.5-flash-preview-05-20'
-    if model == 'gemini-2.5-pro':
-        url = 'https://generativelanguage.googleapis.com/v1beta/openai/chat/completions'
-        api_key = os.environ['API_KEY']
-        return url, api_key, 'gemini-2.5-pro-preview-05-06'
-    if model == 'claude-4-sonnet':
-        url = 'http://Bedroc-Proxy-xVtSm3tV6xYe-1727257641.us-east-1.elb.amazonaws.com/api/v1/chat/completions'
-        api_key = os.environ['BEDROCK_API_KEY']
-        return url, api_key, 'us.anthropic.claude-sonnet-4-20250514-v1:0'
-    if model == 'claude-3.7-sonnet':
-        url = 'http://Bedroc-Proxy-xVtSm3tV6xYe-1727257641.us-east-1.elb.amazonaws.com/api/v1/chat/completions'
-        api_key = os.environ['BEDROCK_API_KEY']
-        return url, api_key, 'us.anthropic.claude-3-7-sonnet-20250219-v1:0'
-    if model == 'claude-3.5-haiku':
-        url = 'http://Bedroc-Proxy-xVtSm3tV6xYe-1727257641.us-east-1.elb.amazonaws.com/api/v1/chat/completions'
-        api_key = os.environ['BEDROCK_API_KEY']
-        return url, api_key, 'us.anthropic.claude-3-5-haiku-20241022-v1:0'
-    if model == 'gemini-2.0-flash':
-        url = 'https://generativelanguage.googleapis.com/v1beta/openai/chat/completions'
-        api_key = os.environ['API_KEY']
-        return url, api_key, 'gemini-2.0-flash-001'
-    if model == 'gemini-2.0-flash-lite':
-        url = 'https://generativelanguage.googleapis.com/v1beta/openai/chat/completions'
-        api_key = os.environ['API_KEY']
-        return url, api_key, 'gemini-2.0-flash-lite-001'
-    else:
-        return get_api_info('gemini-2.0-flash')  # Default to gemini-2.0-flash if no valid model is specified
-    # maybe try other LLMs
-    # if model == 'deepseek':
-    #     url = 'https://api.deepseek.com/chat/completions'
-    #     api_key = ''        
-    #     return url, api_key,'deepseek-chat'
-    # if model == 'openai':
-    #     url = 'https://api.openai.com/v1/responses'
-    #     api_key = ''        
-    #     return url, api_key, 'gpt-4.1-mini-2025-04-14'
-
-def call_model(system_prompt, prompt, messages=None, output_format=None, tools=None, model='gemini-2.5-flash'):
-
-    url, api_key, model = get_api_info(model)
-
-    data = {
-        "model": model,
-        "messages": [], # Initialize as empty
-        "max_tokens": 8192
-    }
+# Upper bound on concurrent generate_lesson_content tool calls within one orchestrator turn
+MAX_SECTION_WORKERS = 4
 
-    # Add system prompt first
-    data['messages'].append({"role": "system", "content": system_prompt})
 
-    if messages is not None:
-        data['messages'].extend(messages) # Add previous messages
-    
-    # Add current user prompt
-    data['messages'].append({"role": "user", "content": prompt})
-    
-    if output_format:
-        data['response_format'] = {
-            "type": "json_schema",
-            "json_schema": {
-                "name": "output",
-                "schema": output_format  
+def _section_sort_key(section_id):
+    # Section IDs are meant to be numeric strings ("1", "2", ...); order them numerically
+    try:
+        return (0, float(section_id), section_id)
+    except (TypeError, ValueError):
+        return (1, 0, str(section_id))
+
+
+class LessonSession:
+    """
+    State for generating a single lesson. Section generation runs on worker threads,
+    so every access goes through the lock.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sections = {}
+        self._generation_counts = {}
+        self.assessment_count = 0
+
+    def sections(self):
+        """Returns a copy of the lesson sections ordered by section ID."""
+        with self._lock:
+            return {k: self._sections[k] for k in sorted(self._sections, key=_section_sort_key)}
+
+    def get_section(self, section_id):
+        with self._lock:
+            return self._sections.get(section_id, '')
+
+    def save_section(self, section_id, content):
+        """Stores a (re)generated section. Returns its generation count."""
+        with self._lock:
+            self._sections[section_id] = content
+            self._generation_counts[section_id] = self._generation_counts.get(section_id, 0) + 1
+            return self._generation_counts[section_id]
+
+    def word_count(self):
+        with self._lock:
+            return sum(len(content.split()) for content in self._sections.values())
+
+    def generation_count(self, section_id):
+        with self._lock:
+            return self._generation_counts.get(section_id, 0)
+
+    def generation_counts(self):
+        with self._lock:
+            return {k: self._generation_counts[k] for k in sorted(self._generation_counts, key=_section_sort_key)}
+
+    def record_assessment(self):
+        with self._lock:
+            self.assessment_count += 1
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "lesson_sections": dict(self._sections),
+                "generation_counts": dict(self._generation_counts),
+                "assessment_count": self.assessment_count
             }
-        }
 
-    if tools:
-        data['tools'] = tools
-    
-    # Retry configuration
-    max_retries = 5  # Maximum number of retries
-    base_delay = 1  # Initial delay in seconds
-    max_delay = 10  # Maximum delay in seconds
-    
-    for attempt in range(max_retries + 1):  # +1 to include the initial attempt
-        # fallback to gemini-2.0-flash is we're hitting the retry limit
-        if attempt == max_retries and model != 'gemini-2.0-flash':
-            print(f"Retry limit reached. Falling back to gemini-2.0-flash model for final attempt.")
-            url, api_key, model = get_api_info('gemini-2.0-flash')
-            data['model'] = model
-        data_bytes = json.dumps(data).encode('utf-8')
-        req = request.Request(url, data=data_bytes)
-        req.add_header('Content-Type', 'application/json')
-        req.add_header('Authorization', f'Bearer {api_key}')
-        
-        try:
-            with request.urlopen(req) as resp:
-                if resp.status == 200:
-                    content = resp.read()
-                    output = json.loads(content)
-                    print(output)
-                    return output['choices'][0]['message']
-                else:
-                    raise Exception(f"HTTP Error: {resp.status} - {resp.reason}")
-                    
-        except Exception as e:
-            if attempt == max_retries:  # Last attempt failed
-                print(f"Error: Final attempt failed after {max_retries} retries: {e}")
-                return None
-            
-            is_http_error = isinstance(e, request.HTTPError)
-            is_url_error = isinstance(e, urllib_error.URLError) # Changed to urllib_error.URLError
-                
-            # Check if it's a 503 error or other retryable error
-            if (is_http_error and e.code == 503) or is_url_error:
-                # Calculate delay with exponential backoff and jitter
-                delay = min(base_delay * (2 ** attempt), max_delay)
-                jitter = delay * 0.1 * (0.5 - (0.5 * attempt / max_retries))  # Add some jitter
-                sleep_time = delay + jitter
-                
-                print(f"Attempt {attempt + 1} failed. Retrying in {sleep_time:.2f} seconds... Error: {e}")
-                time.sleep(sleep_time)
-            else:
-                # Non-retryable error
-                print(f"Error: {e}")
-                return None
-
-lesson_sections = {}
-generation_counts = {}
-assessment_count = 0
-
-def main_agent(course_plan, lesson_data, chapter_info, context):
-    global lesson_sections
-    global generation_counts
-    global assessment_count
-
-    # Reset state for the current lesson generation task
-    # This is crucial for Lambda warm starts to avoid state leakage.
-    lesson_sections = {}
-    generation_counts = {}
-    assessment_count = 0
+    @classmethod
+    def from_dict(cls, data):
+        session = cls()
+        session._sections = dict(data.get('lesson_sections', {}))
+        session._generation_counts = dict(data.get('generation_counts', {}))
+        session.assessment_count = data.get('assessment_count', 0)
+        return session
+
+
+def _load_checkpoint(checkpoint_key):
+    """Returns the saved agent state for `checkpoint_key`, or None if there is nothing to resume."""
+    bucket_name = os.environ.get('LESSON_BUCKET_NAME')
+    if not checkpoint_key or not bucket_name:
+        return None
+    try:
+        response = s3_client.get_object(Bucket=bucket_name, Key=checkpoint_key)
+        return json.loads(response['Body'].read().decode('utf-8'))
+    except s3_client.exceptions.NoSuchKey:
+        return None
+    except Exception as e:
+        print(f"Warning: could not load checkpoint s3://{bucket_name}/{checkpoint_key}, starting over: {e}")
+        return None
+
+
+def _save_checkpoint(checkpoint_key, session, messages, agent_elapsed_seconds):
+    bucket_name = os.environ.get('LESSON_BUCKET_NAME')
+    if not checkpoint_key or not bucket_name:
+        return
+    checkpoint = session.to_dict()
+    checkpoint['messages'] = messages
+    checkpoint['agent_elapsed_seconds'] = agent_elapsed_seconds
+    try:
+        s3_client.put_object(
+            Bucket=bucket_name,
+            Key=checkpoint_key,
+            Body=json.dumps(checkpoint),
+            ContentType='application/json'
+        )
+    except Exception as e:
+        # A missed checkpoint only costs progress on a retry; keep generating
+        print(f"Warning: could not save checkpoint s3://{bucket_name}/{checkpoint_key}: {e}")
+
+
+def _delete_checkpoint(checkpoint_key):
+    bucket_name = os.environ.get('LESSON_BUCKET_NAME')
+    if not checkpoint_key or not bucket_name:
+        return
+    try:
+        s3_client.delete_object(Bucket=bucket_name, Key=checkpoint_key)
+    except Exception as e:
+        print(f"Warning: could not delete checkpoint s3://{bucket_name}/{checkpoint_key}: {e}")
+
+
+def _unanswered_tool_calls(messages):
+    """Returns the tool calls of the last assistant turn that have no tool result yet."""
+    for i in range(len(messages) - 1, -1, -1):
+        message = messages[i]
+        if message.get('role') == 'assistant':
+            answered = {m.get('tool_call_id') for m in messages[i + 1:] if m.get('role') == 'tool'}
+            return [tc for tc in (message.get('tool_calls') or []) if tc['id'] not in answered]
+    return []
+
+
+def _append_tool_result(messages, tool_call, content):
+    messages.append({
+        "role": "tool",
+        "content": content,
+        "tool_call_id": tool_call['id']
+    })
+
+
+def _run_tool_calls(session, tool_calls, messages, on_tool_result=None):
+    """
+    Executes one orchestrator turn's tool calls and appends their results to `messages` in
+    call order. Runs of consecutive generate_lesson_content calls for different sections are
+    independent of each other, so they are dispatched concurrently; calls for the same section
+    run one after another, since each rewrites the section the next one reads. Results only
+    depend on the calls, never on thread timing, so a retry replays them from the LLM cache.
+    `on_tool_result` is called after each result is appended.
+    Returns (completed, follow_up_prompt).
+    """
+    def append_result(tool_call, content):
+        _append_tool_result(messages, tool_call, content)
+        if on_tool_result:
+            on_tool_result()
+
+    follow_up_prompt = None
+    pending_generations = []
+
+    def flush_generations():
+        nonlocal follow_up_prompt
+        if not pending_generations:
+            return
+        calls_by_section = {}
+        for index, (_, args) in enumerate(pending_generations):
+            calls_by_section.setdefault(args.get('lesson_section'), []).append(index)
+        results = [None] * len(pending_generations)
+
+        def run_section(indexes):
+            for index in indexes:
+                results[index] = generate_lesson_content(session, **pending_generations[index][1])
+
+        with ThreadPoolExecutor(max_workers=min(MAX_SECTION_WORKERS, len(calls_by_section))) as executor:
+            futures = [executor.submit(run_section, indexes) for indexes in calls_by_section.values()]
+        for future in futures:
+            future.result()
+
+        # Taken once the whole batch has finished, so it is the same however the threads interleaved
+        word_count = session.word_count()
+        for (tool_call, args), (content, saved) in zip(pending_generations, results):
+            if saved:
+                content = f"{content} The total word count of the lesson is {word_count}."
+            append_result(tool_call, content)
+            current_gen_count = session.generation_count(args['lesson_section'])
+            if current_gen_count >= 3:
+                print(f"Warning: Section {args['lesson_section']} has been generated {current_gen_count} times.")
+                follow_up_prompt = f"Please finalize the lesson content for section {args['lesson_section']} as it has been generated {current_gen_count} times. Ensure it meets the requirements, please do not keep generating it."
+        pending_generations.clear()
+
+    for tool_call in tool_calls:
+        tool_name = tool_call['function']['name']
+        args = json.loads(tool_call['function']['arguments'])
+        if tool_name == 'generate_lesson_content':
+            pending_generations.append((tool_call, args))
+            continue
+
+        # Anything else may depend on the sections generated so far
+        flush_generations()
+        if tool_name == 'assess_lesson_content':
+            session.record_assessment()
+            append_result(tool_call, assess_lesson_content(session, **args))
+        elif tool_name == 'complete_lesson_generation':
+            return True, follow_up_prompt
+        else:
+            print(f"Warning: tool_result not set for tool_call: {tool_name}")
+            append_result(tool_call, "Error: Tool execution failed or tool name not recognized.")
+
+    flush_generations()
+    return False, follow_up_prompt
+
+
+def main_agent(course_info, lesson_data, chapter_info, context, checkpoint_key=None):
+    # Per-lesson state; nothing is kept in module globals across warm starts
+    session = LessonSession()
+    messages = []
     agent_start_wall_time = time.time() # For tracking agent's own execution time
 
+    checkpoint = _load_checkpoint(checkpoint_key)
+    if checkpoint:
+        session = LessonSession.from_dict(checkpoint)
+        messages = checkpoint.get('messages', [])
+        # Keep counting against the agent's time budget from where the previous attempt stopped
+        agent_start_wall_time -= checkpoint.get('agent_elapsed_seconds', 0)
+        print(f"Resuming from checkpoint {checkpoint_key} with sections {list(session.sections().keys())} and {len(messages)} messages")
+
+    def save_checkpoint():
+        _save_checkpoint(checkpoint_key, session, messages, time.time() - agent_start_wall_time)
+
     # Static part of the system prompt (doesn't change per iteration based on time or lesson state)
     static_system_prompt_template = """
     You are a world-class teacher who is responsible for creating a lesson for a student.
@@ -274,7 +419,13 @@ def main_agent(course_plan, lesson_data, chapter_info, context):
 
     completed = False    
     start_prompt = f"Please proceed with the lesson generation."
-    messages = []
+
+    # Finish the tool calls the previous attempt was interrupted in the middle of
+    pending_tool_calls = _unanswered_tool_calls(messages)
+    if pending_tool_calls:
+        completed, follow_up_prompt = _run_tool_calls(session, pending_tool_calls, messages, save_checkpoint)
+        if follow_up_prompt:
+            start_prompt = follow_up_prompt
     
     # Retry configuration for main_agent's call_model
     main_agent_max_retries = 3
@@ -314,16 +465,19 @@ def main_agent(course_plan, lesson_data, chapter_info, context):
         #    time_warning_message_content = f"Agent execution: {agent_elapsed_seconds/60:.1f}m. Lambda time left: {lambda_remaining_seconds/60:.1f}m."
 
 
-        current_sections_str_updated = '\n'.join(lesson_sections.keys())
-        generation_counts_updated_str = json.dumps(generation_counts)
+        current_sections_str_updated = '\n'.join(session.sections().keys())
+        generation_counts_updated_str = json.dumps(session.generation_counts())
         
-        time_info_section = f"\n\n--- Time Status ---\nAgent execution time: {agent_elapsed_seconds/60:.1f} minutes.\nLambda function time remaining: {lambda_remaining_seconds/60:.1f} minutes."
+        # Only include the time status once there is something to warn about. Until then the
+        # prompt depends only on lesson state, so a retried execution hits the LLM response cache.
+        time_info_section = ""
         if time_warning_message_content:
+            time_info_section = f"\n\n--- Time Status ---\nAgent execution time: {agent_elapsed_seconds/60:.1f} minutes.\nLambda function time remaining: {lambda_remaining_seconds/60:.1f} minutes."
             time_info_section += f"\n{time_warning_message_content}"
 
 
         dynamic_system_prompt_part = f"""
-    The course the lesson is a part of is called {course_plan['title']}. The description of the course is {course_plan['description']}.
+    The course the lesson is a part of is called {course_info['title']}. The description of the course is {course_info['description']}.
     The chapter the lesson is a part of is called {chapter_info['title']}, which is described as "{chapter_info['description']}."
     
     Here is the information on the lesson you are creating and curating content for: {lesson_data}. Ensure all aspects of the lesson are addressed.    
@@ -364,47 +518,17 @@ def main_agent(course_plan, lesson_data, chapter_info, context):
             raise Exception(f"call_model returned None in main_agent after {main_agent_max_retries} attempts. Aborting.")
                 
         messages.append(output)
-        tool_result = None # Initialize tool_result
 
         if 'tool_calls' in output and output['tool_calls'] is not None:
-            completed = False
-            for tool_call in output['tool_calls']:
-                args = json.loads(tool_call['function']['arguments'])
-                if tool_call['function']['name'] == 'generate_lesson_content':
-                    tool_result = generate_lesson_content(**args)
-                    # Use .get() for safer access to generation_counts
-                    current_gen_count = generation_counts.get(args['lesson_section'], 0)
-                    if current_gen_count >= 3:
-                        print(f"Warning: Section {args['lesson_section']} has been generated {current_gen_count} times.")
-                        start_prompt = f"Please finalize the lesson content for section {args['lesson_section']} as it has been generated {current_gen_count} times. Ensure it meets the requirements, please do not keep generating it."
-                elif tool_call['function']['name'] == 'assess_lesson_content':
-                    assessment_count += 1
-                    assessment = assess_lesson_content(**args)
-                    tool_result = assessment                    
-                elif tool_call['function']['name'] == 'complete_lesson_generation':
-                    completed = True
-                    break
-                
-                if tool_result is not None: # Ensure tool_result was set
-                    messages.append({
-                        "role": "tool",
-                        "content": tool_result,
-                        "tool_call_id": tool_call['id']
-                    })
-                else:
-                    # Handle case where tool_result might not have been set (e.g. unknown tool name)
-                    print(f"Warning: tool_result not set for tool_call: {tool_call['function']['name']}")
-                    messages.append({
-                        "role": "tool",
-                        "content": "Error: Tool execution failed or tool name not recognized.",
-                        "tool_call_id": tool_call['id']
-                    })
+            completed, follow_up_prompt = _run_tool_calls(session, output['tool_calls'], messages, save_checkpoint)
+            if follow_up_prompt:
+                start_prompt = follow_up_prompt
         else:
-            if len(lesson_sections) == 0:
+            if not session.sections():
                 # Let's double check one more time if the lesson is complete
                 # If the lesson is complete, we can break out of the loop
                 start_prompt = f"You have not generated any lesson sections yet. Please start generating the lesson content using the generate_lesson_content tool."
-            elif assessment_count == 0:
+            elif session.assessment_count == 0:
                 start_prompt = f"You have generated lesson sections but none have been assessed yet. Please use the assess_lesson_content tool."
             else:
                 # If sections are generated and assessed, but no tool call, prompt the LLM to decide the next step.
@@ -416,47 +540,45 @@ def main_agent(course_plan, lesson_data, chapter_info, context):
                     "if you believe the entire lesson is now complete and satisfactory."
                 )
                 # Do not set completed = True here; wait for explicit complete_lesson_generation call.
-    return lesson_sections
 
+    # The lesson content is handed to the next state from here on; the checkpoint is no longer needed
+    _delete_checkpoint(checkpoint_key)
+    return session.sections()
 
-def generate_lesson_content(prompt,lesson_section):
-    global lesson_sections
-    global generation_counts
 
+def generate_lesson_content(session, prompt, lesson_section):
+    """Generates and saves one section. Returns (tool result, whether the section was saved)."""
     system_prompt = f"""
         You are an expert educator. Generate a portion of a lesson based on the instructions/topic the user provides you.
         In some cases, you may be asked to modify an existing portion of a lesson with some feedback. If that is the case,
         this is the existing section of that lesson: 
 
         ```
-        {lesson_sections.get(lesson_section, '')}
+        {session.get_section(lesson_section)}
         ```
 
         Make sure to just output the lesson content, no additional niceties or metadata.
     """
     try:
-        model_output = call_model(system_prompt, prompt,model='claude-3.7-sonnet')
+        model_output = call_model(system_prompt, prompt, model='claude-3.7-sonnet', fallback_model='gemini-2.0-flash')
         if model_output and 'content' in model_output:
             lesson_gen_output = model_output['content']
-            lesson_sections[lesson_section] = lesson_gen_output
-            generation_counts[lesson_section] = generation_counts.get(lesson_section, 0) + 1
-            print(f"Generated content for section {lesson_section}, current generation count: {generation_counts[lesson_section]}, current word count: {len(lesson_gen_output.split())}")
-            return f"Sucessfully generated content for section {lesson_section} and saved it, please call the assessor. The total word count of the lesson is {len(' '.join(lesson_sections.values()))}"
+            generation_count = session.save_section(lesson_section, lesson_gen_output)
+            print(f"Generated content for section {lesson_section}, current generation count: {generation_count}, current word count: {len(lesson_gen_output.split())}")
+            return f"Sucessfully generated content for section {lesson_section} and saved it, please call the assessor.", True
         else:
             print(f"Error: call_model did not return expected output for section {lesson_section}")
-            return f"Error generating content for section {lesson_section}: No content from model."
+            return f"Error generating content for section {lesson_section}: No content from model.", False
     except Exception as e:
         print(e)
-        return f"Error generating lesson content: {e}"
+        return f"Error generating lesson content: {e}", False
 
-def assess_lesson_content(prompt):   
-    global lesson_sections    
-    
+def assess_lesson_content(session, prompt):
     system_prompt = f"""
         You are an expert educator. You will be given a lesson content and you will assess it based on the requirements provided by the user.
         This is the full lesson content you will be assessing:
         ```
-        {json.dumps(lesson_sections)}
+        {json.dumps(session.sections())}
         ```
         The user will tell you which specific section of the lesson you are assessing, and you will provide feedback on that section.
         Please provide detailed feedback on the content, including any areas that need improvement or additional information.
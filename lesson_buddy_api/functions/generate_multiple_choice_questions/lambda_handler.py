@@ -1,130 +1,17 @@
 import json
 import os
 from typing import Dict, Any, List, Union
-from urllib import request, parse, error as urllib_error, parse as urlparse # Added urlparse
+from urllib import parse as urlparse
 import time
 import boto3 
 
-s3_client = boto3.client('s3') # Initialize S3 client globally or within handler
-
-# bedrock_runtime = boto3.client(service_name='bedrock-runtime') # Placeholder
-
-def get_api_info(model):
-    if model == 'gemini-2.5-flash':
-        url = 'https://generativelanguage.googleapis.com/v1beta/openai/chat/completions'
-        api_key = os.environ['API_KEY']
-        return url, api_key, 'gemini-2.5-flash-preview-04-17'
-    if model == 'gemini-2.5-pro':
-        url = 'https://generativelanguage.googleapis.com/v1beta/openai/chat/completions'
-        api_key = os.environ['API_KEY']
-        return url, api_key, 'gemini-2.5-pro-preview-05-06'
-    if model == 'claude-4-sonnet':
-        url = 'http://Bedroc-Proxy-xVtSm3tV6xYe-1727257641.us-east-1.elb.amazonaws.com/api/v1/chat/completions'
-        api_key = os.environ['BEDROCK_API_KEY']
-        return url, api_key, 'us.anthropic.claude-sonnet-4-20250514-v1:0'
-    if model == 'claude-3.7-sonnet':
-        url = 'http://Bedroc-Proxy-xVtSm3tV6xYe-1727257641.us-east-1.elb.amazonaws.com/api/v1/chat/completions'
-        api_key = os.environ['BEDROCK_API_KEY']
-        return url, api_key, 'us.anthropic.claude-3-7-sonnet-20250219-v1:0'
-    if model == 'claude-3.5-haiku':
-        url = 'http://Bedroc-Proxy-xVtSm3tV6xYe-1727257641.us-east-1.elb.amazonaws.com/api/v1/chat/completions'
-        api_key = os.environ['BEDROCK_API_KEY']
-        return url, api_key, 'us.anthropic.claude-3-5-haiku-20241022-v1:0'
-    if model == 'gemini-2.0-flash':
-        url = 'https://generativelanguage.googleapis.com/v1beta/openai/chat/completions'
-        api_key = os.environ['API_KEY']
-        return url, api_key, 'gemini-2.0-flash-001'
-    if model == 'gemini-2.0-flash-lite':
-        url = 'https://generativelanguage.googleapis.com/v1beta/openai/chat/completions'
-        api_key = os.environ['API_KEY']
-        return url, api_key, 'gemini-2.0-flash-lite-001'
-    # Fallback or error for unknown model
-    raise ValueError(f"Unsupported model: {model}")
-
-def call_model(system_prompt, prompt, messages=None, output_format=None, tools=None, model='gemini-2.5-flash'):
-    url, api_key, model_identifier = get_api_info(model)
-
-    data = {
-        "model": model_identifier,
-        "messages": [],
-        "max_tokens": 8192 # Max tokens for Gemini Flash according to docs, adjust if needed for others
-    }
+from llm_client import call_model, evict_cached, prewarm # Provided by the shared layer
+from content_store import put_json, questions_key, legacy_questions_key, read_json
 
-    data['messages'].append({"role": "system", "content": system_prompt})
-
-    if messages is not None:
-        data['messages'].extend(messages)
-    
-    data['messages'].append({"role": "user", "content": prompt})
-    
-    if output_format:
-        data['response_format'] = {
-            "type": "json_schema", # Assuming Gemini-like API, OpenAI uses "type": "json_object"
-            "json_schema": {       # For OpenAI, this would be under a "schema" key if using a more complex schema
-                "name": "output",  # Name might not be universally required
-                "schema": output_format  
-            }
-        }
-        # For Anthropic through Bedrock proxy, if it supports structured output,
-        # the format might differ. The current proxy seems to emulate OpenAI.
+s3_client = boto3.client('s3') # Initialize S3 client globally or within handler
 
-    if tools:
-        data['tools'] = tools
+prewarm('gemini-2.5-flash')
 
-    data_bytes = json.dumps(data).encode('utf-8')
-    
-    max_retries = 5
-    base_delay = 1
-    max_delay = 10
-    
-    for attempt in range(max_retries + 1):
-        req = request.Request(url, data=data_bytes, method='POST') # Ensure POST
-        req.add_header('Content-Type', 'application/json')
-        req.add_header('Authorization', f'Bearer {api_key}')
-        
-        try:
-            with request.urlopen(req) as resp:
-                if resp.status == 200:
-                    content = resp.read()
-                    output = json.loads(content)
-                    print("LLM Raw Output:", output) # For debugging
-                    if output.get('choices') and output['choices'][0].get('message'):
-                        return output['choices'][0]['message']
-                    else: # Handle cases like Anthropic via Bedrock proxy if structure differs
-                        # This part might need adjustment based on actual proxy response for errors/structure
-                        print(f"Unexpected LLM response structure: {output}")
-                        # Attempt to find content if structure is slightly different (e.g. Claude on Bedrock)
-                        if output.get('content') and isinstance(output['content'], list) and output['content'][0].get('text'):
-                             return {"role": "assistant", "content": output['content'][0]['text']} # Adapt to OpenAI-like structure
-                        return {"role": "assistant", "content": json.dumps(output)} # Fallback to stringified output
-                else:
-                    error_content = resp.read().decode('utf-8')
-                    print(f"HTTP Error: {resp.status} - {resp.reason}. Response: {error_content}")
-                    # For 4xx errors, typically don't retry unless specific (e.g. rate limit 429)
-                    if 400 <= resp.status < 500 and resp.status != 429:
-                        raise Exception(f"HTTP Client Error: {resp.status} - {error_content}")
-                    raise urllib_error.HTTPError(url, resp.status, error_content, resp.headers, None)
-                    
-        except Exception as e:
-            if attempt == max_retries:
-                print(f"Error: Final attempt failed after {max_retries} retries: {e}")
-                return None # Or raise the exception: raise
-            
-            # Check for specific retryable errors
-            is_http_error = isinstance(e, urllib_error.HTTPError)
-            is_url_error = isinstance(e, urllib_error.URLError) # General network issues
-                
-            if (is_http_error and e.code in [500, 502, 503, 504, 429]) or is_url_error: # Added 429 for rate limits
-                delay = min(base_delay * (2 ** attempt), max_delay)
-                jitter = delay * 0.1 * (0.5 - (0.5 * attempt / max_retries))
-                sleep_time = delay + jitter
-                
-                print(f"Attempt {attempt + 1} failed. Retrying in {sleep_time:.2f} seconds... Error: {e}")
-                time.sleep(sleep_time)
-            else:
-                print(f"Non-retryable error: {e}")
-                return None # Or raise the exception: raise
-    return None # Should be unreachable if retries exhaust or an error is re-raised
 
 def generate_questions_from_content(lesson_content_markdown: str) -> List[Dict[str, Any]]:
     """
@@ -261,6 +148,9 @@ def generate_questions_from_content(lesson_content_markdown: str) -> List[Dict[s
                 print(f"LLM model_output: {model_output}")
             previous_error_feedback = f"This is attempt {validation_attempt + 1} of {max_validation_retries}. In the previous attempt (attempt {validation_attempt}), the model call failed or returned no content."
         
+        # Don't let a Step Functions retry replay a response that failed validation
+        evict_cached(system_prompt, current_prompt, output_format=question_schema, model='gemini-2.5-flash')
+
         if validation_attempt < max_validation_retries:
             print(f"Validation failed on attempt {validation_attempt}. Retrying...")
             time.sleep(1 + validation_attempt) # Slightly increasing delay for retries
@@ -284,8 +174,7 @@ def _load_lesson_content_from_s3(s3_url: str) -> Dict[str, str]:
     
     try:
         response = s3_client.get_object(Bucket=bucket_name, Key=object_key)
-        content_string = response['Body'].read().decode('utf-8')
-        lesson_content_dict = json.loads(content_string)
+        lesson_content_dict = read_json(response) # Lesson content is stored gzip-encoded
         if not isinstance(lesson_content_dict, dict):
             raise ValueError(f"Content from S3 ({s3_url}) is not a JSON dictionary.")
         print(f"Successfully loaded and parsed lesson content from {s3_url}")
@@ -308,6 +197,7 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         chapter_id = event.get('chapter_id')
         lesson_id = event.get('lesson_id')
         lesson_s3_url = event.get('lesson_s3_url') # Expecting S3 URL for lesson content
+        user_id = event.get('user_id') # Absent from executions started before per-course keys
 
         if not all([course_id, chapter_id, lesson_id, lesson_s3_url]):
             missing_items = [
@@ -351,14 +241,12 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             print(error_msg)
             raise ValueError(error_msg)
     
-        questions_s3_key = f"{course_id}-{chapter_id}-{lesson_id}-questions.json"
+        if user_id:
+            questions_s3_key = questions_key(user_id, course_id, chapter_id, lesson_id)
+        else:
+            questions_s3_key = legacy_questions_key(course_id, chapter_id, lesson_id)
         try:
-            s3_client.put_object(
-                Bucket=questions_bucket_name, 
-                Key=questions_s3_key, 
-                Body=json.dumps(multiple_choice_questions, indent=2), 
-                ContentType='application/json'
-            )
+            put_json(s3_client, questions_bucket_name, questions_s3_key, multiple_choice_questions)
             questions_s3_path = f"s3://{questions_bucket_name}/{questions_s3_key}"
             print(f"Successfully saved multiple choice questions to S3: {questions_s3_path}")
         except Exception as e:
@@ -4,8 +4,48 @@ import os
 import base64
 from botocore.exceptions import ClientError
 
+# Slim index projecting only the list fields (see tables/__init__.py)
+LIST_INDEX_NAME = 'UserID-list-index'
+LIST_PROJECTION = "CourseID, UserID, title, description, cover_image_url, cover_image_variants, plan_status"
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 100
+
+
+def _encode_token(last_evaluated_key):
+    return base64.urlsafe_b64encode(json.dumps(last_evaluated_key).encode('utf-8')).decode('utf-8')
+
+
+def _decode_token(token, user_id):
+    """Returns the ExclusiveStartKey encoded in a next_token. Raises ValueError if it is invalid."""
+    try:
+        start_key = json.loads(base64.urlsafe_b64decode(token.encode('utf-8')))
+    except Exception as e:
+        raise ValueError(f'Invalid next_token: {str(e)}') from e
+    if not isinstance(start_key, dict) or start_key.get('UserID') != user_id:
+        raise ValueError('Invalid next_token')
+    return start_key
+
+
+def _query_page(table, user_id, limit, start_key=None):
+    query_kwargs = {
+        'IndexName': LIST_INDEX_NAME,
+        'KeyConditionExpression': boto3.dynamodb.conditions.Key('UserID').eq(user_id), # type: ignore
+        'ProjectionExpression': LIST_PROJECTION
+    }
+    if limit:
+        query_kwargs['Limit'] = limit
+    if start_key:
+        query_kwargs['ExclusiveStartKey'] = start_key
+    response = table.query(**query_kwargs)
+    return response.get('Items', []), response.get('LastEvaluatedKey')
+
+
 def lambda_handler(event, context):
-    
+    """
+    Lists the user's courses. With `limit` and/or `next_token` query parameters, returns one
+    page as {"courses": [...], "next_token": ...}; next_token is null on the last page.
+    Without them, returns every course as a plain list, as older clients expect.
+    """
     headers = {
         "Content-Type": "application/json",
         "Access-Control-Allow-Origin": "*",
@@ -55,15 +95,34 @@ def lambda_handler(event, context):
                 'headers': headers
             }
 
+        query_params = event.get('queryStringParameters') or {}
+        paginated = 'limit' in query_params or 'next_token' in query_params
+        start_key = None
+        limit = None
+        try:
+            if paginated:
+                limit = min(max(int(query_params.get('limit', DEFAULT_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+                if query_params.get('next_token'):
+                    start_key = _decode_token(query_params['next_token'], UserID)
+        except ValueError as e:
+            return {
+                'statusCode': 400,
+                'body': json.dumps({'error': str(e)}),
+                'headers': headers
+            }
+
         dynamodb = boto3.resource('dynamodb')
         table = dynamodb.Table(table_name) # type: ignore
         
         try:
-            response = table.query(
-                IndexName='UserID-index',
-                KeyConditionExpression=boto3.dynamodb.conditions.Key('UserID').eq(UserID) # type: ignore
-            )
-            items = response.get('Items', [])
+            if paginated:
+                items, last_evaluated_key = _query_page(table, UserID, limit, start_key)
+            else:
+                # Follow every page; a single query stops at 1 MB
+                items, last_evaluated_key = _query_page(table, UserID, None)
+                while last_evaluated_key:
+                    page, last_evaluated_key = _query_page(table, UserID, None, last_evaluated_key)
+                    items.extend(page)
         except ClientError as e:
             print(f"DynamoDB ClientError querying courses: {str(e)}")
             return {
@@ -79,20 +138,33 @@ def lambda_handler(event, context):
             description = item.get('description')
             cover_image_url = item.get('cover_image_url', None)
             if course_id and title is not None and description is not None: # Ensure all required fields are present
-                course_list.append({
+                course = {
                     'CourseID': course_id,
                     'title': title,
                     'description': description,
                     'cover_image_url': cover_image_url
-                })
+                }
+                if item.get('cover_image_variants'):
+                    course['cover_image_variants'] = item['cover_image_variants'] # Thumbnails for the list
+                if item.get('plan_status'):
+                    course['plan_status'] = item['plan_status']
+                course_list.append(course)
             else:
                 print(f"Warning: Skipping item due to missing fields: {item}")
         
         print(course_list)
 
+        if paginated:
+            body = {
+                'courses': course_list,
+                'next_token': _encode_token(last_evaluated_key) if last_evaluated_key else None
+            }
+        else:
+            body = course_list
+
         return {
             'statusCode': 200,
-            'body': json.dumps(course_list),
+            'body': json.dumps(body),
             'headers': headers
         }
 
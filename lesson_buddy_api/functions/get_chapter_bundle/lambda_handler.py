@@ -0,0 +1,138 @@
+import json
+import boto3
+import os
+from concurrent.futures import ThreadPoolExecutor
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+import course_store # Provided by the shared layer
+from content_store import get_first, lesson_key, legacy_lesson_key, questions_key, legacy_questions_key, read_json
+from flashcard_store import load_deck
+from warm_cache import WarmCache, get_s3_object
+
+# Enough connections for every concurrent fetch of a chapter
+MAX_FETCH_WORKERS = 16
+s3_client = boto3.client('s3', config=Config(max_pool_connections=MAX_FETCH_WORKERS))
+dynamodb = boto3.resource('dynamodb')
+# Lesson and question objects already read by this container, revalidated by ETag once expired
+object_cache = WarmCache(ttl_seconds=300)
+
+OK = 'OK'
+NOT_FOUND = 'NOT_FOUND'
+ERROR = 'ERROR'
+
+
+def _get_json_object(bucket_name, keys):
+    """
+    Returns {'status', 'data'} for the first of `keys` that exists in S3 (the per-course key,
+    then the legacy flat key), mirroring what the single-item endpoints return.
+    """
+    try:
+        response = get_first(lambda key: get_s3_object(object_cache, s3_client, bucket_name, key), keys)
+        return {'status': OK, 'data': read_json(response)}
+    except ClientError as e:
+        if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+            return {'status': NOT_FOUND, 'data': None}
+        print(f"S3 ClientError getting s3://{bucket_name}/{keys[0]}: {str(e)}")
+        return {'status': ERROR, 'data': None, 'error': str(e)}
+    except Exception as e:
+        print(f"Error reading s3://{bucket_name}/{keys[0]}: {str(e)}")
+        return {'status': ERROR, 'data': None, 'error': str(e)}
+
+
+def _get_flashcards(course_id, chapter_id, lesson_id):
+    table = dynamodb.Table(os.environ['FLASHCARDS_TABLE_NAME'])
+    try:
+        flashcards = load_deck(table, course_id, chapter_id, lesson_id)
+    except ClientError as e:
+        print(f"DynamoDB error reading flashcards for lesson {lesson_id}: {str(e)}")
+        return {'status': ERROR, 'data': None, 'error': str(e)}
+
+    if not flashcards:
+        return {'status': NOT_FOUND, 'data': None}
+    return {'status': OK, 'data': flashcards}
+
+
+def lambda_handler(event, context):
+    """
+    Returns everything needed to open a chapter in one response: for each lesson its content,
+    multiple choice questions and flashcards, each with its own status (OK, NOT_FOUND or ERROR)
+    so lessons that are still generating don't fail the whole bundle. All objects are fetched
+    concurrently once the caller's ownership of the course is checked.
+    """
+    headers = {'Content-Type': 'application/json', "Access-Control-Allow-Origin": "*"}
+    print(event)
+
+    try:
+        user_id = event['requestContext']['authorizer']['claims']['sub']
+    except KeyError as e:
+        print(f"Error accessing user_id from event context: {str(e)}")
+        return {
+            'statusCode': 401,
+            'body': json.dumps({'error': f'Could not extract user ID from request context: {str(e)}'}),
+            'headers': headers
+        }
+
+    query_params = event.get('queryStringParameters') or {}
+    course_id = query_params.get('course_id')
+    chapter_id = query_params.get('chapter_id')
+    if not all([course_id, chapter_id]):
+        return {
+            'statusCode': 400,
+            'body': json.dumps({'error': 'Missing required query string parameters: course_id, chapter_id'}),
+            'headers': headers
+        }
+
+    lesson_bucket = os.environ.get('LESSON_BUCKET_NAME')
+    questions_bucket = os.environ.get('QUESTIONS_BUCKET_NAME')
+    if not all([lesson_bucket, questions_bucket, os.environ.get('COURSE_TABLE_NAME'), os.environ.get('FLASHCARDS_TABLE_NAME')]):
+        print("Error: bucket or table environment variables not set.")
+        return {
+            'statusCode': 500,
+            'body': json.dumps({'error': 'Server configuration error: Bucket or table names not set.'}),
+            'headers': headers
+        }
+
+    try:
+        chapter_item = course_store.load_chapter(dynamodb.Table(os.environ['COURSE_TABLE_NAME']), course_id, user_id, chapter_id)
+    except ClientError as e:
+        print(f"DynamoDB ClientError reading course {course_id}: {str(e)}")
+        return {
+            'statusCode': 500,
+            'body': json.dumps({'error': f'Could not retrieve course: {str(e)}'}),
+            'headers': headers
+        }
+    if not chapter_item:
+        return {
+            'statusCode': 404,
+            'body': json.dumps({'error': f'Chapter {chapter_id} not found in course {course_id}.'}),
+            'headers': headers
+        }
+    chapter = chapter_item['chapter']
+
+    lesson_ids = [lesson['id'] for lesson in chapter.get('lessons', []) if lesson.get('id')]
+    with ThreadPoolExecutor(max_workers=MAX_FETCH_WORKERS) as executor:
+        futures = {
+            lesson_id: {
+                'content': executor.submit(_get_json_object, lesson_bucket, [lesson_key(user_id, course_id, chapter_id, lesson_id), legacy_lesson_key(course_id, chapter_id, lesson_id)]),
+                'questions': executor.submit(_get_json_object, questions_bucket, [questions_key(user_id, course_id, chapter_id, lesson_id), legacy_questions_key(course_id, chapter_id, lesson_id)]),
+                'flashcards': executor.submit(_get_flashcards, course_id, chapter_id, lesson_id)
+            }
+            for lesson_id in lesson_ids
+        }
+        lessons = [
+            {'lesson_id': lesson_id, **{part: future.result() for part, future in parts.items()}}
+            for lesson_id, parts in futures.items()
+        ]
+
+    bundle = {
+        'course_id': course_id,
+        'chapter_id': chapter_id,
+        'chapter_status': chapter_item.get('chapter_status') or {},
+        'lessons': lessons
+    }
+    return {
+        'statusCode': 200,
+        'body': json.dumps(bundle),
+        'headers': headers
+    }
@@ -0,0 +1,132 @@
+import json
+import boto3
+import os
+from concurrent.futures import ThreadPoolExecutor
+from botocore.exceptions import ClientError
+
+import course_store # Provided by the shared layer
+
+sfn_client = boto3.client('stepfunctions')
+dynamodb = boto3.resource('dynamodb')
+
+MAX_EXECUTION_ARNS = 10 # Chapters generate one at a time per user, so a handful is plenty
+STATUS_NAMES = ('lessons_status', 'mcqs_status', 'flashcards_status')
+
+
+def _describe_execution(execution_arn, user_id):
+    """Mirrors check_chapter_generation_status's step_function_details for one execution ARN."""
+    try:
+        response = sfn_client.describe_execution(executionArn=execution_arn)
+    except ClientError as e:
+        code = e.response['Error']['Code']
+        if code in ('ExecutionDoesNotExist', 'InvalidArn'):
+            return {'execution_arn': execution_arn, 'status': 'NOT_FOUND', 'is_complete': False, 'is_failed': True}
+        print(f"Error describing Step Function execution {execution_arn}: {str(e)}")
+        return {'execution_arn': execution_arn, 'status': 'ERROR', 'error': str(e), 'is_complete': False, 'is_failed': True}
+
+    # Every chapter execution is started with the user's ID; don't report on other users' executions
+    try:
+        execution_user_id = json.loads(response.get('input') or '{}').get('user_id')
+    except json.JSONDecodeError:
+        execution_user_id = None
+    if execution_user_id != user_id:
+        return {'execution_arn': execution_arn, 'status': 'NOT_FOUND', 'is_complete': False, 'is_failed': True}
+
+    status = response.get('status')
+    details = {
+        'execution_arn': execution_arn,
+        'status': status,
+        'is_complete': status == 'SUCCEEDED',
+        'is_failed': status in ('FAILED', 'TIMED_OUT', 'ABORTED')
+    }
+    if details['is_failed']:
+        for name in ('error', 'cause'):
+            if response.get(name):
+                details[name] = response[name]
+    return details
+
+
+def lambda_handler(event, context):
+    """
+    Returns the generation status of every chapter of a course, and optionally of several
+    Step Functions executions, in one call. Chapter statuses are read with a projection on
+    the status attributes only; executions are described concurrently.
+    """
+    headers = {'Content-Type': 'application/json', "Access-Control-Allow-Origin": "*"}
+    print(event)
+
+    try:
+        user_id = event['requestContext']['authorizer']['claims']['sub']
+    except KeyError as e:
+        print(f"Error accessing user_id from event context: {str(e)}")
+        return {
+            'statusCode': 401,
+            'body': json.dumps({'error': f'Could not extract user ID from request context: {str(e)}'}),
+            'headers': headers
+        }
+
+    query_params = event.get('queryStringParameters') or {}
+    course_id = query_params.get('course_id')
+    execution_arns = [arn.strip() for arn in (query_params.get('execution_arns') or '').split(',') if arn.strip()]
+    if not course_id:
+        return {
+            'statusCode': 400,
+            'body': json.dumps({'error': 'Missing required parameter: course_id'}),
+            'headers': headers
+        }
+    if len(execution_arns) > MAX_EXECUTION_ARNS:
+        return {
+            'statusCode': 400,
+            'body': json.dumps({'error': f'At most {MAX_EXECUTION_ARNS} execution_arns can be checked per request.'}),
+            'headers': headers
+        }
+
+    table_name = os.environ.get('COURSE_TABLE_NAME')
+    if not table_name:
+        print("Error: COURSE_TABLE_NAME environment variable not set.")
+        return {
+            'statusCode': 500,
+            'body': json.dumps({'error': 'Server configuration error: Course table name not set.'}),
+            'headers': headers
+        }
+
+    with ThreadPoolExecutor(max_workers=MAX_EXECUTION_ARNS + 1) as executor:
+        execution_futures = [executor.submit(_describe_execution, arn, user_id) for arn in execution_arns]
+        try:
+            course_statuses = course_store.load_chapter_statuses(dynamodb.Table(table_name), course_id, user_id)
+        except ClientError as e:
+            print(f"DynamoDB ClientError reading chapter statuses: {str(e)}")
+            return {
+                'statusCode': 500,
+                'body': json.dumps({'error': f'Could not retrieve chapter statuses: {str(e)}'}),
+                'headers': headers
+            }
+        executions = [future.result() for future in execution_futures]
+
+    if course_statuses is None:
+        return {
+            'statusCode': 404,
+            'body': json.dumps({'error': f'Course {course_id} not found for user.'}),
+            'headers': headers
+        }
+
+    result = {
+        'course_id': course_id,
+        'plan_status': course_statuses['plan_status'],
+        'chapters': [
+            {
+                'chapter_id': chapter['chapter_id'],
+                **{name: chapter['chapter_status'].get(name, 'PENDING') for name in STATUS_NAMES},
+                'last_updated': chapter['chapter_status'].get('last_updated')
+            }
+            for chapter in course_statuses['chapters']
+        ]
+    }
+    if execution_arns:
+        result['executions'] = executions
+
+    return {
+        'statusCode': 200,
+        'body': json.dumps(result),
+        'headers': headers
+    }
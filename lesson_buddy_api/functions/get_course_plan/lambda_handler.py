@@ -3,6 +3,38 @@ import boto3
 import os
 import base64
 
+import course_store # Provided by the shared layer
+from warm_cache import WarmCache
+
+sqs_client = boto3.client('sqs')
+dynamodb = boto3.resource('dynamodb')
+
+# Course and chapter items already read by this container, keyed by their version (see
+# course_store.course_version / chapter_version). Every hit is revalidated with a projected
+# read of the status attributes, so a regenerated chapter or new cover image is never served
+# stale; the cache saves reading and assembling the plan content.
+course_cache = WarmCache(ttl_seconds=300)
+
+
+def _enqueue_prefetch(course_id, user_id, chapter_id):
+    """Asks for the chapter after `chapter_id` to be generated ahead of time. Best effort."""
+    queue_url = os.environ.get('PREFETCH_QUEUE_URL')
+    if not queue_url:
+        return
+    try:
+        sqs_client.send_message(
+            QueueUrl=queue_url,
+            MessageBody=json.dumps({
+                "course_id": course_id,
+                "user_id": user_id,
+                "chapter_id": chapter_id,
+                "reason": "chapter_opened"
+            })
+        )
+    except Exception as e:
+        print(f"Warning: could not enqueue prefetch for chapter after {chapter_id}: {str(e)}")
+
+
 def lambda_handler(event, context):
     print(event)
     
@@ -16,10 +48,12 @@ def lambda_handler(event, context):
     course_id = data.get('course_id') # Use .get() for safety
     chapter_id = data.get('chapter_id', None)
     user_id = None
+    requested_by_user = False # False for Step Functions calls, which pass user_id as a parameter
 
     # Attempt to get user_id from event context (API Gateway with Lambda Authorizer)
     try:
         user_id = event['requestContext']['authorizer']['claims']['sub']
+        requested_by_user = bool(user_id)
         if not user_id:
             # This might happen if 'sub' is empty, though unlikely with a proper authorizer
             print("User ID (sub) is present but empty in authorizer claims.")
@@ -56,14 +90,60 @@ def lambda_handler(event, context):
         }
 
     # pull from dynamo
-    dynamodb = boto3.resource('dynamodb')
     table_name = os.environ.get('COURSE_TABLE_NAME')
     if not table_name:
         raise ValueError("COURSE_TABLE_NAME environment variable not set.")
+
     table = dynamodb.Table(table_name)
-    
+    if chapter_id:
+        # Only the requested chapter's item is read
+        cache_key = ('chapter', course_id, user_id, chapter_id)
+        try:
+            chapter_item = None
+            if course_cache.peek(cache_key)[0] is not None:
+                current_version = course_store.load_chapter_version(table, course_id, user_id, chapter_id)
+                if current_version is not None: # None: the chapter item is gone
+                    chapter_item = course_cache.get(cache_key, version=current_version)
+            if chapter_item is None:
+                # Step Functions reads the chapter first, so a course still stored as a single
+                # item is split here before any chapter status is written
+                chapter_item = course_store.load_chapter(table, course_id, user_id, chapter_id, migrate=True)
+                if chapter_item is not None and not chapter_item.get('skeleton'): # Chapters being filled in aren't cached
+                    course_cache.put(cache_key, chapter_item, version=course_store.chapter_version(chapter_item))
+        except Exception as e: # Consider more specific boto3 client errors
+            print(f"Error getting chapter from DynamoDB: {str(e)}")
+            return {
+                'statusCode': 500,
+                'body': json.dumps({'error': f'Could not retrieve course data: {str(e)}'})
+            }
+
+        if chapter_item:
+            if requested_by_user:
+                # The user is reading this chapter; start on the next one while they do
+                _enqueue_prefetch(course_id, user_id, chapter_id)
+            return {
+                'statusCode': 200,
+                'body': json.dumps(chapter_item['chapter'])
+            }
+        else:
+            return {
+                'statusCode': 404,
+                'body': json.dumps({'error': f'Chapter with ID {chapter_id} not found in course {course_id}.'})
+            }
+
+    # No chapter_id requested, return the whole course
+    cache_key = ('course', course_id, user_id)
     try:
-        item_response = table.get_item(Key={'CourseID': course_id, 'UserID': user_id})
+        course_data = None
+        if course_cache.peek(cache_key)[0] is not None:
+            current_version = course_store.load_course_version(table, course_id, user_id)
+            if current_version is not None: # None: the course is gone
+                course_data = course_cache.get(cache_key, version=current_version)
+        if course_data is None:
+            # Courses still stored as a single item are split into chapter items on first read
+            course_data = course_store.load_course(table, course_id, user_id, migrate=True)
+            if course_data is not None and course_data.get('plan_status', 'COMPLETED') not in ('GENERATING', 'SKELETON'): # Plans being filled in aren't cached
+                course_cache.put(cache_key, course_data, version=course_store.course_version(course_data))
     except Exception as e: # Consider more specific boto3 client errors
         print(f"Error getting item from DynamoDB: {str(e)}")
         return {
@@ -71,34 +151,13 @@ def lambda_handler(event, context):
             'body': json.dumps({'error': f'Could not retrieve course data: {str(e)}'})
         }
 
-    if 'Item' not in item_response:
+    if course_data is None:
         return {
             'statusCode': 404,
             'body': json.dumps({'error': f'Course with ID {course_id} not found for user.'})
         }
-    
-    course_data = item_response['Item']
-        
-    if chapter_id:
-        found_chapter = None
-        if 'chapters' in course_data and isinstance(course_data['chapters'], list):
-            for chapter in course_data['chapters']:
-                if isinstance(chapter, dict) and chapter.get('id') == chapter_id:
-                    found_chapter = chapter
-                    break
-        
-        if found_chapter:
-            return {
-                'statusCode': 200,
-                'body': json.dumps(found_chapter)
-            }
-        else:
-            return {
-                'statusCode': 404,
-                'body': json.dumps({'error': f'Chapter with ID {chapter_id} not found in course {course_id}.'})
-            }
-    else: # No chapter_id requested, return the whole course
-        return {
-            'statusCode': 200,
-            'body': json.dumps(course_data)
-        }
+
+    return {
+        'statusCode': 200,
+        'body': json.dumps(course_data)
+    }
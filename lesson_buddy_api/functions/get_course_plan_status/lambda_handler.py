@@ -0,0 +1,79 @@
+import json
+import boto3
+import os
+from botocore.exceptions import ClientError
+
+dynamodb = boto3.resource('dynamodb')
+
+
+def lambda_handler(event, context):
+    """
+    Reports the status of an async course plan job (the job ID is the course ID).
+    Reads only the status attributes, so it is cheap to poll.
+    """
+    headers = {'Content-Type': 'application/json', "Access-Control-Allow-Origin": "*"}
+    print(event)
+
+    try:
+        user_id = event['requestContext']['authorizer']['claims']['sub']
+    except KeyError as e:
+        print(f"Error accessing user_id from event context: {str(e)}")
+        return {
+            'statusCode': 401,
+            'body': json.dumps({'error': f'Could not extract user ID from request context: {str(e)}'}),
+            'headers': headers
+        }
+
+    query_params = event.get('queryStringParameters') or {}
+    job_id = query_params.get('job_id') or query_params.get('course_id')
+    if not job_id:
+        return {
+            'statusCode': 400,
+            'body': json.dumps({'error': 'Missing required parameter: job_id'}),
+            'headers': headers
+        }
+
+    table_name = os.environ.get('COURSE_TABLE_NAME')
+    if not table_name:
+        print("Error: COURSE_TABLE_NAME environment variable not set.")
+        return {
+            'statusCode': 500,
+            'body': json.dumps({'error': 'Server configuration error: Course table name not set.'}),
+            'headers': headers
+        }
+
+    try:
+        response = dynamodb.Table(table_name).get_item(
+            Key={'CourseID': job_id, 'UserID': user_id},
+            ProjectionExpression="CourseID, plan_status, plan_error"
+        )
+    except ClientError as e:
+        print(f"DynamoDB ClientError reading course plan status: {str(e)}")
+        return {
+            'statusCode': 500,
+            'body': json.dumps({'error': f'Could not retrieve course plan status: {str(e)}'}),
+            'headers': headers
+        }
+
+    item = response.get('Item')
+    if not item:
+        return {
+            'statusCode': 404,
+            'body': json.dumps({'error': f'Course plan job {job_id} not found for user.'}),
+            'headers': headers
+        }
+
+    # Courses planned synchronously have no plan_status and are complete by definition
+    result = {
+        'job_id': job_id,
+        'course_id': job_id,
+        'plan_status': item.get('plan_status', 'COMPLETED')
+    }
+    if item.get('plan_error'):
+        result['error'] = item['plan_error']
+
+    return {
+        'statusCode': 200,
+        'body': json.dumps(result),
+        'headers': headers
+    }
@@ -2,9 +2,10 @@ import json
 import os
 import boto3
 import logging
-from decimal import Decimal
 from botocore.exceptions import ClientError
 
+import flashcard_store # Provided by the shared layer
+
 # Configure logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
@@ -12,16 +13,6 @@ logger.setLevel(logging.INFO)
 # Initialize DynamoDB client
 dynamodb = boto3.resource('dynamodb')
 
-def decimal_to_int(obj):
-    """Convert Decimal objects to int for JSON serialization"""
-    if isinstance(obj, Decimal):
-        return int(obj)
-    elif isinstance(obj, dict):
-        return {k: decimal_to_int(v) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [decimal_to_int(v) for v in obj]
-    return obj
-
 def lambda_handler(event, context):
     """
     Lambda function to retrieve flashcards for a specific lesson.
@@ -67,20 +58,14 @@ def lambda_handler(event, context):
             }
 
         # Construct the partition key for the flashcards
-        lesson_flashcard_id = f"FLASHCARD#{course_id}#{chapter_id}#{lesson_id}"
-        logger.info(f"Querying flashcards with LessonFlashcardId: {lesson_flashcard_id}")
+        lesson_flashcard_id = flashcard_store.lesson_flashcard_id(course_id, chapter_id, lesson_id)
+        logger.info(f"Reading flashcards for LessonFlashcardId: {lesson_flashcard_id}")
 
         try:
-            # Query DynamoDB for flashcards
-            response = table.query(
-                KeyConditionExpression="LessonFlashcardId = :lesson_id",
-                ExpressionAttributeValues={":lesson_id": lesson_flashcard_id},
-                ScanIndexForward=True  # Sort by CardId ascending (CARD#01, CARD#02, etc.)
-            )
+            # One deck item per lesson; lessons from before decks are queried card by card
+            flashcards = flashcard_store.load_deck(table, course_id, chapter_id, lesson_id)
             
-            flashcards_items = response.get('Items', [])
-            
-            if not flashcards_items:
+            if not flashcards:
                 logger.warning(f"No flashcards found for LessonFlashcardId: {lesson_flashcard_id}")
                 return {
                     "statusCode": 404,
@@ -93,23 +78,6 @@ def lambda_handler(event, context):
                     },
                 }
             
-            # Transform DynamoDB items to flashcards format
-            flashcards = []
-            for item in flashcards_items:
-                flashcard = {
-                    "cardNumber": item.get('CardNumber'),
-                    "question": item.get('Question'),
-                    "answer": item.get('Answer'),
-                    "createdAt": item.get('CreatedAt')
-                }
-                flashcards.append(flashcard)
-            
-            # Convert Decimal objects to int for JSON serialization
-            flashcards = decimal_to_int(flashcards)
-            
-            # Sort by card number to ensure proper order
-            flashcards.sort(key=lambda x: x.get('cardNumber', 0))
-            
             logger.info(f"Successfully retrieved {len(flashcards)} flashcards for lesson {lesson_id}")
             
             response_data = {
@@ -3,17 +3,153 @@ import boto3
 import os
 from urllib.parse import urlparse
 import base64
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+# SigV4 so pre-signed URLs work in every region
+s3_client = boto3.client('s3', config=Config(signature_version='s3v4'))
+dynamodb = boto3.resource('dynamodb')
+
+# Lifetime of the pre-signed URLs returned in url/redirect mode
+PRESIGNED_URL_TTL_SECONDS = int(os.environ.get('PRESIGNED_URL_TTL_SECONDS', '300'))
+MODES = ('data', 'url', 'redirect')
+
+
+class ImageAccessError(Exception):
+    def __init__(self, status_code, message):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _course_image_urls(item):
+    urls = set()
+    if item.get('cover_image_url'):
+        urls.add(item['cover_image_url'])
+    for formats in (item.get('cover_image_variants') or {}).values():
+        urls.update(formats.values())
+    return urls
+
+
+def _resolve_owned_image(user_id, course_id, s3_url, variant, image_format):
+    """
+    Checks that the user owns the course and returns the S3 URL of the requested image:
+    the given variant/format of the course cover, or `s3_url` if it is one of the course's images.
+    Raises ImageAccessError.
+    """
+    table_name = os.environ.get('COURSE_TABLE_NAME')
+    if not table_name:
+        print("Error: COURSE_TABLE_NAME environment variable not set.")
+        raise ImageAccessError(500, 'Server configuration error: Course table name not set.')
+
+    try:
+        response = dynamodb.Table(table_name).get_item(
+            Key={'CourseID': course_id, 'UserID': user_id},
+            ProjectionExpression="CourseID, cover_image_url, cover_image_variants"
+        )
+    except ClientError as e:
+        print(f"DynamoDB ClientError checking course ownership: {str(e)}")
+        raise ImageAccessError(500, f'Could not verify access to the image: {str(e)}')
+    item = response.get('Item')
+    if not item:
+        # Same answer whether the course doesn't exist or belongs to someone else
+        raise ImageAccessError(404, f'Course {course_id} not found for user.')
+
+    if variant:
+        url = (item.get('cover_image_variants') or {}).get(variant, {}).get(image_format)
+        if not url:
+            # Courses created before variants existed only have cover_image_url
+            url = item.get('cover_image_url')
+        if not url:
+            raise ImageAccessError(404, 'Image not found')
+        return url
+
+    if s3_url not in _course_image_urls(item):
+        raise ImageAccessError(403, 'Image does not belong to this course')
+    return s3_url
+
+
+def _course_id_from_key(s3_key):
+    # course-covers/{course_id}/{variant}.{ext} or the older course-covers/{course_id}.png
+    parts = s3_key.split('/')
+    if len(parts) >= 2 and parts[0] == 'course-covers':
+        return parts[1].split('.')[0]
+    return None
+
+
+def _presigned_response(bucket_name, s3_key, mode):
+    url = s3_client.generate_presigned_url(
+        'get_object',
+        Params={'Bucket': bucket_name, 'Key': s3_key},
+        ExpiresIn=PRESIGNED_URL_TTL_SECONDS
+    )
+    if mode == 'redirect':
+        return {
+            'statusCode': 302,
+            'body': '',
+            'headers': {
+                'Location': url,
+                'Cache-Control': f'private, max-age={max(PRESIGNED_URL_TTL_SECONDS - 60, 0)}', # Expire before the URL does
+                "Access-Control-Allow-Origin": "*"
+            }
+        }
+    return {
+        'statusCode': 200,
+        'body': json.dumps({'url': url, 'expires_in': PRESIGNED_URL_TTL_SECONDS}),
+        'headers': {'Content-Type': 'application/json', "Access-Control-Allow-Origin": "*"}
+    }
 
-s3_client = boto3.client('s3')
 
 def lambda_handler(event, context):
+    """
+    Returns a course image. The default `mode=data` streams the image base64-encoded through
+    API Gateway. `mode=url` returns a short-lived pre-signed S3 URL as JSON and `mode=redirect`
+    answers with a 302 to it; both check that the caller owns the course. The image is named
+    by `s3Url`, or by `course_id` plus `variant` (thumbnail, card, full) and `format` (webp, jpeg).
+    """
     try:
         print(f"Received event: {json.dumps(event)}")
 
+        query_params = event.get('queryStringParameters') or {}
         # Extract S3 URL from query string parameters for GET request
-        s3_url = None
-        if 'queryStringParameters' in event and event['queryStringParameters']:
-            s3_url = event['queryStringParameters'].get('s3Url')
+        s3_url = query_params.get('s3Url')
+        course_id = query_params.get('course_id')
+        variant = query_params.get('variant')
+        image_format = query_params.get('format', 'jpeg')
+        mode = query_params.get('mode', 'data')
+
+        if mode not in MODES:
+            return {
+                'statusCode': 400,
+                'body': json.dumps({'error': f"Invalid mode: {mode}. Expected one of {', '.join(MODES)}"}),
+                'headers': {'Content-Type': 'application/json', "Access-Control-Allow-Origin": "*"}
+            }
+
+        if mode != 'data':
+            try:
+                user_id = event['requestContext']['authorizer']['claims']['sub']
+            except KeyError as e:
+                print(f"Error accessing user_id from event context: {str(e)}")
+                return {
+                    'statusCode': 401,
+                    'body': json.dumps({'error': f'Could not extract user ID from request context: {str(e)}'}),
+                    'headers': {'Content-Type': 'application/json', "Access-Control-Allow-Origin": "*"}
+                }
+            if not course_id and s3_url:
+                course_id = _course_id_from_key(urlparse(s3_url).path.lstrip('/'))
+            if not course_id or not (s3_url or variant):
+                return {
+                    'statusCode': 400,
+                    'body': json.dumps({'error': 'url and redirect modes need course_id with s3Url or variant'}),
+                    'headers': {'Content-Type': 'application/json', "Access-Control-Allow-Origin": "*"}
+                }
+            try:
+                s3_url = _resolve_owned_image(user_id, course_id, s3_url, variant, image_format)
+            except ImageAccessError as e:
+                return {
+                    'statusCode': e.status_code,
+                    'body': json.dumps({'error': str(e)}),
+                    'headers': {'Content-Type': 'application/json', "Access-Control-Allow-Origin": "*"}
+                }
 
         if not s3_url:
             return {
@@ -59,6 +195,10 @@ def lambda_handler(event, context):
                 'headers': {'Content-Type': 'application/json', "Access-Control-Allow-Origin": "*"}
             }
 
+        if mode != 'data':
+            # The client downloads straight from S3; the image never passes through Lambda
+            return _presigned_response(bucket_name, s3_key, mode)
+
         print(f"Attempting to retrieve object from bucket: {bucket_name}, key: {s3_key}")
 
         try:
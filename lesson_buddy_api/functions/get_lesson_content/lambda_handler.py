@@ -4,6 +4,17 @@ import os
 import base64
 from botocore.exceptions import ClientError
 
+from content_store import etag_matches, get_first, is_gzipped, request_etags, lesson_key, legacy_lesson_key, read_text, wants_gzip_body # Provided by the shared layer
+from warm_cache import WarmCache, get_s3_object
+
+s3 = boto3.client('s3')
+# Lesson objects already read by this container, revalidated against S3 by ETag once expired
+content_cache = WarmCache(ttl_seconds=300)
+
+# Lesson content only changes when a chapter is regenerated; clients revalidate with If-None-Match after this
+CACHE_CONTROL = "private, max-age=300"
+
+
 def lambda_handler(event, context):
     
     headers = {
@@ -61,8 +72,7 @@ def lambda_handler(event, context):
             'headers': headers
         }
 
-    content_key = f'{course_id}-{chapter_id}-{lesson_id}.json'
-    s3 = boto3.client('s3')
+    content_keys = [lesson_key(user_id, course_id, chapter_id, lesson_id), legacy_lesson_key(course_id, chapter_id, lesson_id)]
     
     bucket_name = os.environ.get('LESSON_BUCKET_NAME')
     if not bucket_name:
@@ -74,17 +84,37 @@ def lambda_handler(event, context):
         }
 
     try:
-        response = s3.get_object(Bucket=bucket_name, Key=content_key)
-        content = response['Body'].read().decode('utf-8')
+        # Without a cached copy, S3 checks the client's tags itself and skips sending the body if they match
+        client_etags = request_etags(event)
+        response = get_first(lambda key: get_s3_object(content_cache, s3, bucket_name, key, client_etags), content_keys)
+        response_headers = {**headers, 'ETag': response['ETag'], 'Cache-Control': CACHE_CONTROL, 'Vary': 'Accept, Accept-Encoding'}
+
+        if response.get('NotModified') or etag_matches(event, response['ETag']):
+            return {
+                'statusCode': 304,
+                'body': '',
+                'headers': response_headers
+            }
+
+        if is_gzipped(response) and wants_gzip_body(event):
+            # Stored bytes go out as they are; API Gateway turns the base64 back into binary
+            return {
+                'statusCode': 200,
+                'body': base64.b64encode(response['Body'].read()).decode('utf-8'),
+                'isBase64Encoded': True,
+                'headers': {**response_headers, 'Content-Encoding': 'gzip'}
+            }
+
+        content = read_text(response)
         
         return {
             'statusCode': 200,
             'body': content, 
-            'headers': headers 
+            'headers': response_headers
         }
     except s3.exceptions.NoSuchKey:
         # bucket_name is guaranteed to be set here due to the check above
-        print(f"Content not found in S3: s3://{bucket_name}/{content_key}")
+        print(f"Content not found in S3: s3://{bucket_name}/{content_keys[0]}")
         return {
             'statusCode': 404,
             'body': json.dumps({'error': 'Lesson content not found.'}),
@@ -3,14 +3,23 @@ import os
 import boto3
 import logging
 import base64
+from botocore.exceptions import ClientError
+
+from content_store import etag_matches, get_first, is_gzipped, request_etags, questions_key, legacy_questions_key, read_text, wants_gzip_body # Provided by the shared layer
+from warm_cache import WarmCache, get_s3_object
 
 # Configure logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
 s3_client = boto3.client("s3")
+# Question objects already read by this container, revalidated against S3 by ETag once expired
+questions_cache = WarmCache(ttl_seconds=300)
 # The bucket name will be retrieved from the Lambda environment variables
 QUESTIONS_BUCKET_NAME = os.environ.get("QUESTIONS_BUCKET_NAME") 
+# Questions only change when a chapter is regenerated; clients revalidate with If-None-Match after this
+CACHE_CONTROL = "private, max-age=300"
+
 
 def lambda_handler(event, context):
     logger.info(f"Received event: {json.dumps(event)}")
@@ -78,24 +87,50 @@ def lambda_handler(event, context):
                 },
             }
 
-        # Construct the S3 key for the multiple choice questions
-        # Based on generate_multiple_choice_questions/lambda_handler.py
-        s3_key = f"{course_id}-{chapter_id}-{lesson_id}-questions.json"
+        # Construct the S3 key for the multiple choice questions, falling back to the flat
+        # key used before per-course prefixes (see content_store)
+        s3_key = questions_key(user_id, course_id, chapter_id, lesson_id)
+        s3_keys = [s3_key, legacy_questions_key(course_id, chapter_id, lesson_id)]
         logger.info(f"Attempting to retrieve object from S3: Bucket='{QUESTIONS_BUCKET_NAME}', Key='{s3_key}'")
 
         try:
-            response = s3_client.get_object(Bucket=QUESTIONS_BUCKET_NAME, Key=s3_key)
-            questions_content = response["Body"].read().decode("utf-8")
-            questions_data = json.loads(questions_content)
+            # Without a cached copy, S3 checks the client's tags itself and skips sending the body if they match
+            client_etags = request_etags(event)
+            response = get_first(lambda key: get_s3_object(questions_cache, s3_client, QUESTIONS_BUCKET_NAME, key, client_etags), s3_keys)
+            response_headers = {
+                "Content-Type": "application/json",
+                "Access-Control-Allow-Origin": "*",
+                "ETag": response["ETag"],
+                "Cache-Control": CACHE_CONTROL,
+                "Vary": "Accept, Accept-Encoding",
+            }
+
+            if response.get("NotModified") or etag_matches(event, response["ETag"]):
+                logger.info(f"Questions unchanged for: {s3_key}")
+                return {
+                    "statusCode": 304,
+                    "body": "",
+                    "headers": response_headers,
+                }
+
+            if is_gzipped(response) and wants_gzip_body(event):
+                # Stored bytes go out as they are; API Gateway turns the base64 back into binary
+                logger.info(f"Returning stored gzip questions for: {s3_key}")
+                return {
+                    "statusCode": 200,
+                    "body": base64.b64encode(response["Body"].read()).decode("utf-8"),
+                    "isBase64Encoded": True,
+                    "headers": {**response_headers, "Content-Encoding": "gzip"},
+                }
+
+            # Stored as JSON already; no need to parse and re-serialize it
+            questions_content = read_text(response)
             
-            logger.info(f"Successfully retrieved and parsed questions for: {s3_key}")
+            logger.info(f"Successfully retrieved questions for: {s3_key}")
             return {
                 "statusCode": 200,
-                "body": json.dumps(questions_data),
-                "headers": {
-                    "Content-Type": "application/json",
-                    "Access-Control-Allow-Origin": "*",
-                },
+                "body": questions_content,
+                "headers": response_headers,
             }
         except s3_client.exceptions.NoSuchKey:
             logger.warning(f"Multiple choice questions file not found at s3://{QUESTIONS_BUCKET_NAME}/{s3_key}")
@@ -109,6 +144,18 @@ def lambda_handler(event, context):
                     "Access-Control-Allow-Origin": "*",
                 },
             }
+        except ClientError as e:
+            logger.error(f"Error retrieving S3 object s3://{QUESTIONS_BUCKET_NAME}/{s3_key}: {str(e)}")
+            return {
+                "statusCode": 500,
+                "body": json.dumps({
+                    "error": f"Failed to retrieve multiple choice questions: {str(e)}"
+                }),
+                "headers": {
+                    "Content-Type": "application/json",
+                    "Access-Control-Allow-Origin": "*",
+                },
+            }
         except Exception as e:
             logger.error(f"Error retrieving or parsing S3 object s3://{QUESTIONS_BUCKET_NAME}/{s3_key}: {str(e)}")
             return {
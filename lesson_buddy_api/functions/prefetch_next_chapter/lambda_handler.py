@@ -0,0 +1,117 @@
+import json
+import os
+import boto3
+from botocore.exceptions import ClientError
+
+import course_store
+from chapter_executions import prefetch_execution_name, prefetch_user_prefix
+
+sfn_client = boto3.client('stepfunctions')
+dynamodb = boto3.resource('dynamodb')
+
+# Running prefetch executions allowed in total and per user. User-requested chapters
+# (/generate-chapter) are not subject to these caps.
+MAX_GLOBAL_EXECUTIONS = int(os.environ.get('PREFETCH_MAX_GLOBAL_EXECUTIONS', '20'))
+MAX_EXECUTIONS_PER_USER = int(os.environ.get('PREFETCH_MAX_EXECUTIONS_PER_USER', '1'))
+
+
+class PrefetchDeferred(Exception):
+    """Raised when a concurrency cap is reached; the message is retried after its visibility timeout."""
+
+
+def _find_next_chapter(course_id, user_id, chapter_id):
+    """
+    Returns the ID of the chapter after `chapter_id` if it still needs generating, otherwise None.
+    """
+    table = dynamodb.Table(os.environ['COURSE_TABLE_NAME'])
+    chapter_ids = course_store.load_chapter_ids(table, course_id, user_id)
+    if chapter_ids is None:
+        print(f"Course {course_id} not found for user {user_id}, nothing to prefetch.")
+        return None
+
+    if chapter_id not in chapter_ids:
+        print(f"Chapter {chapter_id} not found in course {course_id}, nothing to prefetch.")
+        return None
+    position = chapter_ids.index(chapter_id)
+    if position + 1 >= len(chapter_ids):
+        print(f"Chapter {chapter_id} is the last chapter of course {course_id}, nothing to prefetch.")
+        return None
+
+    next_chapter_id = chapter_ids[position + 1]
+    next_chapter = course_store.load_chapter(table, course_id, user_id, next_chapter_id) or {}
+    next_status = (next_chapter.get('chapter_status') or {}).get('lessons_status', 'PENDING')
+    if next_status != 'PENDING':
+        print(f"Next chapter {next_chapter_id} of course {course_id} is already {next_status}, nothing to prefetch.")
+        return None
+    return next_chapter_id
+
+
+def _check_caps(state_machine_arn, user_id):
+    """Raises PrefetchDeferred if starting another prefetch execution would exceed a cap."""
+    running = []
+    paginator = sfn_client.get_paginator('list_executions')
+    for page in paginator.paginate(stateMachineArn=state_machine_arn, statusFilter='RUNNING'):
+        running.extend(page.get('executions', []))
+        if len(running) >= MAX_GLOBAL_EXECUTIONS:
+            raise PrefetchDeferred(f"{len(running)} chapter generations already running (cap {MAX_GLOBAL_EXECUTIONS}).")
+
+    user_prefix = prefetch_user_prefix(user_id)
+    user_running = sum(1 for execution in running if execution['name'].startswith(user_prefix))
+    if user_running >= MAX_EXECUTIONS_PER_USER:
+        raise PrefetchDeferred(f"User already has {user_running} prefetch generations running (cap {MAX_EXECUTIONS_PER_USER}).")
+
+
+def _prefetch(message):
+    course_id = message.get('course_id')
+    user_id = message.get('user_id')
+    chapter_id = message.get('chapter_id')
+    if not all([course_id, user_id, chapter_id]):
+        print(f"Ignoring prefetch message without course_id, user_id and chapter_id: {message}")
+        return
+
+    next_chapter_id = _find_next_chapter(course_id, user_id, chapter_id)
+    if not next_chapter_id:
+        return
+
+    state_machine_arn = os.environ['STEP_FUNCTION_ARN']
+    _check_caps(state_machine_arn, user_id)
+
+    try:
+        response = sfn_client.start_execution(
+            stateMachineArn=state_machine_arn,
+            name=prefetch_execution_name(course_id, user_id, next_chapter_id), # Deterministic; see chapter_executions
+            input=json.dumps({
+                "course_id": course_id,
+                "user_id": user_id,
+                "chapter_id": next_chapter_id
+            })
+        )
+        print(f"Prefetching chapter {next_chapter_id} of course {course_id} ({message.get('reason')}): {response['executionArn']}")
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ExecutionAlreadyExists':
+            print(f"Chapter {next_chapter_id} of course {course_id} was already prefetched.")
+            return
+        raise
+
+
+def lambda_handler(event, context):
+    """
+    Consumes the chapter prefetch queue. Each message names a chapter the user just finished
+    generating or opened; the chapter after it is generated ahead of time if it is still
+    pending and the concurrency caps allow it. Prefetched chapters don't enqueue further
+    prefetches (the state machine skips that step for prefetch- executions), so generation
+    runs at most one chapter ahead of the user. Deferred or failed messages are reported as
+    batch item failures so SQS redelivers them later.
+    """
+    batch_item_failures = []
+    for record in event.get('Records', []):
+        try:
+            _prefetch(json.loads(record['body']))
+        except PrefetchDeferred as e:
+            print(f"Deferring prefetch message {record['messageId']}: {e}")
+            batch_item_failures.append({"itemIdentifier": record['messageId']})
+        except Exception as e:
+            print(f"Error processing prefetch message {record['messageId']}: {str(e)}")
+            batch_item_failures.append({"itemIdentifier": record['messageId']})
+
+    return {"batchItemFailures": batch_item_failures}
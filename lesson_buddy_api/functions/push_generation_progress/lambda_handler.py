@@ -0,0 +1,124 @@
+import json
+import os
+from decimal import Decimal
+import boto3
+from boto3.dynamodb.conditions import Key
+from boto3.dynamodb.types import TypeDeserializer
+from botocore.exceptions import ClientError
+
+import course_store # Provided by the shared layer
+
+dynamodb = boto3.resource('dynamodb')
+management_client = boto3.client('apigatewaymanagementapi', endpoint_url=os.environ.get('WEBSOCKET_CALLBACK_URL'))
+deserializer = TypeDeserializer()
+
+# Header attributes whose changes are pushed (async course plans and cover images)
+COURSE_PUSH_ATTRIBUTES = ('plan_status', 'plan_error', 'cover_image_url', 'cover_image_variants')
+
+
+def _decimal_default(obj):
+    if isinstance(obj, Decimal):
+        return int(obj) if obj % 1 == 0 else float(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _image(record, name):
+    image = record['dynamodb'].get(name) or {}
+    return {key: deserializer.deserialize(value) for key, value in image.items()}
+
+
+def _messages(record):
+    """Returns (user_id, message) pairs for the changes in one course table stream record."""
+    old, new = _image(record, 'OldImage'), _image(record, 'NewImage')
+    if not new:
+        return []
+    course_id, sort_key = new['CourseID'], new['UserID']
+
+    if course_store.CHAPTER_MARKER in sort_key:
+        # A chapter item: its status is what the app used to poll for
+        user_id, chapter_id = sort_key.split(course_store.CHAPTER_MARKER, 1)
+        if new.get('chapter_status') == old.get('chapter_status'):
+            return []
+        return [(user_id, {
+            'type': 'chapter_status',
+            'course_id': course_id,
+            'chapter_id': chapter_id,
+            'chapter_status': new.get('chapter_status') or {}
+        })]
+
+    messages = []
+    # Courses not yet split into chapter items keep every chapter's status on the course item
+    old_statuses = old.get('chapters_status') or {}
+    for chapter_id, status in (new.get('chapters_status') or {}).items():
+        if status != old_statuses.get(chapter_id):
+            messages.append((sort_key, {
+                'type': 'chapter_status',
+                'course_id': course_id,
+                'chapter_id': chapter_id,
+                'chapter_status': status
+            }))
+    if any(new.get(name) != old.get(name) for name in COURSE_PUSH_ATTRIBUTES):
+        messages.append((sort_key, {
+            'type': 'course_status',
+            'course_id': course_id,
+            **{name: new.get(name) for name in COURSE_PUSH_ATTRIBUTES if name in new}
+        }))
+    return messages
+
+
+def _connection_ids(connections_table, user_id):
+    connection_ids = []
+    query_kwargs = {
+        'IndexName': 'UserID-index',
+        'KeyConditionExpression': Key('UserID').eq(user_id)
+    }
+    while True:
+        response = connections_table.query(**query_kwargs)
+        connection_ids.extend(item['ConnectionID'] for item in response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            return connection_ids
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def _post(connections_table, connection_id, message):
+    try:
+        management_client.post_to_connection(
+            ConnectionId=connection_id,
+            Data=json.dumps(message, default=_decimal_default).encode('utf-8')
+        )
+        return True
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'GoneException':
+            # The client went away without a $disconnect reaching us
+            connections_table.delete_item(Key={'ConnectionID': connection_id})
+        else:
+            print(f"Error posting to connection {connection_id}: {str(e)}")
+        return False
+
+
+def lambda_handler(event, context):
+    """
+    Consumes the course table stream and pushes chapter status and course plan changes to the
+    owning user's open WebSocket connections, replacing client polling of
+    check-chapter-generation-status. Pushes are best effort: a client that misses one can
+    still read the status over the REST API, so failures are logged rather than retried.
+    """
+    messages_by_user = {}
+    for record in event.get('Records', []):
+        try:
+            for user_id, message in _messages(record):
+                messages_by_user.setdefault(user_id, []).append(message)
+        except Exception as e:
+            print(f"Error reading stream record {record.get('eventID')}: {str(e)}")
+
+    connections_table = dynamodb.Table(os.environ['CONNECTIONS_TABLE_NAME'])
+    pushed = 0
+    for user_id, messages in messages_by_user.items():
+        connection_ids = _connection_ids(connections_table, user_id)
+        for connection_id in connection_ids:
+            for message in messages:
+                if not _post(connections_table, connection_id, message):
+                    break # Gone or failing; skip its remaining messages
+                pushed += 1
+    print(f"Pushed {pushed} messages to {len(messages_by_user)} users")
+    return {'pushed': pushed}
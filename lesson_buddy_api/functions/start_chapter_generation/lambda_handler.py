@@ -0,0 +1,92 @@
+import json
+import boto3
+import os
+from botocore.exceptions import ClientError
+
+from chapter_executions import execution_arn, prefetch_execution_name # Provided by the shared layer
+
+sfn_client = boto3.client('stepfunctions')
+
+
+def _response(execution_arn_value, start_date, message, headers):
+    # Same body the former StartExecution integration returned, where executionArn and
+    # startDate were JSON-encoded values embedded in strings
+    return {
+        'statusCode': 200,
+        'body': json.dumps({
+            'message': message,
+            'executionArn': json.dumps(execution_arn_value),
+            'startDate': json.dumps(start_date.timestamp())
+        }),
+        'headers': headers
+    }
+
+
+def lambda_handler(event, context):
+    """
+    Starts generating a chapter (POST /generate-chapter). If a prefetch of the same chapter
+    is already running, that execution is returned instead of starting a second one.
+    """
+    headers = {'Content-Type': 'application/json', "Access-Control-Allow-Origin": "*"}
+    print(event)
+
+    try:
+        user_id = event['requestContext']['authorizer']['claims']['sub']
+    except KeyError as e:
+        print(f"Error accessing user_id from event context: {str(e)}")
+        return {
+            'statusCode': 401,
+            'body': json.dumps({'error': f'Could not extract user ID from request context: {str(e)}'}),
+            'headers': headers
+        }
+
+    try:
+        body = json.loads(event.get('body') or '{}')
+    except json.JSONDecodeError:
+        body = None
+    if not isinstance(body, dict) or not body.get('course_id') or not body.get('chapter_id'):
+        return {
+            'statusCode': 400,
+            'body': json.dumps({'error': 'Request body must be JSON with course_id and chapter_id.'}),
+            'headers': headers
+        }
+    course_id = body['course_id']
+    chapter_id = body['chapter_id']
+
+    state_machine_arn = os.environ.get('STEP_FUNCTION_ARN')
+    if not state_machine_arn:
+        print("Error: STEP_FUNCTION_ARN environment variable not set.")
+        return {
+            'statusCode': 500,
+            'body': json.dumps({'error': 'Server configuration error: State machine not set.'}),
+            'headers': headers
+        }
+
+    prefetch_arn = execution_arn(state_machine_arn, prefetch_execution_name(course_id, user_id, chapter_id))
+    try:
+        prefetch = sfn_client.describe_execution(executionArn=prefetch_arn)
+        if prefetch['status'] == 'RUNNING':
+            print(f"Chapter {chapter_id} of course {course_id} is already being prefetched: {prefetch_arn}")
+            return _response(prefetch_arn, prefetch['startDate'], "Execution already running.", headers)
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ExecutionDoesNotExist':
+            print(f"Could not check for a running prefetch of chapter {chapter_id}: {str(e)}")
+
+    try:
+        response = sfn_client.start_execution(
+            stateMachineArn=state_machine_arn,
+            input=json.dumps({
+                "course_id": course_id,
+                "chapter_id": chapter_id,
+                "user_id": user_id
+            })
+        )
+    except ClientError as e:
+        print(f"Error starting Step Function execution: {str(e)}")
+        return {
+            'statusCode': 500,
+            'body': json.dumps({'error': f'Could not start chapter generation: {str(e)}'}),
+            'headers': headers
+        }
+    print(f"Started generation of chapter {chapter_id} of course {course_id}: {response['executionArn']}")
+    return _response(response['executionArn'], response['startDate'], "Execution started successfully.", headers)
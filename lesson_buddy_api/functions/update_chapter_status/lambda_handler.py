@@ -6,6 +6,8 @@ import datetime
 import base64
 import json # Already imported but good to ensure
 
+import course_store # Provided by the shared layer
+
 dynamodb_resource = boto3.resource('dynamodb') # Renamed to avoid potential naming conflicts
 
 def lambda_handler(event, context):
@@ -50,25 +52,33 @@ def lambda_handler(event, context):
         timestamp = datetime.datetime.utcnow().isoformat()
         status_key_name = f"{status_type}_status" # e.g., lessons_status or mcqs_status
 
-        update_expression = "SET chapters_status.#chapter_id_attr.#status_key_name_attr = :status_val, chapters_status.#chapter_id_attr.last_updated = :ts"
-        
-        expression_attribute_names = {
-            '#chapter_id_attr': event_chapter_id, 
-            '#status_key_name_attr': status_key_name 
-        }
-        
         expression_attribute_values = {
             ':status_val': new_status,
             ':ts': timestamp
         }
 
-        course_table.update_item(
-            Key={'CourseID': event_course_id, 'UserID': event_user_id},
-            UpdateExpression=update_expression,
-            ExpressionAttributeNames=expression_attribute_names,
-            ExpressionAttributeValues=expression_attribute_values,
-            ConditionExpression="attribute_exists(CourseID) AND attribute_exists(UserID)" # Ensure the item exists
-        )
+        try:
+            course_table.update_item(
+                Key=course_store.chapter_key(event_course_id, event_user_id, event_chapter_id),
+                UpdateExpression="SET chapter_status.#status_key_name_attr = :status_val, chapter_status.last_updated = :ts",
+                ExpressionAttributeNames={'#status_key_name_attr': status_key_name},
+                ExpressionAttributeValues=expression_attribute_values,
+                ConditionExpression="attribute_exists(CourseID)" # Ensure the chapter item exists
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            # Courses not yet split into chapter items keep every status on the course item
+            course_table.update_item(
+                Key={'CourseID': event_course_id, 'UserID': event_user_id},
+                UpdateExpression="SET chapters_status.#chapter_id_attr.#status_key_name_attr = :status_val, chapters_status.#chapter_id_attr.last_updated = :ts",
+                ExpressionAttributeNames={
+                    '#chapter_id_attr': event_chapter_id,
+                    '#status_key_name_attr': status_key_name
+                },
+                ExpressionAttributeValues=expression_attribute_values,
+                ConditionExpression="attribute_exists(chapters_status)" # Ensure the item exists and isn't migrated
+            )
 
         return {
             'statusCode': 200,
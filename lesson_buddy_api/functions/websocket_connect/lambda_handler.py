@@ -0,0 +1,45 @@
+import json
+import os
+import time
+import boto3
+
+cognito_client = boto3.client('cognito-idp')
+dynamodb = boto3.resource('dynamodb')
+
+# API Gateway closes WebSocket connections after 2 hours; the TTL clears any missed $disconnect
+CONNECTION_TTL_SECONDS = 2 * 60 * 60 + 5 * 60
+
+
+def lambda_handler(event, context):
+    """
+    $connect route of the WebSocket API. Browsers can't set headers on a WebSocket handshake,
+    so the client passes its Cognito access token as the `token` query string parameter.
+    The token is checked with Cognito and the connection registered under the user's ID.
+    Returning a non-2xx status rejects the connection.
+    """
+    connection_id = event['requestContext']['connectionId']
+    query_params = event.get('queryStringParameters') or {}
+    token = query_params.get('token')
+    if not token:
+        print(f"Rejecting connection {connection_id}: no token")
+        return {'statusCode': 401, 'body': json.dumps({'error': 'Missing required parameter: token'})}
+
+    try:
+        user = cognito_client.get_user(AccessToken=token)
+    except cognito_client.exceptions.NotAuthorizedException as e:
+        print(f"Rejecting connection {connection_id}: {str(e)}")
+        return {'statusCode': 401, 'body': json.dumps({'error': 'Invalid or expired token.'})}
+
+    user_id = next((attribute['Value'] for attribute in user.get('UserAttributes', []) if attribute['Name'] == 'sub'), None)
+    if not user_id:
+        print(f"Rejecting connection {connection_id}: no sub attribute for {user.get('Username')}")
+        return {'statusCode': 401, 'body': json.dumps({'error': 'Could not determine user ID from token.'})}
+
+    dynamodb.Table(os.environ['CONNECTIONS_TABLE_NAME']).put_item(Item={
+        'ConnectionID': connection_id,
+        'UserID': user_id,
+        'ConnectedAt': int(time.time()),
+        'ExpiresAt': int(time.time()) + CONNECTION_TTL_SECONDS
+    })
+    print(f"Connected {connection_id} for user {user_id}")
+    return {'statusCode': 200, 'body': json.dumps({'message': 'Connected.'})}
@@ -0,0 +1,13 @@
+import json
+import os
+import boto3
+
+dynamodb = boto3.resource('dynamodb')
+
+
+def lambda_handler(event, context):
+    """$disconnect route of the WebSocket API. Removes the connection from the registry."""
+    connection_id = event['requestContext']['connectionId']
+    dynamodb.Table(os.environ['CONNECTIONS_TABLE_NAME']).delete_item(Key={'ConnectionID': connection_id})
+    print(f"Disconnected {connection_id}")
+    return {'statusCode': 200, 'body': json.dumps({'message': 'Disconnected.'})}
@@ -0,0 +1,27 @@
+"""
+Names of chapter generation executions.
+
+Prefetch executions get a deterministic name, prefetch-<user hash>-<course/chapter hash>, so
+a duplicate prefetch message can't start a second execution for the same chapter, the
+per-user cap can count them by prefix, and a user-started generation can find a prefetch
+already running for its chapter with a single DescribeExecution. Executions started by the
+user (/generate-chapter, the first chapter of a new course) keep automatic names, so a
+failed chapter can always be started again.
+"""
+import hashlib
+
+PREFETCH_PREFIX = 'prefetch-'
+
+
+def prefetch_user_prefix(user_id):
+    return f"{PREFETCH_PREFIX}{hashlib.sha256(user_id.encode('utf-8')).hexdigest()[:12]}-"
+
+
+def prefetch_execution_name(course_id, user_id, chapter_id):
+    chapter_hash = hashlib.sha256(f"{course_id}#{chapter_id}".encode('utf-8')).hexdigest()[:24]
+    return prefetch_user_prefix(user_id) + chapter_hash
+
+
+def execution_arn(state_machine_arn, execution_name):
+    """arn:aws:states:<region>:<account>:stateMachine:<name> -> ...:execution:<name>:<execution_name>"""
+    return f"{state_machine_arn.replace(':stateMachine:', ':execution:', 1)}:{execution_name}"
@@ -0,0 +1,128 @@
+"""
+Gzip-encoded JSON objects in S3.
+
+Lesson content and questions are written compressed with ContentEncoding=gzip. S3 and
+boto3 don't decompress on read, so every reader goes through read_json/read_text, which
+also accept the uncompressed objects written before compression was introduced.
+
+Objects are keyed per course, so one course's objects can be listed, expired or deleted by
+prefix:
+
+    courses/{user_id}/{course_id}/{chapter_id}/{lesson_id}/lesson.json       lesson bucket
+    courses/{user_id}/{course_id}/{chapter_id}/{lesson_id}/questions.json    questions bucket
+
+Objects written before this layout sit at the bucket root ({course_id}-{chapter_id}-
+{lesson_id}.json and ...-questions.json). Readers try the new key first and fall back to
+the old one until scripts/migrate_content_keys.py has moved them.
+"""
+import gzip
+import json
+
+from botocore.exceptions import ClientError
+
+GZIP_LEVEL = 6 # Markdown-heavy JSON barely shrinks further at higher levels
+GZIP_MEDIA_TYPE = 'application/gzip' # Registered as a binary media type on the REST API
+
+
+def course_prefix(user_id, course_id):
+    return f"courses/{user_id}/{course_id}/"
+
+
+def lesson_key(user_id, course_id, chapter_id, lesson_id):
+    return f"{course_prefix(user_id, course_id)}{chapter_id}/{lesson_id}/lesson.json"
+
+
+def questions_key(user_id, course_id, chapter_id, lesson_id):
+    return f"{course_prefix(user_id, course_id)}{chapter_id}/{lesson_id}/questions.json"
+
+
+def legacy_lesson_key(course_id, chapter_id, lesson_id):
+    return f"{course_id}-{chapter_id}-{lesson_id}.json"
+
+
+def legacy_questions_key(course_id, chapter_id, lesson_id):
+    return f"{course_id}-{chapter_id}-{lesson_id}-questions.json"
+
+
+def get_first(get_object, keys):
+    """
+    Returns get_object(key) for the first of `keys` that exists. If none do, the last
+    NoSuchKey error is raised, as get_object would.
+    """
+    for i, key in enumerate(keys):
+        try:
+            return get_object(key)
+        except ClientError as e:
+            if e.response['Error']['Code'] not in ('NoSuchKey', '404') or i == len(keys) - 1:
+                raise
+
+
+def put_json(s3_client, bucket_name, key, obj):
+    """Writes `obj` as compact, gzip-encoded JSON. Returns the put_object response."""
+    body = gzip.compress(json.dumps(obj, separators=(',', ':')).encode('utf-8'), compresslevel=GZIP_LEVEL)
+    return s3_client.put_object(
+        Bucket=bucket_name,
+        Key=key,
+        Body=body,
+        ContentType='application/json',
+        ContentEncoding='gzip'
+    )
+
+
+def is_gzipped(response):
+    return response.get('ContentEncoding') == 'gzip'
+
+
+def read_bytes(response):
+    """Returns the decoded body of a get_object response."""
+    body = response['Body'].read()
+    return gzip.decompress(body) if is_gzipped(response) else body
+
+
+def read_text(response):
+    return read_bytes(response).decode('utf-8')
+
+
+def read_json(response):
+    return json.loads(read_bytes(response))
+
+
+def _header(event, header_name):
+    for name, value in (event.get('headers') or {}).items():
+        if name.lower() == header_name:
+            return value or ''
+    return ''
+
+
+def wants_gzip_body(event):
+    """
+    True if the stored gzip bytes can be returned as they are. API Gateway only passes a
+    base64-encoded Lambda response through as binary when the first type in the request's
+    Accept header is one of the API's binary media types, so clients opt in by sending
+    `Accept: application/gzip` together with `Accept-Encoding: gzip`. Other clients get the
+    decompressed JSON, which API Gateway compresses again for them if they accept gzip.
+    """
+    first_accept = _header(event, 'accept').split(',')[0].split(';')[0].strip().lower()
+    if first_accept != GZIP_MEDIA_TYPE:
+        return False
+    codings = [coding.split(';')[0].strip().lower() for coding in _header(event, 'accept-encoding').split(',')]
+    return 'gzip' in codings or '*' in codings
+
+
+def request_etags(event):
+    """
+    Returns the entity tags listed in the request's If-None-Match header ('*' included).
+    Weak tags, which some proxies produce after compressing, compare as strong ones.
+    """
+    tags = []
+    for tag in _header(event, 'if-none-match').split(','):
+        tag = tag.strip()
+        if tag:
+            tags.append(tag[2:] if tag.startswith('W/') else tag)
+    return tags
+
+
+def etag_matches(event, etag):
+    """True if If-None-Match lists `etag` (or '*'), i.e. the client's copy is current."""
+    tags = request_etags(event)
+    return '*' in tags or etag in tags
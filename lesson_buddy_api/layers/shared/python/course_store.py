@@ -0,0 +1,342 @@
+"""
+Course plan storage in the course table.
+
+A course is stored as a header item plus one item per chapter, all in the course's partition:
+
+    CourseID=<course>, UserID=<user>                       header: title, description,
+                                                           plan_status, cover image,
+                                                           chapter_ids (chapter order)
+    CourseID=<course>, UserID=<user>#CHAPTER#<chapter>     chapter: chapter (the plan's
+                                                           chapter dict), chapter_status,
+                                                           position, generation_execution_arn
+
+Chapter reads and status updates touch only their chapter item, and course length is no
+longer bounded by the 400 KB item limit. Keeping the user ID as the sort key prefix means
+every key still proves ownership, and chapter items never match a UserID-index query.
+
+Courses saved before this layout keep `chapters` and `chapters_status` on a single item.
+Readers accept both; load_course/load_chapter with migrate=True rewrite a legacy course
+into the new layout the first time it is read.
+"""
+import hashlib
+import json
+
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
+
+CHAPTER_MARKER = '#CHAPTER#'
+
+
+class CourseDeletedError(Exception):
+    """Raised when a write to an existing course finds that the course was deleted meanwhile."""
+
+
+def _is_conditional_check_failure(error):
+    return error.response['Error']['Code'] == 'ConditionalCheckFailedException'
+
+
+def chapter_sort_key(user_id, chapter_id):
+    return f"{user_id}{CHAPTER_MARKER}{chapter_id}"
+
+
+def chapter_key(course_id, user_id, chapter_id):
+    return {'CourseID': course_id, 'UserID': chapter_sort_key(user_id, chapter_id)}
+
+
+def is_legacy(header):
+    return 'chapter_ids' not in header and 'chapters' in header
+
+
+def build_items(course):
+    """
+    Splits a course in the single-item shape (with `chapters` and `chapters_status`) into
+    its header item and chapter items.
+    """
+    chapters = [chapter for chapter in course.get('chapters') or [] if chapter.get('id')]
+    chapters_status = course.get('chapters_status') or {}
+    skeleton = course.get('plan_status') == 'SKELETON'
+
+    header = {key: value for key, value in course.items() if key not in ('chapters', 'chapters_status')}
+    header['chapter_ids'] = [chapter['id'] for chapter in chapters]
+
+    chapter_items = []
+    for position, chapter in enumerate(chapters):
+        item = {
+            **chapter_key(course['CourseID'], course['UserID'], chapter['id']),
+            'item_type': 'CHAPTER',
+            'chapter_id': chapter['id'],
+            'position': position,
+            'chapter': chapter,
+            'chapter_status': chapters_status.get(chapter['id']) or {}
+        }
+        if skeleton:
+            item['skeleton'] = True # Descriptions are still being generated
+        chapter_items.append(item)
+    return header, chapter_items
+
+
+def save_course(table, course, must_exist=False):
+    """
+    Writes a course given in the single-item shape as a header plus chapter items.
+    With must_exist, the course's header must still be stored (e.g. a placeholder the plan
+    replaces); if the course was deleted meanwhile, the chapter items just written are
+    removed again and CourseDeletedError is raised, so a deleted course is never recreated.
+    """
+    header, chapter_items = build_items(course)
+    with table.batch_writer() as batch:
+        for item in chapter_items:
+            batch.put_item(Item=item)
+    # The header goes last, so a course never lists chapters that weren't written
+    if not must_exist:
+        table.put_item(Item=header)
+        return
+    try:
+        table.put_item(Item=header, ConditionExpression="attribute_exists(CourseID)")
+    except ClientError as e:
+        if not _is_conditional_check_failure(e):
+            raise
+        with table.batch_writer() as batch:
+            for item in chapter_items:
+                batch.delete_item(Key={'CourseID': item['CourseID'], 'UserID': item['UserID']})
+        raise CourseDeletedError(f"Course {course['CourseID']} was deleted") from e
+
+
+def update_chapter_details(table, course_id, user_id, chapters):
+    """
+    Replaces the plan content of existing chapter items, keeping their statuses. Raises
+    CourseDeletedError if a chapter item no longer exists, i.e. the course was deleted.
+    """
+    for position, chapter in enumerate(chapters):
+        try:
+            table.update_item(
+                Key=chapter_key(course_id, user_id, chapter['id']),
+                UpdateExpression="SET chapter = :chapter, #position = :position, item_type = :item_type, chapter_id = :chapter_id REMOVE skeleton",
+                ExpressionAttributeNames={'#position': 'position'},
+                ExpressionAttributeValues={
+                    ':chapter': chapter,
+                    ':position': position,
+                    ':item_type': 'CHAPTER',
+                    ':chapter_id': chapter['id']
+                },
+                ConditionExpression="attribute_exists(CourseID)" # Never recreate a deleted course's chapters
+            )
+        except ClientError as e:
+            if _is_conditional_check_failure(e):
+                raise CourseDeletedError(f"Course {course_id} was deleted") from e
+            raise
+
+
+def _assemble(header, chapter_items):
+    """Returns the course in the single-item shape the API has always returned."""
+    chapter_items = sorted(chapter_items, key=lambda item: item.get('position', 0))
+    course = {key: value for key, value in header.items() if key != 'chapter_ids'}
+    course['chapters'] = [item['chapter'] for item in chapter_items]
+    course['chapters_status'] = {item['chapter_id']: item.get('chapter_status') or {} for item in chapter_items}
+    return course
+
+
+def migrate_course(table, item):
+    """
+    Rewrites a legacy single-item course as a header plus chapter items. Safe to run
+    concurrently: chapter items are only created if missing, and the header is only
+    rewritten if it still holds the chapters.
+    """
+    header, chapter_items = build_items(item)
+    for chapter_item in chapter_items:
+        try:
+            table.put_item(Item=chapter_item, ConditionExpression="attribute_not_exists(UserID)")
+        except ClientError as e:
+            if not _is_conditional_check_failure(e):
+                raise
+    try:
+        table.update_item(
+            Key={'CourseID': item['CourseID'], 'UserID': item['UserID']},
+            UpdateExpression="SET chapter_ids = :chapter_ids REMOVE chapters, chapters_status",
+            ExpressionAttributeValues={':chapter_ids': header['chapter_ids']},
+            ConditionExpression="attribute_exists(chapters)"
+        )
+        print(f"Migrated course {item['CourseID']} to per-chapter items ({len(chapter_items)} chapters)")
+    except ClientError as e:
+        if not _is_conditional_check_failure(e):
+            raise
+
+
+def _query_course_items(table, course_id, user_id, **query_kwargs):
+    items = []
+    query_kwargs['KeyConditionExpression'] = Key('CourseID').eq(course_id) & Key('UserID').begins_with(user_id)
+    while True:
+        response = table.query(**query_kwargs)
+        # begins_with alone would also match a longer user ID sharing the prefix
+        items.extend(
+            item for item in response.get('Items', [])
+            if item['UserID'] == user_id or item['UserID'].startswith(user_id + CHAPTER_MARKER)
+        )
+        if 'LastEvaluatedKey' not in response:
+            return items
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def load_course(table, course_id, user_id, migrate=False):
+    """
+    Returns the whole course in the single-item shape (with `chapters` and
+    `chapters_status`), or None if the user has no such course.
+    """
+    header = None
+    chapter_items = []
+    for item in _query_course_items(table, course_id, user_id):
+        if item['UserID'] == user_id:
+            header = item
+        else:
+            chapter_items.append(item)
+    if header is None:
+        return None
+    if is_legacy(header):
+        if migrate:
+            migrate_course(table, header)
+        return header
+    return _assemble(header, chapter_items)
+
+
+def load_chapter(table, course_id, user_id, chapter_id, migrate=False):
+    """
+    Returns the chapter item for `chapter_id` (with `chapter` and `chapter_status`), or
+    None if the course or chapter doesn't exist. Legacy courses are read whole.
+    """
+    response = table.get_item(Key=chapter_key(course_id, user_id, chapter_id))
+    if 'Item' in response:
+        return response['Item']
+
+    course = load_course(table, course_id, user_id, migrate=migrate)
+    if course is None:
+        return None
+    for chapter in course.get('chapters') or []:
+        if isinstance(chapter, dict) and chapter.get('id') == chapter_id:
+            item = {
+                'chapter_id': chapter_id,
+                'chapter': chapter,
+                'chapter_status': (course.get('chapters_status') or {}).get(chapter_id) or {}
+            }
+            if course.get('plan_status') == 'SKELETON':
+                item['skeleton'] = True
+            return item
+    return None
+
+
+def load_chapter_status(table, course_id, user_id, chapter_id):
+    """Returns just the chapter's chapter_status, or None if the course or chapter doesn't exist."""
+    response = table.get_item(
+        Key=chapter_key(course_id, user_id, chapter_id),
+        ProjectionExpression="chapter_status"
+    )
+    if 'Item' in response:
+        return response['Item'].get('chapter_status') or {}
+    chapter_item = load_chapter(table, course_id, user_id, chapter_id) # Legacy single-item course
+    return None if chapter_item is None else chapter_item.get('chapter_status') or {}
+
+
+def load_chapter_statuses(table, course_id, user_id):
+    """
+    Returns {'plan_status', 'chapters': [{'chapter_id', 'chapter_status'}, ...]} for every
+    chapter of the course in order, reading only the status attributes, or None if the user
+    has no such course. Chapters of legacy courses come back in no particular order.
+    """
+    items = _query_course_items(
+        table, course_id, user_id,
+        ProjectionExpression="UserID, chapter_id, #position, chapter_status, chapter_ids, chapters_status, plan_status",
+        ExpressionAttributeNames={'#position': 'position'}
+    )
+    header = next((item for item in items if item['UserID'] == user_id), None)
+    if header is None:
+        return None
+    if 'chapter_ids' in header:
+        chapter_items = sorted((item for item in items if item is not header), key=lambda item: item.get('position', 0))
+        chapters = [{'chapter_id': item['chapter_id'], 'chapter_status': item.get('chapter_status') or {}} for item in chapter_items]
+    else:
+        chapters = [
+            {'chapter_id': chapter_id, 'chapter_status': status or {}}
+            for chapter_id, status in (header.get('chapters_status') or {}).items()
+        ]
+    return {'plan_status': header.get('plan_status', 'COMPLETED'), 'chapters': chapters}
+
+
+def _version(state):
+    return hashlib.sha256(json.dumps(state, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def chapter_version(chapter_item):
+    """
+    Version of a chapter item's changing state (its status, and whether it is still a
+    skeleton). Matches load_chapter_version while the item is unchanged.
+    """
+    return _version({'chapter_status': chapter_item.get('chapter_status') or {}, 'skeleton': bool(chapter_item.get('skeleton'))})
+
+
+def load_chapter_version(table, course_id, user_id, chapter_id):
+    """Reads only what chapter_version covers. None if there is no chapter item (e.g. legacy courses)."""
+    response = table.get_item(
+        Key=chapter_key(course_id, user_id, chapter_id),
+        ProjectionExpression="chapter_status, skeleton"
+    )
+    if 'Item' not in response:
+        return None
+    return chapter_version(response['Item'])
+
+
+def course_version(course):
+    """
+    Version of a course's changing state (plan status, cover image and chapter statuses), given
+    in the single-item shape load_course returns. Matches load_course_version while unchanged.
+    """
+    return _version({
+        'plan_status': course.get('plan_status'),
+        'cover_image_url': course.get('cover_image_url'),
+        'chapters_status': course.get('chapters_status') or {}
+    })
+
+
+def load_course_version(table, course_id, user_id):
+    """Reads only what course_version covers. None if the user has no such course."""
+    items = _query_course_items(
+        table, course_id, user_id,
+        ProjectionExpression="UserID, chapter_id, chapter_status, chapters_status, plan_status, cover_image_url"
+    )
+    header = next((item for item in items if item['UserID'] == user_id), None)
+    if header is None:
+        return None
+    if 'chapters_status' in header: # Legacy single-item course
+        chapters_status = header['chapters_status']
+    else:
+        chapters_status = {item['chapter_id']: item.get('chapter_status') or {} for item in items if item is not header}
+    return course_version({**header, 'chapters_status': chapters_status})
+
+
+def load_chapter_ids(table, course_id, user_id):
+    """Returns the course's chapter IDs in order, or None if the user has no such course."""
+    response = table.get_item(
+        Key={'CourseID': course_id, 'UserID': user_id},
+        ProjectionExpression="chapter_ids, chapters"
+    )
+    header = response.get('Item')
+    if header is None:
+        return None
+    if 'chapter_ids' in header:
+        return list(header['chapter_ids'])
+    return [chapter.get('id') for chapter in header.get('chapters') or [] if isinstance(chapter, dict)]
+
+
+def load_chapter_executions(table, course_id, user_id):
+    """
+    Returns the ARNs of the chapter generation executions recorded on the course's chapter
+    items (the state machine records its own ARN before generating).
+    """
+    items = _query_course_items(table, course_id, user_id, ProjectionExpression="UserID, generation_execution_arn")
+    return [item['generation_execution_arn'] for item in items if item.get('generation_execution_arn')]
+
+
+def delete_course(table, course_id, user_id):
+    """Deletes the course header and all of its chapter items. Returns the number of items deleted."""
+    items = _query_course_items(table, course_id, user_id)
+    with table.batch_writer() as batch:
+        for item in items:
+            batch.delete_item(Key={'CourseID': item['CourseID'], 'UserID': item['UserID']})
+    return len(items)
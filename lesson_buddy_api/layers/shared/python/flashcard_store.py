@@ -0,0 +1,135 @@
+"""
+A lesson's flashcards in the flashcards table.
+
+Each lesson's cards are one DECK item (LessonFlashcardId=FLASHCARD#<course>#<chapter>#<lesson>,
+CardId=DECK) holding the cards as a list, so generating a lesson costs one write and viewing
+it one read. Decks are written with a single conditional PutItem: Version is the time the
+generation started (the Step Functions execution start) in milliseconds, and a write only
+lands if no deck from a later generation is stored. A slow retry of an older execution
+writes later, but still carries its older version, so it can't replace newer cards.
+
+Lessons generated before the deck format have one item per card (CardId=CARD#01, ...).
+load_deck reads those when there is no deck; the first save_deck for such a lesson removes
+them.
+"""
+import datetime
+from decimal import Decimal
+
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
+
+DECK_CARD_ID = 'DECK'
+LEGACY_CARD_PREFIX = 'CARD#'
+
+
+def lesson_flashcard_id(course_id, chapter_id, lesson_id):
+    return f"FLASHCARD#{course_id}#{chapter_id}#{lesson_id}"
+
+
+def _to_int(value):
+    return int(value) if isinstance(value, Decimal) else value
+
+
+def version_from_timestamp(timestamp):
+    """Converts an ISO 8601 time, e.g. a Step Functions Execution.StartTime, to a deck version."""
+    started_at = datetime.datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+    if started_at.tzinfo is None:
+        started_at = started_at.replace(tzinfo=datetime.timezone.utc)
+    return int(started_at.timestamp() * 1000)
+
+
+def save_deck(table, course_id, chapter_id, lesson_id, flashcards, version, user_id=None):
+    """
+    Writes the lesson's cards as one DECK item. `version` identifies the generation that
+    produced the cards (see version_from_timestamp); a retry of the same generation may
+    rewrite its deck. Returns False if a deck from a later generation was already stored
+    (nothing is written then), True otherwise.
+    """
+    partition = lesson_flashcard_id(course_id, chapter_id, lesson_id)
+    item = {
+        'LessonFlashcardId': partition,
+        'CardId': DECK_CARD_ID,
+        'CourseID': course_id,
+        'ChapterID': chapter_id,
+        'LessonID': lesson_id,
+        'Cards': [{'question': card['question'], 'answer': card['answer']} for card in flashcards],
+        'CreatedAt': datetime.datetime.utcnow().isoformat(),
+        'Version': version
+    }
+    if user_id:
+        item['UserID'] = user_id
+    try:
+        response = table.put_item(
+            Item=item,
+            ConditionExpression="attribute_not_exists(Version) OR Version <= :version",
+            ExpressionAttributeValues={':version': version},
+            ReturnValues='ALL_OLD'
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            print(f"A flashcard deck from a later generation is already stored for {partition}; keeping it")
+            return False
+        raise
+
+    # Legacy cards are removed by the first deck written for the lesson; later saves skip the query
+    if 'Attributes' not in response:
+        _delete_legacy_cards(table, partition)
+    return True
+
+
+def _delete_legacy_cards(table, partition):
+    query_kwargs = {
+        'KeyConditionExpression': Key('LessonFlashcardId').eq(partition) & Key('CardId').begins_with(LEGACY_CARD_PREFIX),
+        'ProjectionExpression': "LessonFlashcardId, CardId"
+    }
+    keys = []
+    while True:
+        response = table.query(**query_kwargs)
+        keys.extend({'LessonFlashcardId': item['LessonFlashcardId'], 'CardId': item['CardId']} for item in response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            break
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    if not keys:
+        return
+    with table.batch_writer() as batch:
+        for key in keys:
+            batch.delete_item(Key=key)
+
+
+def load_deck(table, course_id, chapter_id, lesson_id):
+    """
+    Returns the lesson's cards as [{'cardNumber', 'question', 'answer', 'createdAt'}, ...] in
+    order, or None if the lesson has no flashcards.
+    """
+    partition = lesson_flashcard_id(course_id, chapter_id, lesson_id)
+    response = table.get_item(
+        Key={'LessonFlashcardId': partition, 'CardId': DECK_CARD_ID},
+        ProjectionExpression="Cards, CreatedAt"
+    )
+    deck = response.get('Item')
+    if deck is not None:
+        return [
+            {'cardNumber': i + 1, 'question': card.get('question'), 'answer': card.get('answer'), 'createdAt': deck.get('CreatedAt')}
+            for i, card in enumerate(deck.get('Cards') or [])
+        ]
+
+    # One item per card, from before decks
+    items = []
+    query_kwargs = {
+        'KeyConditionExpression': Key('LessonFlashcardId').eq(partition) & Key('CardId').begins_with(LEGACY_CARD_PREFIX),
+        'ProjectionExpression': "CardNumber, Question, Answer, CreatedAt"
+    }
+    while True:
+        response = table.query(**query_kwargs)
+        items.extend(response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            break
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    if not items:
+        return None
+    flashcards = [
+        {'cardNumber': _to_int(item.get('CardNumber')), 'question': item.get('Question'), 'answer': item.get('Answer'), 'createdAt': item.get('CreatedAt')}
+        for item in items
+    ]
+    flashcards.sort(key=lambda card: card.get('cardNumber') or 0)
+    return flashcards
@@ -0,0 +1,110 @@
+"""
+Content-addressed cache for LLM responses.
+
+Entries are keyed by a hash of the request (model, messages, response_format, tools),
+kept in a small in-container LRU and persisted to the LLM cache DynamoDB table (with a
+TTL) so that a Step Functions retry of the same lesson replays completed calls instead
+of paying for them again. The cache is best effort: any DynamoDB error is logged and
+treated as a miss.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import boto3
+
+DEFAULT_TTL_SECONDS = 24 * 60 * 60
+MAX_LOCAL_ENTRIES = 256
+
+_local = OrderedDict()
+_local_lock = threading.Lock()
+_table = None
+
+
+def _get_table():
+    global _table
+    table_name = os.environ.get('LLM_CACHE_TABLE_NAME')
+    if not table_name:
+        return None
+    if _table is None:
+        _table = boto3.resource('dynamodb').Table(table_name)
+    return _table
+
+
+def cache_key(request_data):
+    """Returns the cache key for an OpenAI-style chat completions request body."""
+    keyed_fields = {
+        "model": request_data.get("model"),
+        "messages": request_data.get("messages"),
+        "response_format": request_data.get("response_format"),
+        "tools": request_data.get("tools"),
+    }
+    canonical = json.dumps(keyed_fields, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def _remember(key, serialized):
+    with _local_lock:
+        _local[key] = serialized
+        _local.move_to_end(key)
+        while len(_local) > MAX_LOCAL_ENTRIES:
+            _local.popitem(last=False)
+
+
+def get(key):
+    """Returns the cached assistant message for `key`, or None on a miss."""
+    with _local_lock:
+        serialized = _local.get(key)
+        if serialized is not None:
+            _local.move_to_end(key)
+    if serialized is None:
+        table = _get_table()
+        if table is None:
+            return None
+        try:
+            item = table.get_item(Key={'CacheKey': key}).get('Item')
+        except Exception as e:
+            print(f"Warning: LLM cache read failed for {key}: {e}")
+            return None
+        # DynamoDB TTL deletion is lazy, so check expiry ourselves
+        if not item or int(item.get('ExpiresAt', 0)) < time.time():
+            return None
+        serialized = item['Response']
+        _remember(key, serialized)
+    print(f"LLM cache hit: {key}")
+    return json.loads(serialized) # Fresh copy so callers can't mutate the cached entry
+
+
+def put(key, message, model=None):
+    serialized = json.dumps(message)
+    _remember(key, serialized)
+    table = _get_table()
+    if table is None:
+        return
+    ttl_seconds = int(os.environ.get('LLM_CACHE_TTL_SECONDS', DEFAULT_TTL_SECONDS))
+    item = {
+        'CacheKey': key,
+        'Response': serialized,
+        'ExpiresAt': int(time.time()) + ttl_seconds,
+    }
+    if model:
+        item['Model'] = model
+    try:
+        table.put_item(Item=item)
+    except Exception as e:
+        print(f"Warning: LLM cache write failed for {key}: {e}")
+
+
+def evict(key):
+    with _local_lock:
+        _local.pop(key, None)
+    table = _get_table()
+    if table is None:
+        return
+    try:
+        table.delete_item(Key={'CacheKey': key})
+    except Exception as e:
+        print(f"Warning: LLM cache eviction failed for {key}: {e}")
@@ -0,0 +1,273 @@
+"""
+Shared LLM client for the Lesson Buddy functions (deployed as the SharedLayer).
+
+Exposes the same `call_model` / `get_api_info` surface the functions used to copy
+around, but keeps keep-alive HTTP connections per provider host so the agent loops
+don't pay a new TCP+TLS handshake on every call. Successful responses go through
+`llm_cache` so retried executions can replay them.
+"""
+import gzip
+import http.client
+import json
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+import llm_cache
+
+GOOGLE_AI_STUDIO_URL = 'https://generativelanguage.googleapis.com/v1beta/openai/chat/completions'
+BEDROCK_PROXY_URL = 'http://Bedroc-Proxy-xVtSm3tV6xYe-1727257641.us-east-1.elb.amazonaws.com/api/v1/chat/completions'
+
+# model alias -> (endpoint url, environment variable holding the API key, provider model id)
+MODELS = {
+    'gemini-2.5-flash': (GOOGLE_AI_STUDIO_URL, 'API_KEY', 'gemini-2.5-flash-preview-05-20'),
+    'gemini-2.5-pro': (GOOGLE_AI_STUDIO_URL, 'API_KEY', 'gemini-2.5-pro-preview-05-06'),
+    'gemini-2.0-flash': (GOOGLE_AI_STUDIO_URL, 'API_KEY', 'gemini-2.0-flash-001'),
+    'gemini-2.0-flash-lite': (GOOGLE_AI_STUDIO_URL, 'API_KEY', 'gemini-2.0-flash-lite-001'),
+    'claude-4-sonnet': (BEDROCK_PROXY_URL, 'BEDROCK_API_KEY', 'us.anthropic.claude-sonnet-4-20250514-v1:0'),
+    'claude-3.7-sonnet': (BEDROCK_PROXY_URL, 'BEDROCK_API_KEY', 'us.anthropic.claude-3-7-sonnet-20250219-v1:0'),
+    'claude-3.5-haiku': (BEDROCK_PROXY_URL, 'BEDROCK_API_KEY', 'us.anthropic.claude-3-5-haiku-20241022-v1:0'),
+}
+DEFAULT_FALLBACK_MODEL = 'gemini-2.0-flash' # Used for model aliases not listed above
+
+DEFAULT_TIMEOUT = 120 # Seconds per HTTP attempt; generation calls can legitimately take a while
+CONNECT_TIMEOUT = 5 # Used when pre-opening connections during Lambda init
+RETRYABLE_STATUS_CODES = (429, 500, 502, 503, 504)
+MAX_IDLE_CONNECTIONS_PER_HOST = 8
+
+
+def _resolve_model(model):
+    if model not in MODELS:
+        # Unknown aliases fall back like the per-function copies of get_api_info did
+        print(f"Warning: Unsupported model {model}, falling back to {DEFAULT_FALLBACK_MODEL}")
+        return MODELS[DEFAULT_FALLBACK_MODEL]
+    return MODELS[model]
+
+
+def get_api_info(model):
+    url, api_key_env, model_id = _resolve_model(model)
+    return url, os.environ[api_key_env], model_id
+
+
+class _ConnectionPool:
+    """
+    Thread-safe pool of idle keep-alive connections keyed by (scheme, host, port).
+    """
+
+    def __init__(self, max_idle_per_host=MAX_IDLE_CONNECTIONS_PER_HOST):
+        self._idle = {}
+        self._lock = threading.Lock()
+        self._max_idle_per_host = max_idle_per_host
+
+    @staticmethod
+    def _key(url):
+        parts = urlsplit(url)
+        default_port = 443 if parts.scheme == 'https' else 80
+        return parts.scheme, parts.hostname, parts.port or default_port
+
+    def acquire(self, url, timeout):
+        """Returns (key, connection, reused)."""
+        key = self._key(url)
+        with self._lock:
+            idle = self._idle.get(key)
+            conn = idle.pop() if idle else None
+        if conn is not None:
+            conn.timeout = timeout
+            if conn.sock is not None:
+                conn.sock.settimeout(timeout)
+            return key, conn, True
+        scheme, host, port = key
+        connection_class = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+        return key, connection_class(host, port, timeout=timeout), False
+
+    def release(self, key, conn):
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self._max_idle_per_host:
+                idle.append(conn)
+                return
+        conn.close()
+
+
+_pool = _ConnectionPool()
+
+# Errors raised when a pooled connection was closed by the server while idle
+_STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.CannotSendRequest,
+    ConnectionResetError,
+    BrokenPipeError,
+)
+
+
+def _post(url, headers, body, timeout):
+    """
+    POSTs `body` over a pooled connection and returns (status, reason, decoded body bytes).
+    A reused connection that turns out to be stale is replaced transparently once.
+    """
+    path = urlsplit(url).path or '/'
+    key, conn, reused = _pool.acquire(url, timeout)
+    try:
+        conn.request('POST', path, body=body, headers=headers)
+        resp = conn.getresponse()
+        payload = resp.read()
+    except _STALE_CONNECTION_ERRORS:
+        conn.close()
+        if reused:
+            return _post(url, headers, body, timeout)
+        raise
+    except Exception:
+        conn.close()
+        raise
+
+    if resp.will_close:
+        conn.close()
+    else:
+        _pool.release(key, conn)
+
+    if (resp.getheader('Content-Encoding') or '').lower() == 'gzip':
+        payload = gzip.decompress(payload)
+    return resp.status, resp.reason, payload
+
+
+def prewarm(*models):
+    """
+    Opens one connection per provider host used by `models` and parks it in the pool.
+    Call at module level so the handshake happens during Lambda init rather than on
+    the first model call. Failures are logged and ignored.
+    """
+    urls = {MODELS[model][0] for model in models if model in MODELS}
+    for url in urls:
+        try:
+            key, conn, reused = _pool.acquire(url, CONNECT_TIMEOUT)
+            if not reused:
+                conn.connect()
+            _pool.release(key, conn)
+        except Exception as e:
+            print(f"Warning: could not pre-open connection to {url}: {e}")
+
+
+def _extract_message(output):
+    if output.get('choices') and output['choices'][0].get('message'):
+        return output['choices'][0]['message']
+    # Handle Anthropic-style bodies in case the Bedrock proxy does not translate them
+    print(f"Unexpected LLM response structure: {output}")
+    if output.get('content') and isinstance(output['content'], list) and output['content'][0].get('text'):
+        return {"role": "assistant", "content": output['content'][0]['text']}
+    return {"role": "assistant", "content": json.dumps(output)}
+
+
+def _build_request(system_prompt, prompt, messages, output_format, tools, model_identifier):
+    data = {
+        "model": model_identifier,
+        "messages": [],
+        "max_tokens": 8192
+    }
+
+    data['messages'].append({"role": "system", "content": system_prompt})
+
+    if messages is not None:
+        data['messages'].extend(messages)
+
+    data['messages'].append({"role": "user", "content": prompt})
+
+    if output_format:
+        data['response_format'] = {
+            "type": "json_schema",
+            "json_schema": {
+                "name": "output",
+                "schema": output_format
+            }
+        }
+
+    if tools:
+        data['tools'] = tools
+    return data
+
+
+def call_model(system_prompt, prompt, messages=None, output_format=None, tools=None, model='gemini-2.5-flash',
+               fallback_model=None, timeout=DEFAULT_TIMEOUT, cache=True, deadline=None):
+    """
+    Calls an OpenAI-compatible chat completions endpoint and returns the assistant message
+    dict, or None if the call failed after retries.
+
+    If `fallback_model` is given, the final retry attempt is made against that model instead.
+    With `cache` set, an identical earlier request is answered from the response cache.
+    `deadline` (a time.time() value) bounds the whole call, retries and backoff included:
+    each attempt's timeout is cut to the time left, and no retry starts after it.
+    """
+    url, api_key, model_identifier = get_api_info(model)
+    data = _build_request(system_prompt, prompt, messages, output_format, tools, model_identifier)
+
+    key = llm_cache.cache_key(data) if cache else None
+    if key:
+        cached_message = llm_cache.get(key)
+        if cached_message is not None:
+            return cached_message
+
+    max_retries = 5
+    base_delay = 1
+    max_delay = 10
+
+    for attempt in range(max_retries + 1):
+        if attempt == max_retries and fallback_model and fallback_model != model:
+            print(f"Retry limit reached. Falling back to {fallback_model} model for final attempt.")
+            url, api_key, model_identifier = get_api_info(fallback_model)
+            data['model'] = model_identifier
+
+        headers = {
+            'Content-Type': 'application/json',
+            'Accept-Encoding': 'gzip',
+            'Authorization': f'Bearer {api_key}',
+            'Connection': 'keep-alive',
+        }
+
+        attempt_timeout = timeout
+        if deadline is not None:
+            attempt_timeout = min(timeout, deadline - time.time())
+            if attempt_timeout <= 0:
+                print(f"Error: Deadline reached before attempt {attempt + 1}.")
+                return None
+
+        try:
+            status, reason, payload = _post(url, headers, json.dumps(data).encode('utf-8'), attempt_timeout)
+        except (OSError, http.client.HTTPException) as e: # Network errors and timeouts are retryable
+            error, retryable = e, True
+        else:
+            if status == 200:
+                output = json.loads(payload)
+                print("LLM Raw Output:", output)
+                message = _extract_message(output)
+                if key:
+                    llm_cache.put(key, message, model=data['model'])
+                return message
+            error = f"HTTP Error: {status} - {reason}. Response: {payload.decode('utf-8', errors='replace')}"
+            retryable = status in RETRYABLE_STATUS_CODES
+
+        if attempt == max_retries:
+            print(f"Error: Final attempt failed after {max_retries} retries: {error}")
+            return None
+        if not retryable:
+            print(f"Non-retryable error: {error}")
+            return None
+
+        delay = min(base_delay * (2 ** attempt), max_delay)
+        jitter = delay * 0.1 * (0.5 - (0.5 * attempt / max_retries))
+        sleep_time = delay + jitter
+        if deadline is not None and time.time() + sleep_time >= deadline:
+            print(f"Error: Attempt {attempt + 1} failed and the deadline leaves no time to retry: {error}")
+            return None
+        print(f"Attempt {attempt + 1} failed. Retrying in {sleep_time:.2f} seconds... Error: {error}")
+        time.sleep(sleep_time)
+    return None
+
+
+def evict_cached(system_prompt, prompt, messages=None, output_format=None, tools=None, model='gemini-2.5-flash'):
+    """
+    Drops the cached response for a request, e.g. when it failed validation and replaying
+    it on the next retry would only reproduce the same failure.
+    """
+    model_identifier = _resolve_model(model)[2] # Same identifier call_model put in the cache key
+    data = _build_request(system_prompt, prompt, messages, output_format, tools, model_identifier)
+    llm_cache.evict(llm_cache.cache_key(data))
@@ -0,0 +1,120 @@
+"""
+In-container cache for the read handlers.
+
+A warm Lambda container serves many requests from the same user in a row, so course items
+and S3 objects are kept in a small LRU with a TTL. Entries carry a version (the S3 ETag, or
+course_store's course/chapter version) so callers can tell a stale entry from a current
+one: S3 objects past their TTL are revalidated with a conditional GET instead of downloaded
+again (objects not cached at all are fetched conditionally on the client's own ETag), and course items are revalidated against a projected read of their statuses on every
+hit. The cache only lives as long as the container; other containers never see it.
+"""
+import io
+import threading
+import time
+from collections import OrderedDict
+
+from botocore.exceptions import ClientError
+
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_TTL_SECONDS = 60
+MAX_CACHED_OBJECT_BYTES = 1024 * 1024 # Larger objects are always fetched
+
+
+class WarmCache:
+    """A thread-safe LRU of (value, version) entries that expire after a TTL."""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl_seconds=DEFAULT_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict() # key -> (value, version, expires_at)
+        self._lock = threading.Lock()
+
+    def get(self, key, version=None):
+        """Returns the cached value, or None if it is missing, expired or not at `version`."""
+        value, entry_version, fresh = self.peek(key)
+        if not fresh or (version is not None and entry_version != version):
+            return None
+        return value
+
+    def peek(self, key):
+        """Returns (value, version, fresh) even for an expired entry, or (None, None, False)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None, None, False
+            self._entries.move_to_end(key)
+            value, version, expires_at = entry
+            return value, version, time.monotonic() < expires_at
+
+    def put(self, key, value, version=None, ttl_seconds=None):
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        with self._lock:
+            self._entries[key] = (value, version, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def touch(self, key, ttl_seconds=None):
+        """Extends the TTL of an entry that was revalidated."""
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries[key] = (entry[0], entry[1], time.monotonic() + ttl)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+def get_s3_object(cache, s3_client, bucket_name, key, client_etags=None):
+    """
+    get_object through `cache`. Returns a dict with Body (a fresh file-like object), ETag and
+    ContentEncoding, like get_object. Expired entries are revalidated with IfNoneMatch, so an
+    unchanged object costs a 304 rather than a download. Errors such as NoSuchKey are raised
+    as usual.
+
+    With nothing cached, `client_etags` (the tags of the client's If-None-Match) are sent to
+    S3 instead, so an object the client already has isn't downloaded just to answer 304. The
+    result is then {'NotModified': True, 'ETag': ...} without a Body.
+    """
+    cache_key = ('s3', bucket_name, key)
+    cached, etag, fresh = cache.peek(cache_key)
+    if cached is not None and fresh:
+        return _as_response(cached)
+
+    get_kwargs = {'Bucket': bucket_name, 'Key': key}
+    if cached is not None:
+        get_kwargs['IfNoneMatch'] = etag
+    elif client_etags:
+        get_kwargs['IfNoneMatch'] = ', '.join(client_etags)
+    try:
+        response = s3_client.get_object(**get_kwargs)
+    except ClientError as e:
+        if e.response['Error']['Code'] in ('304', 'NotModified'):
+            if cached is not None:
+                cache.touch(cache_key)
+                return _as_response(cached)
+            if client_etags:
+                headers = e.response.get('ResponseMetadata', {}).get('HTTPHeaders', {})
+                return {'NotModified': True, 'ETag': headers.get('etag') or client_etags[0]}
+        if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+            cache.invalidate(cache_key)
+        raise
+
+    cached = {
+        'data': response['Body'].read(),
+        'ETag': response['ETag'],
+        'ContentEncoding': response.get('ContentEncoding')
+    }
+    if len(cached['data']) <= MAX_CACHED_OBJECT_BYTES:
+        cache.put(cache_key, cached, version=cached['ETag'])
+    return _as_response(cached)
+
+
+def _as_response(cached):
+    response = {'Body': io.BytesIO(cached['data']), 'ETag': cached['ETag']}
+    if cached['ContentEncoding']:
+        response['ContentEncoding'] = cached['ContentEncoding']
+    return response
+
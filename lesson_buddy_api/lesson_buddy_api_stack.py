@@ -9,6 +9,7 @@ from .authentication import Authentication
 from .tables import Tables # Added import
 from .buckets import Buckets # Added import
 from .api_gateway import LessonBuddyApiGateway # Added import
+from .websocket_api import LessonBuddyWebSocketApi
 
 class LessonBuddyApiStack(Stack):
 
@@ -29,6 +30,8 @@ class LessonBuddyApiStack(Stack):
             questions_bucket=buckets.questions_bucket, # Added questions_bucket
             course_images_bucket=buckets.course_images_bucket, # Added course_images_bucket
             flashcards_table=tables.flashcards_table, # Added flashcards_table
+            llm_cache_table=tables.llm_cache_table,
+            connections_table=tables.connections_table,
             user_pool_id=authentication.user_pool.user_pool_id,
             user_pool_client_id=authentication.user_pool_client.user_pool_client_id,
             user_pool_arn=authentication.user_pool.user_pool_arn
@@ -40,7 +43,7 @@ class LessonBuddyApiStack(Stack):
         # get_all_courses_lambda, get_lesson_content_lambda, get_course_plan_lambda
         api_gateway_stack = LessonBuddyApiGateway(
             self, "ApiGateway",
-            generate_chapter_sfn=functions.course_generation_sfn,
+            start_chapter_generation_function=functions.start_chapter_generation_function,
             generate_course_plan_function=functions.generate_course_plan_function,
             get_course_list_function=functions.get_all_courses_function,
             get_lesson_content_function=functions.get_lesson_content_function,
@@ -59,5 +62,16 @@ class LessonBuddyApiStack(Stack):
             get_multiple_choice_questions_function=functions.get_multiple_choice_questions_function,
             get_flashcards_function=functions.get_flashcards_function, # Added flashcards function
             get_image_data_function=functions.get_image_data_function, # Added
-            delete_course_function=functions.delete_course_function # Added
+            delete_course_function=functions.delete_course_function, # Added
+            get_course_plan_status_function=functions.get_course_plan_status_function,
+            get_chapter_bundle_function=functions.get_chapter_bundle_function,
+            get_course_generation_status_function=functions.get_course_generation_status_function
+        )
+
+        # Generation progress pushed to clients over WebSockets
+        websocket_api = LessonBuddyWebSocketApi(
+            self, "WebSocketApi",
+            connect_function=functions.websocket_connect_function,
+            disconnect_function=functions.websocket_disconnect_function,
+            push_function=functions.push_generation_progress_function
         )
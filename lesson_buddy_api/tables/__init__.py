@@ -19,6 +19,7 @@ class Tables(Construct):
                 type=dynamodb.AttributeType.STRING
             ),
             billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
+            stream=dynamodb.StreamViewType.NEW_AND_OLD_IMAGES, # Status changes are pushed to WebSocket clients (see push_generation_progress)
             removal_policy=RemovalPolicy.DESTROY # Default, can be changed
         )
 
@@ -31,6 +32,19 @@ class Tables(Construct):
             )
             # You can specify read/write capacity if not using PAY_PER_REQUEST for the GSI
         )
+        # No longer queried. DynamoDB can't change a GSI's projection in place and CloudFormation
+        # allows one GSI creation or deletion per update, so remove this in a later deployment.
+
+        # Course list index: only the fields get_all_courses returns, not whole course plans
+        self.table.add_global_secondary_index(
+            index_name="UserID-list-index",
+            partition_key=dynamodb.Attribute(
+                name="UserID",
+                type=dynamodb.AttributeType.STRING
+            ),
+            projection_type=dynamodb.ProjectionType.INCLUDE,
+            non_key_attributes=["title", "description", "cover_image_url", "cover_image_variants", "plan_status"]
+        )
 
         # Add Flashcards Table
         self.flashcards_table = dynamodb.Table(
@@ -46,3 +60,37 @@ class Tables(Construct):
             billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
             removal_policy=RemovalPolicy.DESTROY
         )
+
+        # Content-addressed LLM response cache (see layers/shared/python/llm_cache.py)
+        self.llm_cache_table = dynamodb.Table(
+            self, "LlmCacheTable",
+            partition_key=dynamodb.Attribute(
+                name="CacheKey",
+                type=dynamodb.AttributeType.STRING
+            ),
+            billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
+            time_to_live_attribute="ExpiresAt",
+            removal_policy=RemovalPolicy.DESTROY
+        )
+
+        # Open WebSocket connections, so generation progress can be pushed to a user's clients
+        self.connections_table = dynamodb.Table(
+            self, "ConnectionsTable",
+            partition_key=dynamodb.Attribute(
+                name="ConnectionID",
+                type=dynamodb.AttributeType.STRING
+            ),
+            billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
+            time_to_live_attribute="ExpiresAt", # API Gateway closes connections after 2 hours; clears missed disconnects
+            removal_policy=RemovalPolicy.DESTROY
+        )
+
+        # Connections of a user, looked up for every push
+        self.connections_table.add_global_secondary_index(
+            index_name="UserID-index",
+            partition_key=dynamodb.Attribute(
+                name="UserID",
+                type=dynamodb.AttributeType.STRING
+            ),
+            projection_type=dynamodb.ProjectionType.KEYS_ONLY
+        )
@@ -0,0 +1,46 @@
+from aws_cdk import (
+    aws_apigatewayv2 as apigwv2,
+    aws_apigatewayv2_integrations as apigwv2_integrations,
+    aws_lambda as _lambda,
+    CfnOutput
+)
+from constructs import Construct
+
+
+class LessonBuddyWebSocketApi(Construct):
+    """
+    WebSocket API that pushes generation progress to clients, so they don't have to poll
+    check-chapter-generation-status. Clients connect with `?token=<Cognito access token>`
+    and receive JSON messages of type `chapter_status` and `course_status`.
+    """
+
+    def __init__(self, scope: Construct, id: str,
+                 connect_function: _lambda.Function,
+                 disconnect_function: _lambda.Function,
+                 push_function: _lambda.Function,
+                 **kwargs) -> None:
+        super().__init__(scope, id, **kwargs)
+
+        # Server-to-client only, so no routes beyond $connect and $disconnect
+        self.api = apigwv2.WebSocketApi(self, "LessonBuddyWebSocketApi",
+            api_name="lesson-buddy-websocket-api",
+            description="Generation progress pushed to Lesson Buddy clients.",
+            connect_route_options=apigwv2.WebSocketRouteOptions(
+                integration=apigwv2_integrations.WebSocketLambdaIntegration("ConnectIntegration", connect_function)
+            ),
+            disconnect_route_options=apigwv2.WebSocketRouteOptions(
+                integration=apigwv2_integrations.WebSocketLambdaIntegration("DisconnectIntegration", disconnect_function)
+            )
+        )
+
+        self.stage = apigwv2.WebSocketStage(self, "ProdStage",
+            web_socket_api=self.api,
+            stage_name="prod",
+            auto_deploy=True
+        )
+
+        # The push function posts to connections through the stage's management endpoint
+        push_function.add_environment("WEBSOCKET_CALLBACK_URL", self.stage.callback_url)
+        self.stage.grant_management_api_access(push_function)
+
+        CfnOutput(self, "WebSocketUrl", value=self.stage.url)
@@ -0,0 +1,101 @@
+"""
+Moves lesson content and questions from the flat keys at the bucket root
+({course_id}-{chapter_id}-{lesson_id}.json, ...-questions.json) to the per-course layout
+(courses/{user_id}/{course_id}/{chapter_id}/{lesson_id}/lesson.json, .../questions.json).
+
+The readers fall back to the flat keys, so this can run at any time after the deployment
+that introduced the new layout, and can be re-run safely. Objects are copied as they are
+(gzip encoding included); the flat keys are only deleted with --delete-legacy.
+
+    python scripts/migrate_content_keys.py --course-table <name> --lesson-bucket <name> \\
+        --questions-bucket <name> [--delete-legacy] [--dry-run]
+"""
+import argparse
+import os
+import sys
+
+import boto3
+from botocore.exceptions import ClientError
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lesson_buddy_api', 'layers', 'shared', 'python'))
+import course_store # noqa: E402
+import content_store # noqa: E402
+
+s3_client = boto3.client('s3')
+
+
+def _exists(bucket_name, key):
+    try:
+        s3_client.head_object(Bucket=bucket_name, Key=key)
+        return True
+    except ClientError as e:
+        if e.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+            return False
+        raise
+
+
+def _move(bucket_name, old_key, new_key, delete_legacy, dry_run):
+    """Returns True if `old_key` was (or would be) copied to `new_key`."""
+    if not _exists(bucket_name, old_key):
+        return False
+    if dry_run:
+        print(f"Would move s3://{bucket_name}/{old_key} -> {new_key}")
+        return True
+    if not _exists(bucket_name, new_key): # Never overwrite content written under the new layout
+        s3_client.copy_object(
+            Bucket=bucket_name,
+            Key=new_key,
+            CopySource={'Bucket': bucket_name, 'Key': old_key},
+            MetadataDirective='COPY'
+        )
+    if delete_legacy:
+        s3_client.delete_object(Bucket=bucket_name, Key=old_key)
+    return True
+
+
+def _course_headers(table):
+    """Yields (course_id, user_id) for every course header in the table."""
+    scan_kwargs = {'ProjectionExpression': "CourseID, UserID"}
+    while True:
+        response = table.scan(**scan_kwargs)
+        for item in response.get('Items', []):
+            if course_store.CHAPTER_MARKER not in item['UserID']:
+                yield item['CourseID'], item['UserID']
+        if 'LastEvaluatedKey' not in response:
+            return
+        scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--course-table', required=True)
+    parser.add_argument('--lesson-bucket', required=True)
+    parser.add_argument('--questions-bucket', required=True)
+    parser.add_argument('--delete-legacy', action='store_true', help="Delete the flat keys once copied")
+    parser.add_argument('--dry-run', action='store_true', help="Only print what would be moved")
+    args = parser.parse_args()
+
+    table = boto3.resource('dynamodb').Table(args.course_table)
+    moved = 0
+    for course_id, user_id in _course_headers(table):
+        course = course_store.load_course(table, course_id, user_id)
+        for chapter in (course or {}).get('chapters') or []:
+            for lesson in chapter.get('lessons') or []:
+                ids = (course_id, chapter['id'], lesson['id'])
+                moved += _move(
+                    args.lesson_bucket,
+                    content_store.legacy_lesson_key(*ids),
+                    content_store.lesson_key(user_id, *ids),
+                    args.delete_legacy, args.dry_run
+                )
+                moved += _move(
+                    args.questions_bucket,
+                    content_store.legacy_questions_key(*ids),
+                    content_store.questions_key(user_id, *ids),
+                    args.delete_legacy, args.dry_run
+                )
+    print(f"{'Would move' if args.dry_run else 'Moved'} {moved} objects")
+
+
+if __name__ == '__main__':
+    main()
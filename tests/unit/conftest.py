@@ -0,0 +1,8 @@
+import os
+import sys
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+# Lambda puts the shared layer's python/ directory on sys.path; mirror that for unit tests
+sys.path.insert(0, os.path.join(REPO_ROOT, 'lesson_buddy_api', 'layers', 'shared', 'python'))
+sys.path.insert(0, os.path.join(REPO_ROOT, 'lesson_buddy_api', 'functions', 'fix_lesson_markdown'))
@@ -0,0 +1,20 @@
+import chapter_executions
+
+
+def test_prefetch_names_are_deterministic_and_per_user():
+    name = chapter_executions.prefetch_execution_name('c1', 'u1', 'ch1')
+    assert name == chapter_executions.prefetch_execution_name('c1', 'u1', 'ch1')
+    assert name.startswith(chapter_executions.prefetch_user_prefix('u1'))
+    assert not name.startswith(chapter_executions.prefetch_user_prefix('u2'))
+    assert name != chapter_executions.prefetch_execution_name('c1', 'u1', 'ch2')
+    assert len(name) <= 80 # Step Functions execution name limit
+
+
+def test_prefetch_names_carry_the_prefix_the_state_machine_checks():
+    assert chapter_executions.prefetch_execution_name('c1', 'u1', 'ch1').startswith('prefetch-')
+
+
+def test_execution_arn_from_state_machine_arn():
+    state_machine_arn = 'arn:aws:states:us-east-1:123456789012:stateMachine:CourseGenerationStateMachine'
+    assert chapter_executions.execution_arn(state_machine_arn, 'run-1') == \
+        'arn:aws:states:us-east-1:123456789012:execution:CourseGenerationStateMachine:run-1'
@@ -0,0 +1,47 @@
+import importlib.util
+import os
+
+import pytest
+
+pytest.importorskip("boto3")
+from botocore.exceptions import ClientError
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+HANDLER_PATH = os.path.join(REPO_ROOT, 'lesson_buddy_api', 'functions', 'cleanup_course', 'lambda_handler.py')
+
+
+class FakeStepFunctions:
+    def __init__(self, statuses):
+        self.statuses = statuses # execution ARN -> status
+        self.calls = []
+
+    def describe_execution(self, executionArn):
+        self.calls.append(('describe', executionArn))
+        if executionArn not in self.statuses:
+            raise ClientError({'Error': {'Code': 'ExecutionDoesNotExist'}}, 'DescribeExecution')
+        return {'status': self.statuses[executionArn]}
+
+    def stop_execution(self, executionArn, cause):
+        self.calls.append(('stop', executionArn))
+        self.statuses[executionArn] = 'ABORTED'
+
+
+@pytest.fixture
+def handler(monkeypatch):
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+    spec = importlib.util.spec_from_file_location('cleanup_course_handler', HANDLER_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_only_recorded_running_executions_are_stopped(handler, monkeypatch):
+    sfn = FakeStepFunctions({'arn:1': 'RUNNING', 'arn:2': 'SUCCEEDED'})
+    monkeypatch.setattr(handler, 'sfn_client', sfn)
+
+    assert handler._stop_executions('c1', ['arn:1', 'arn:2', 'arn:gone']) == 1
+    assert sfn.calls == [
+        ('describe', 'arn:1'), ('stop', 'arn:1'),
+        ('describe', 'arn:2'),
+        ('describe', 'arn:gone')
+    ]
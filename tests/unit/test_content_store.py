@@ -0,0 +1,99 @@
+import gzip
+import io
+import json
+
+import pytest
+
+pytest.importorskip("botocore")
+from botocore.exceptions import ClientError
+
+import content_store
+
+
+def _client_error(code):
+    return ClientError({'Error': {'Code': code, 'Message': code}}, 'GetObject')
+
+
+class FakeS3:
+    def __init__(self):
+        self.objects = {}
+
+    def put_object(self, Bucket, Key, Body, ContentType, ContentEncoding=None):
+        self.objects[(Bucket, Key)] = (Body, ContentEncoding)
+        return {'ETag': '"etag"'}
+
+    def get_object(self, Bucket, Key):
+        if (Bucket, Key) not in self.objects:
+            raise _client_error('NoSuchKey')
+        body, encoding = self.objects[(Bucket, Key)]
+        response = {'Body': io.BytesIO(body)}
+        if encoding:
+            response['ContentEncoding'] = encoding
+        return response
+
+
+def test_keys():
+    assert content_store.lesson_key('u', 'c', 'ch', 'l') == 'courses/u/c/ch/l/lesson.json'
+    assert content_store.questions_key('u', 'c', 'ch', 'l') == 'courses/u/c/ch/l/questions.json'
+    assert content_store.lesson_key('u', 'c', 'ch', 'l').startswith(content_store.course_prefix('u', 'c'))
+    assert content_store.legacy_lesson_key('c', 'ch', 'l') == 'c-ch-l.json'
+    assert content_store.legacy_questions_key('c', 'ch', 'l') == 'c-ch-l-questions.json'
+
+
+def test_put_json_round_trips_gzipped():
+    s3 = FakeS3()
+    content_store.put_json(s3, 'bucket', 'key', {'1': 'text'})
+    body, encoding = s3.objects[('bucket', 'key')]
+    assert encoding == 'gzip'
+    assert json.loads(gzip.decompress(body)) == {'1': 'text'}
+    assert content_store.read_json(s3.get_object(Bucket='bucket', Key='key')) == {'1': 'text'}
+
+
+def test_read_json_accepts_uncompressed_objects():
+    response = {'Body': io.BytesIO(b'{"1": "text"}')}
+    assert content_store.read_json(response) == {'1': 'text'}
+
+
+def test_get_first_falls_back_to_later_keys():
+    s3 = FakeS3()
+    s3.put_object(Bucket='bucket', Key='old', Body=b'{}', ContentType='application/json')
+    response = content_store.get_first(lambda key: s3.get_object(Bucket='bucket', Key=key), ['new', 'old'])
+    assert response['Body'].read() == b'{}'
+
+    with pytest.raises(ClientError):
+        content_store.get_first(lambda key: s3.get_object(Bucket='bucket', Key=key), ['new', 'missing'])
+
+
+def test_get_first_raises_other_errors_immediately():
+    calls = []
+
+    def get_object(key):
+        calls.append(key)
+        raise _client_error('AccessDenied')
+
+    with pytest.raises(ClientError):
+        content_store.get_first(get_object, ['new', 'old'])
+    assert calls == ['new']
+
+
+def test_wants_gzip_body():
+    event = {'headers': {'Accept': 'application/gzip', 'Accept-Encoding': 'gzip, deflate'}}
+    assert content_store.wants_gzip_body(event)
+    assert not content_store.wants_gzip_body({'headers': {'Accept': 'application/json', 'Accept-Encoding': 'gzip'}})
+    assert not content_store.wants_gzip_body({'headers': {'Accept': 'application/gzip'}})
+    assert not content_store.wants_gzip_body({'headers': None})
+
+
+def test_request_etags_lists_every_tag():
+    event = {'headers': {'If-None-Match': '"a", W/"b" ,"c"'}}
+    assert content_store.request_etags(event) == ['"a"', '"b"', '"c"']
+    assert content_store.request_etags({'headers': {}}) == []
+
+
+def test_etag_matches_any_listed_tag_or_star():
+    event = {'headers': {'if-none-match': '"a", W/"b"'}}
+    assert content_store.etag_matches(event, '"a"')
+    assert content_store.etag_matches(event, '"b"')
+    assert not content_store.etag_matches(event, '"c"')
+    assert content_store.etag_matches({'headers': {'If-None-Match': '*'}}, '"c"')
+    assert not content_store.etag_matches({'headers': None}, '"c"')
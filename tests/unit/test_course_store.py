@@ -0,0 +1,251 @@
+import copy
+
+import pytest
+
+pytest.importorskip("boto3")
+from botocore.exceptions import ClientError
+
+import course_store
+
+
+def conditional_check_failed():
+    return ClientError({'Error': {'Code': 'ConditionalCheckFailedException'}}, 'Write')
+
+
+class FakeBatch:
+    def __init__(self, table):
+        self.table = table
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def put_item(self, Item):
+        self.table.put_item(Item=Item)
+
+    def delete_item(self, Key):
+        self.table.items.pop((Key['CourseID'], Key['UserID']), None)
+
+
+class FakeTable:
+    """
+    Just enough of a DynamoDB Table for course_store: conditions are attribute_exists /
+    attribute_not_exists, updates are plain SET and REMOVE clauses, and queries return
+    pages of PAGE_SIZE items so pagination is exercised.
+    """
+    PAGE_SIZE = 2
+
+    def __init__(self):
+        self.items = {}
+
+    @staticmethod
+    def _check(item, condition):
+        if condition is None:
+            return
+        function, attribute = condition.rstrip(')').split('(')
+        exists = item is not None and attribute in item
+        if exists != (function == 'attribute_exists'):
+            raise conditional_check_failed()
+
+    def put_item(self, Item, ConditionExpression=None):
+        key = (Item['CourseID'], Item['UserID'])
+        self._check(self.items.get(key), ConditionExpression)
+        self.items[key] = copy.deepcopy(Item)
+
+    def get_item(self, Key, ProjectionExpression=None):
+        item = self.items.get((Key['CourseID'], Key['UserID']))
+        return {'Item': copy.deepcopy(item)} if item else {}
+
+    def update_item(self, Key, UpdateExpression, ExpressionAttributeValues, ExpressionAttributeNames=None, ConditionExpression=None):
+        key = (Key['CourseID'], Key['UserID'])
+        item = self.items.get(key)
+        self._check(item, ConditionExpression)
+        item = item if item is not None else dict(Key)
+        names = ExpressionAttributeNames or {}
+        set_clause, _, remove_clause = UpdateExpression.partition(' REMOVE ')
+        for assignment in set_clause[len('SET '):].split(', '):
+            name, value = assignment.split(' = ')
+            item[names.get(name, name)] = copy.deepcopy(ExpressionAttributeValues[value])
+        for name in filter(None, remove_clause.split(', ')):
+            item.pop(names.get(name, name), None)
+        self.items[key] = item
+
+    def query(self, KeyConditionExpression, ExclusiveStartKey=None, **kwargs):
+        course_condition, user_condition = KeyConditionExpression.get_expression()['values']
+        course_id = course_condition.get_expression()['values'][1]
+        user_prefix = user_condition.get_expression()['values'][1]
+        matches = sorted(
+            (key, item) for key, item in self.items.items()
+            if key[0] == course_id and key[1].startswith(user_prefix)
+        )
+        if ExclusiveStartKey:
+            matches = [(key, item) for key, item in matches if key > (ExclusiveStartKey['CourseID'], ExclusiveStartKey['UserID'])]
+        page = matches[:self.PAGE_SIZE]
+        response = {'Items': [copy.deepcopy(item) for _, item in page]}
+        if len(matches) > self.PAGE_SIZE:
+            last_key = page[-1][0]
+            response['LastEvaluatedKey'] = {'CourseID': last_key[0], 'UserID': last_key[1]}
+        return response
+
+    def batch_writer(self):
+        return FakeBatch(self)
+
+
+def course(course_id='c1', user_id='u1', chapter_ids=('ch1', 'ch2', 'ch3'), **fields):
+    return {
+        'CourseID': course_id,
+        'UserID': user_id,
+        'title': 'Course',
+        'chapters': [{'id': chapter_id, 'title': f'Chapter {chapter_id}', 'lessons': []} for chapter_id in chapter_ids],
+        'chapters_status': {chapter_id: {'lessons_status': 'PENDING'} for chapter_id in chapter_ids},
+        **fields
+    }
+
+
+def test_save_and_load_round_trip_in_chapter_order():
+    table = FakeTable()
+    course_store.save_course(table, course(chapter_ids=('b', 'a', 'c')))
+
+    loaded = course_store.load_course(table, 'c1', 'u1')
+    assert [chapter['id'] for chapter in loaded['chapters']] == ['b', 'a', 'c']
+    assert loaded['chapters_status']['a'] == {'lessons_status': 'PENDING'}
+    assert 'chapter_ids' not in loaded
+    assert course_store.load_chapter_ids(table, 'c1', 'u1') == ['b', 'a', 'c']
+
+
+def test_chapters_are_separate_items_keyed_under_the_user():
+    table = FakeTable()
+    course_store.save_course(table, course())
+    assert ('c1', 'u1#CHAPTER#ch2') in table.items
+    assert table.items[('c1', 'u1')]['chapter_ids'] == ['ch1', 'ch2', 'ch3']
+    assert 'chapters' not in table.items[('c1', 'u1')]
+
+
+def test_user_id_prefix_never_matches_another_users_items():
+    table = FakeTable()
+    course_store.save_course(table, course(user_id='u1'))
+    course_store.save_course(table, course(user_id='u10', chapter_ids=('other',)))
+
+    assert [chapter['id'] for chapter in course_store.load_course(table, 'c1', 'u1')['chapters']] == ['ch1', 'ch2', 'ch3']
+    assert course_store.delete_course(table, 'c1', 'u1') == 4
+    assert course_store.load_course(table, 'c1', 'u10') is not None
+
+
+def test_load_chapter_reads_only_that_chapter():
+    table = FakeTable()
+    course_store.save_course(table, course())
+    chapter = course_store.load_chapter(table, 'c1', 'u1', 'ch2')
+    assert chapter['chapter']['title'] == 'Chapter ch2'
+    assert course_store.load_chapter(table, 'c1', 'u1', 'missing') is None
+
+
+def test_legacy_course_is_read_whole_and_migrated_on_request():
+    table = FakeTable()
+    table.put_item(Item=course())
+
+    chapter = course_store.load_chapter(table, 'c1', 'u1', 'ch3')
+    assert chapter['chapter_id'] == 'ch3'
+    assert ('c1', 'u1#CHAPTER#ch3') not in table.items
+
+    loaded = course_store.load_course(table, 'c1', 'u1', migrate=True)
+    assert [c['id'] for c in loaded['chapters']] == ['ch1', 'ch2', 'ch3']
+    assert table.items[('c1', 'u1')]['chapter_ids'] == ['ch1', 'ch2', 'ch3']
+    assert 'chapters' not in table.items[('c1', 'u1')]
+    assert course_store.load_course(table, 'c1', 'u1') == loaded
+
+
+def test_load_chapter_statuses_in_order():
+    table = FakeTable()
+    course_store.save_course(table, course(chapter_ids=('b', 'a'), plan_status='COMPLETED'))
+    statuses = course_store.load_chapter_statuses(table, 'c1', 'u1')
+    assert statuses['plan_status'] == 'COMPLETED'
+    assert [chapter['chapter_id'] for chapter in statuses['chapters']] == ['b', 'a']
+    assert course_store.load_chapter_statuses(table, 'c2', 'u1') is None
+
+
+def test_load_chapter_executions_returns_recorded_arns():
+    table = FakeTable()
+    course_store.save_course(table, course())
+    table.items[('c1', 'u1#CHAPTER#ch2')]['generation_execution_arn'] = 'arn:execution:2'
+    assert course_store.load_chapter_executions(table, 'c1', 'u1') == ['arn:execution:2']
+    assert course_store.load_chapter_executions(table, 'c2', 'u1') == []
+
+
+def test_update_chapter_details_keeps_statuses():
+    table = FakeTable()
+    course_store.save_course(table, course(plan_status='SKELETON'))
+    course_store.update_chapter_details(table, 'c1', 'u1', [{'id': 'ch1', 'title': 'Detailed', 'lessons': []}])
+
+    item = table.items[('c1', 'u1#CHAPTER#ch1')]
+    assert item['chapter']['title'] == 'Detailed'
+    assert item['chapter_status'] == {'lessons_status': 'PENDING'}
+    assert 'skeleton' not in item
+
+
+def test_update_chapter_details_never_recreates_a_deleted_course():
+    table = FakeTable()
+    with pytest.raises(course_store.CourseDeletedError):
+        course_store.update_chapter_details(table, 'c1', 'u1', [{'id': 'ch1', 'title': 'Detailed', 'lessons': []}])
+    assert table.items == {}
+
+
+def test_save_course_that_must_exist_never_recreates_a_deleted_course():
+    table = FakeTable()
+    with pytest.raises(course_store.CourseDeletedError):
+        course_store.save_course(table, course(), must_exist=True)
+    assert table.items == {}
+
+
+def test_save_course_that_must_exist_replaces_its_placeholder():
+    table = FakeTable()
+    course_store.save_course(table, course(chapter_ids=(), plan_status='GENERATING'))
+    course_store.save_course(table, course(plan_status='COMPLETED'), must_exist=True)
+    assert course_store.load_course(table, 'c1', 'u1')['plan_status'] == 'COMPLETED'
+
+
+def test_chapter_version_changes_when_the_chapter_is_regenerated():
+    table = FakeTable()
+    course_store.save_course(table, course())
+    chapter = course_store.load_chapter(table, 'c1', 'u1', 'ch1')
+    assert course_store.load_chapter_version(table, 'c1', 'u1', 'ch1') == course_store.chapter_version(chapter)
+
+    table.update_item(
+        Key=course_store.chapter_key('c1', 'u1', 'ch1'),
+        UpdateExpression="SET chapter_status = :status",
+        ExpressionAttributeValues={':status': {'lessons_status': 'GENERATING'}}
+    )
+    assert course_store.load_chapter_version(table, 'c1', 'u1', 'ch1') != course_store.chapter_version(chapter)
+    assert course_store.load_chapter_version(table, 'c1', 'u1', 'missing') is None
+
+
+def test_course_version_tracks_statuses_and_cover_image():
+    table = FakeTable()
+    course_store.save_course(table, course(plan_status='COMPLETED'))
+    loaded = course_store.load_course(table, 'c1', 'u1')
+    assert course_store.load_course_version(table, 'c1', 'u1') == course_store.course_version(loaded)
+
+    table.update_item(
+        Key={'CourseID': 'c1', 'UserID': 'u1'},
+        UpdateExpression="SET cover_image_url = :url",
+        ExpressionAttributeValues={':url': 's3://covers/c1.webp'}
+    )
+    assert course_store.load_course_version(table, 'c1', 'u1') != course_store.course_version(loaded)
+    assert course_store.load_course_version(table, 'c2', 'u1') is None
+
+
+def test_legacy_course_version_matches_its_loaded_form():
+    table = FakeTable()
+    table.put_item(Item=course())
+    loaded = course_store.load_course(table, 'c1', 'u1')
+    assert course_store.load_course_version(table, 'c1', 'u1') == course_store.course_version(loaded)
+
+
+def test_load_chapter_status_reads_new_and_legacy_courses():
+    table = FakeTable()
+    course_store.save_course(table, course())
+    table.put_item(Item=course(course_id='legacy'))
+    assert course_store.load_chapter_status(table, 'c1', 'u1', 'ch1') == {'lessons_status': 'PENDING'}
+    assert course_store.load_chapter_status(table, 'legacy', 'u1', 'ch1') == {'lessons_status': 'PENDING'}
+    assert course_store.load_chapter_status(table, 'c1', 'u1', 'missing') is None
@@ -0,0 +1,112 @@
+import pytest
+
+pytest.importorskip("boto3")
+from botocore.exceptions import ClientError
+
+import flashcard_store
+
+PARTITION = flashcard_store.lesson_flashcard_id('c1', 'ch1', 'l1')
+
+
+class FakeBatch:
+    def __init__(self, table):
+        self.table = table
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def delete_item(self, Key):
+        self.table.items.pop((Key['LessonFlashcardId'], Key['CardId']), None)
+
+
+class FakeTable:
+    """Just enough of a DynamoDB Table for flashcard_store's deck and legacy card access."""
+
+    def __init__(self):
+        self.items = {}
+        self.queries = 0
+
+    def put_item(self, Item, ConditionExpression, ExpressionAttributeValues, ReturnValues):
+        key = (Item['LessonFlashcardId'], Item['CardId'])
+        old = self.items.get(key)
+        if old is not None and 'Version' in old and not old['Version'] <= ExpressionAttributeValues[':version']:
+            raise ClientError({'Error': {'Code': 'ConditionalCheckFailedException'}}, 'PutItem')
+        self.items[key] = dict(Item)
+        return {'Attributes': old} if old is not None else {}
+
+    def get_item(self, Key, ProjectionExpression=None):
+        item = self.items.get((Key['LessonFlashcardId'], Key['CardId']))
+        return {'Item': dict(item)} if item else {}
+
+    def query(self, **kwargs):
+        self.queries += 1
+        items = [
+            dict(item) for (partition, card_id), item in sorted(self.items.items())
+            if partition == PARTITION and card_id.startswith(flashcard_store.LEGACY_CARD_PREFIX)
+        ]
+        return {'Items': items}
+
+    def batch_writer(self):
+        return FakeBatch(self)
+
+
+def cards(label):
+    return [{'question': f'{label} q{i}', 'answer': f'{label} a{i}'} for i in range(3)]
+
+
+def test_version_from_timestamp_reads_step_functions_start_time():
+    assert flashcard_store.version_from_timestamp('2024-01-15T10:30:00.123Z') == 1705314600123
+    assert flashcard_store.version_from_timestamp('2024-01-15T10:30:00') == 1705314600000
+
+
+def test_save_then_load_round_trips_cards_in_order():
+    table = FakeTable()
+    assert flashcard_store.save_deck(table, 'c1', 'ch1', 'l1', cards('new'), 100, user_id='u1')
+
+    loaded = flashcard_store.load_deck(table, 'c1', 'ch1', 'l1')
+    assert [card['question'] for card in loaded] == ['new q0', 'new q1', 'new q2']
+    assert [card['cardNumber'] for card in loaded] == [1, 2, 3]
+
+
+def test_late_retry_of_an_older_generation_keeps_the_newer_deck():
+    table = FakeTable()
+    flashcard_store.save_deck(table, 'c1', 'ch1', 'l1', cards('newer'), 200)
+
+    # Written after the newer deck, but generated by an execution that started earlier
+    assert not flashcard_store.save_deck(table, 'c1', 'ch1', 'l1', cards('older'), 100)
+    assert flashcard_store.load_deck(table, 'c1', 'ch1', 'l1')[0]['question'] == 'newer q0'
+
+
+def test_retry_of_the_same_generation_rewrites_its_deck():
+    table = FakeTable()
+    flashcard_store.save_deck(table, 'c1', 'ch1', 'l1', cards('first'), 100)
+    assert flashcard_store.save_deck(table, 'c1', 'ch1', 'l1', cards('retry'), 100)
+    assert flashcard_store.load_deck(table, 'c1', 'ch1', 'l1')[0]['question'] == 'retry q0'
+
+
+def test_legacy_cards_are_read_until_a_deck_replaces_them():
+    table = FakeTable()
+    for number in (2, 1):
+        table.items[(PARTITION, f'CARD#{number:02d}')] = {
+            'LessonFlashcardId': PARTITION, 'CardId': f'CARD#{number:02d}',
+            'CardNumber': number, 'Question': f'legacy q{number}', 'Answer': f'legacy a{number}'
+        }
+    assert [card['question'] for card in flashcard_store.load_deck(table, 'c1', 'ch1', 'l1')] == ['legacy q1', 'legacy q2']
+
+    flashcard_store.save_deck(table, 'c1', 'ch1', 'l1', cards('deck'), 100)
+    assert list(table.items) == [(PARTITION, flashcard_store.DECK_CARD_ID)]
+
+
+def test_legacy_cleanup_is_skipped_once_a_deck_exists():
+    table = FakeTable()
+    flashcard_store.save_deck(table, 'c1', 'ch1', 'l1', cards('first'), 100)
+    queries = table.queries
+    flashcard_store.save_deck(table, 'c1', 'ch1', 'l1', cards('second'), 200)
+    assert table.queries == queries
+
+
+def test_load_deck_without_cards_returns_none():
+    assert flashcard_store.load_deck(FakeTable(), 'c1', 'ch1', 'l1') is None
@@ -0,0 +1,65 @@
+import importlib.util
+import io
+import os
+
+import pytest
+
+pytest.importorskip("boto3")
+from botocore.exceptions import ClientError
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+HANDLER_PATH = os.path.join(REPO_ROOT, 'lesson_buddy_api', 'functions', 'get_lesson_content', 'lambda_handler.py')
+
+
+class FakeS3:
+    def __init__(self, objects):
+        self.objects = objects # key -> (data, etag)
+        self.calls = []
+
+    def get_object(self, Bucket, Key, IfNoneMatch=None):
+        self.calls.append((Key, IfNoneMatch))
+        if Key not in self.objects:
+            raise ClientError({'Error': {'Code': 'NoSuchKey'}}, 'GetObject')
+        data, etag = self.objects[Key]
+        if IfNoneMatch and etag in [tag.strip() for tag in IfNoneMatch.split(',')]:
+            raise ClientError({'Error': {'Code': '304'}, 'ResponseMetadata': {'HTTPHeaders': {'etag': etag}}}, 'GetObject')
+        return {'Body': io.BytesIO(data), 'ETag': etag}
+
+
+@pytest.fixture
+def handler(monkeypatch):
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+    monkeypatch.setenv('LESSON_BUCKET_NAME', 'bucket')
+    spec = importlib.util.spec_from_file_location('get_lesson_content_handler', HANDLER_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _event(headers):
+    return {
+        'queryStringParameters': {'course_id': 'c', 'chapter_id': 'ch', 'lesson_id': 'l'},
+        'requestContext': {'authorizer': {'claims': {'sub': 'u'}}},
+        'headers': headers
+    }
+
+
+def test_cold_cache_if_none_match_is_answered_by_s3(handler, monkeypatch):
+    s3 = FakeS3({'courses/u/c/ch/l/lesson.json': (b'{"1": "text"}', '"e1"')})
+    monkeypatch.setattr(handler, 's3', s3)
+
+    response = handler.lambda_handler(_event({'If-None-Match': '"e0", "e1"'}), None)
+    assert response['statusCode'] == 304
+    assert response['body'] == ''
+    assert response['headers']['ETag'] == '"e1"'
+    assert s3.calls == [('courses/u/c/ch/l/lesson.json', '"e0", "e1"')]
+
+
+def test_changed_object_is_returned(handler, monkeypatch):
+    s3 = FakeS3({'courses/u/c/ch/l/lesson.json': (b'{"1": "text"}', '"e2"')})
+    monkeypatch.setattr(handler, 's3', s3)
+
+    response = handler.lambda_handler(_event({'If-None-Match': '"e1"'}), None)
+    assert response['statusCode'] == 200
+    assert response['body'] == '{"1": "text"}'
+    assert response['headers']['ETag'] == '"e2"'
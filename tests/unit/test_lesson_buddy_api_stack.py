@@ -1,4 +1,6 @@
-import aws_cdk as core
+import pytest
+
+core = pytest.importorskip("aws_cdk")
 import aws_cdk.assertions as assertions
 
 from lesson_buddy_api.lesson_buddy_api_stack import LessonBuddyApiStack
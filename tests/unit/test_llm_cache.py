@@ -0,0 +1,76 @@
+import time
+
+import pytest
+
+pytest.importorskip("boto3")
+import llm_cache
+
+
+class FakeTable:
+    def __init__(self):
+        self.items = {}
+
+    def get_item(self, Key):
+        item = self.items.get(Key['CacheKey'])
+        return {'Item': dict(item)} if item else {}
+
+    def put_item(self, Item):
+        self.items[Item['CacheKey']] = dict(Item)
+
+    def delete_item(self, Key):
+        self.items.pop(Key['CacheKey'], None)
+
+
+@pytest.fixture
+def table(monkeypatch):
+    fake = FakeTable()
+    monkeypatch.setattr(llm_cache, '_table', fake)
+    monkeypatch.setenv('LLM_CACHE_TABLE_NAME', 'llm-cache')
+    llm_cache._local.clear()
+    yield fake
+    llm_cache._local.clear()
+
+
+def test_cache_key_ignores_unkeyed_fields_and_dict_order():
+    request = {'model': 'm', 'messages': [{'role': 'user', 'content': 'hi'}], 'response_format': {'a': 1, 'b': 2}}
+    reordered = {'response_format': {'b': 2, 'a': 1}, 'messages': [{'content': 'hi', 'role': 'user'}], 'model': 'm', 'temperature': 0.3}
+    assert llm_cache.cache_key(request) == llm_cache.cache_key(reordered)
+
+
+def test_cache_key_changes_with_messages():
+    request = {'model': 'm', 'messages': [{'role': 'user', 'content': 'hi'}]}
+    other = {'model': 'm', 'messages': [{'role': 'user', 'content': 'bye'}]}
+    assert llm_cache.cache_key(request) != llm_cache.cache_key(other)
+
+
+def test_put_then_get_replays_from_table_after_container_restart(table):
+    llm_cache.put('k', {'role': 'assistant', 'content': 'hello'}, model='m')
+    llm_cache._local.clear()
+
+    assert llm_cache.get('k') == {'role': 'assistant', 'content': 'hello'}
+    assert table.items['k']['Model'] == 'm'
+
+
+def test_get_returns_a_copy(table):
+    llm_cache.put('k', {'content': 'hello'})
+    llm_cache.get('k')['content'] = 'changed'
+    assert llm_cache.get('k') == {'content': 'hello'}
+
+
+def test_expired_table_entry_is_a_miss(table):
+    table.items['k'] = {'CacheKey': 'k', 'Response': '{}', 'ExpiresAt': int(time.time()) - 1}
+    assert llm_cache.get('k') is None
+
+
+def test_evict_removes_local_and_table_entries(table):
+    llm_cache.put('k', {'content': 'hello'})
+    llm_cache.evict('k')
+    assert llm_cache.get('k') is None
+    assert 'k' not in table.items
+
+
+def test_table_errors_are_treated_as_misses(table, monkeypatch):
+    def fail(**kwargs):
+        raise RuntimeError("throttled")
+    monkeypatch.setattr(table, 'get_item', fail)
+    assert llm_cache.get('missing') is None
@@ -0,0 +1,29 @@
+import pytest
+
+pytest.importorskip("boto3")
+import llm_client
+
+
+@pytest.fixture(autouse=True)
+def _api_keys(monkeypatch):
+    monkeypatch.setenv('API_KEY', 'google-key')
+    monkeypatch.setenv('BEDROCK_API_KEY', 'bedrock-key')
+
+
+def test_get_api_info_known_model():
+    url, api_key, model_id = llm_client.get_api_info('claude-3.5-haiku')
+    assert url == llm_client.BEDROCK_PROXY_URL
+    assert api_key == 'bedrock-key'
+    assert model_id == 'us.anthropic.claude-3-5-haiku-20241022-v1:0'
+
+
+def test_get_api_info_falls_back_for_unknown_model():
+    assert llm_client.get_api_info('no-such-model') == llm_client.get_api_info('gemini-2.0-flash')
+
+
+def test_evict_cached_uses_the_fallback_model_key(monkeypatch):
+    evicted = []
+    monkeypatch.setattr(llm_client.llm_cache, 'evict', evicted.append)
+    llm_client.evict_cached('system', 'prompt', model='no-such-model')
+    llm_client.evict_cached('system', 'prompt', model='gemini-2.0-flash')
+    assert evicted[0] == evicted[1]
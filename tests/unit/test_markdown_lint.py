@@ -0,0 +1,82 @@
+from markdown_lint import MISSING_HEADING, UNBALANCED_EMPHASIS, lint_markdown, strip_wrapping_backticks
+
+
+def test_strips_markdown_wrapper():
+    assert strip_wrapping_backticks("```markdown\n## Title\ntext\n```") == "## Title\ntext"
+    assert strip_wrapping_backticks("```\n## Title\ntext\n```") == "## Title\ntext"
+    assert strip_wrapping_backticks("`## Title`") == "## Title"
+
+
+def test_keeps_section_that_starts_and_ends_with_code_blocks():
+    text = "```\ncode\n```\n## mid\n```\nmore\n```"
+    assert strip_wrapping_backticks(text) == text
+    assert strip_wrapping_backticks("```markdown\n## T\n```python\nx = 1\n```\n```") == "```markdown\n## T\n```python\nx = 1\n```\n```"
+
+    fixed, fixes, problems = lint_markdown(text)
+    assert fixed == text
+    assert fixes == []
+    assert problems == [MISSING_HEADING]
+
+
+def test_fixes_headings():
+    assert lint_markdown("# Title\ntext") == ("## Title\ntext", ["h1_to_h2"], [])
+    assert lint_markdown("Title\n=====\ntext") == ("## Title\ntext", ["h1_to_h2"], [])
+    assert lint_markdown("**Title**\ntext") == ("## Title\ntext", ["bold_line_to_h2"], [])
+    assert lint_markdown("just text")[2] == [MISSING_HEADING]
+
+
+def test_closes_unterminated_fence():
+    fixed, fixes, problems = lint_markdown("## T\n```python\n# comment")
+    assert fixed == "## T\n```python\n# comment\n```"
+    assert fixes == ["closed_code_fence"]
+    assert problems == []
+
+
+def test_fixes_nested_list_indentation():
+    fixed, fixes, _ = lint_markdown("## T\n\n1. one\n  - child\n2. two")
+    assert fixed == "## T\n\n1. one\n   - child\n2. two"
+    assert fixes == ["list_indentation"]
+
+
+def test_leaves_fenced_code_alone():
+    text = "## T\n```python\n# comment\n- x\n  - y\n```"
+    assert lint_markdown(text) == (text, [], [])
+    tilde = "## T\n\n~~~\n# c\n~~~"
+    assert lint_markdown(tilde) == (tilde, [], [])
+
+
+def test_leaves_indented_code_alone():
+    text = "## T\n\nText:\n\n    # comment\n    - x\n\nAfter"
+    assert lint_markdown(text) == (text, [], [])
+
+
+def test_indented_items_under_open_list_are_not_code():
+    fixed, fixes, _ = lint_markdown("## T\n\n1. one\n\n    - nested")
+    assert fixed == "## T\n\n1. one\n\n   - nested"
+    assert fixes == ["list_indentation"]
+
+
+def test_reports_unbalanced_bold_outside_code():
+    assert lint_markdown("## T\n**open")[2] == [UNBALANCED_EMPHASIS]
+    assert lint_markdown("## T\n`a ** b`\n```\n**\n```")[2] == []
+
+
+def test_leaves_fenced_code_under_a_list_item_alone():
+    text = "## Config\n\n1. Create the file:\n    ```yaml\n    steps:\n      - name: build\n        run: make\n    ```"
+    assert lint_markdown(text) == (text, [], [])
+
+
+def test_closes_unterminated_fence_under_a_list_item_at_its_indent():
+    fixed, fixes, _ = lint_markdown("## Config\n\n1. Create the file:\n    ```yaml\n    steps:\n      - name: build")
+    assert fixed == "## Config\n\n1. Create the file:\n    ```yaml\n    steps:\n      - name: build\n    ```"
+    assert fixes == ["closed_code_fence"]
+
+
+def test_leaves_indented_code_inside_a_list_item_alone():
+    text = "## T\n\n- item\n\n      # comment\n      - y\n\n- next"
+    assert lint_markdown(text) == (text, [], [])
+
+
+def test_keeps_wrapper_around_list_indented_fences():
+    text = "```\n1. Run:\n    ```\n    make\n    ```\n```"
+    assert strip_wrapping_backticks(text) == text
@@ -0,0 +1,107 @@
+import io
+
+import pytest
+
+pytest.importorskip("botocore")
+from botocore.exceptions import ClientError
+
+import warm_cache
+from warm_cache import WarmCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(warm_cache.time, 'monotonic', fake)
+    return fake
+
+
+def test_get_checks_version_and_ttl(clock):
+    cache = WarmCache(ttl_seconds=10)
+    cache.put('k', 'value', version='v1')
+
+    assert cache.get('k') == 'value'
+    assert cache.get('k', version='v1') == 'value'
+    assert cache.get('k', version='v2') is None
+
+    clock.now += 11
+    assert cache.get('k', version='v1') is None
+    assert cache.peek('k') == ('value', 'v1', False)
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = WarmCache(max_entries=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.get('a')
+    cache.put('c', 3)
+    assert cache.get('a') == 1
+    assert cache.get('b') is None
+
+
+class FakeS3:
+    def __init__(self, objects):
+        self.objects = objects # key -> (data, etag)
+        self.calls = []
+
+    def get_object(self, Bucket, Key, IfNoneMatch=None):
+        self.calls.append(IfNoneMatch)
+        if Key not in self.objects:
+            raise ClientError({'Error': {'Code': 'NoSuchKey'}}, 'GetObject')
+        data, etag = self.objects[Key]
+        if IfNoneMatch and etag in [tag.strip() for tag in IfNoneMatch.split(',')]:
+            raise ClientError({'Error': {'Code': '304'}, 'ResponseMetadata': {'HTTPHeaders': {'etag': etag}}}, 'GetObject')
+        return {'Body': io.BytesIO(data), 'ETag': etag}
+
+
+def test_s3_objects_are_served_fresh_then_revalidated_by_etag(clock):
+    cache = WarmCache(ttl_seconds=10)
+    s3 = FakeS3({'key': (b'data', '"e1"')})
+
+    assert warm_cache.get_s3_object(cache, s3, 'bucket', 'key')['Body'].read() == b'data'
+    assert warm_cache.get_s3_object(cache, s3, 'bucket', 'key')['Body'].read() == b'data'
+    assert s3.calls == [None]
+
+    clock.now += 11
+    assert warm_cache.get_s3_object(cache, s3, 'bucket', 'key')['ETag'] == '"e1"'
+    assert s3.calls == [None, '"e1"'] # 304, served from memory
+
+    s3.objects['key'] = (b'new', '"e2"')
+    clock.now += 11
+    assert warm_cache.get_s3_object(cache, s3, 'bucket', 'key')['Body'].read() == b'new'
+
+
+def test_deleted_s3_object_is_dropped_from_the_cache(clock):
+    cache = WarmCache(ttl_seconds=10)
+    s3 = FakeS3({'key': (b'data', '"e1"')})
+    warm_cache.get_s3_object(cache, s3, 'bucket', 'key')
+
+    del s3.objects['key']
+    clock.now += 11
+    with pytest.raises(ClientError):
+        warm_cache.get_s3_object(cache, s3, 'bucket', 'key')
+    assert cache.peek(('s3', 'bucket', 'key'))[0] is None
+
+
+def test_cold_cache_passes_client_etags_to_s3(clock):
+    cache = WarmCache(ttl_seconds=10)
+    s3 = FakeS3({'key': (b'data', '"e1"')})
+
+    response = warm_cache.get_s3_object(cache, s3, 'bucket', 'key', ['"old"', '"e1"'])
+    assert response == {'NotModified': True, 'ETag': '"e1"'}
+    assert s3.calls == ['"old", "e1"']
+    assert cache.peek(('s3', 'bucket', 'key'))[0] is None # Nothing was downloaded to cache
+
+    # A stale client tag gets the body, which is then cached and revalidated by its own ETag
+    assert warm_cache.get_s3_object(cache, s3, 'bucket', 'key', ['"old"'])['Body'].read() == b'data'
+    clock.now += 11
+    assert warm_cache.get_s3_object(cache, s3, 'bucket', 'key', ['"old"'])['ETag'] == '"e1"'
+    assert s3.calls[-1] == '"e1"'